@@ -0,0 +1,64 @@
+"""
+Micro-benchmark of request validation and JSON encoding, old path against new.
+
+    python bench_codec.py [--items 5000] [--repeat 5]
+
+Compares, for a batch of parking spots, a schema built per call, a cached
+schema instance and the compiled fast path, and, for a spot listing and a
+detector payload, Flask's default JSON provider and the orjson provider.
+"""
+import argparse
+import timeit
+from datetime import datetime, timezone
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from utils.codec import schema, load_many, JSONProvider
+from utils.schemas import ParkingSpotSchema, parse_space_updates
+
+def best(function, repeat):
+    """Fastest of ``repeat`` runs, in milliseconds."""
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+def main(items, repeat):
+    spots = [{"location": [i % 640, i // 640], "is_reserved": i % 7 == 0} for i in range(items)]
+    listing = [
+        {"id": i, "location": f"({i % 640},{i // 640})", "is_reserved": False, "is_occupied": i % 3 == 0,
+         "lot_id": "default", "status_updated_at": datetime(2024, 5, 1, tzinfo=timezone.utc)}
+        for i in range(items)
+    ]
+    app = Flask(__name__)
+    default, fast = DefaultJSONProvider(app), JSONProvider(app)
+    detector = default.dumps({"camera_id": "cam-1", "spaces": [
+        {"id": i, "status": "occupied" if i % 3 else "free"} for i in range(items)
+    ]})
+    cached = schema(ParkingSpotSchema, partial=('id',))
+
+    cases = [
+        (f"validate {items} spots", [
+            ("new schema per item", lambda: [ParkingSpotSchema(partial=('id',)).load(spot) for spot in spots]),
+            ("cached schema", lambda: [cached.load(spot) for spot in spots]),
+            ("compiled fast path", lambda: load_many(cached, spots)),
+        ]),
+        (f"encode {items} listed spots", [
+            ("default provider", lambda: default.dumps(listing)),
+            (f"{JSONProvider.__name__}", lambda: fast.dumps(listing)),
+        ]),
+        (f"decode and parse {items} detector spaces", [
+            ("default provider", lambda: parse_space_updates(default.loads(detector))),
+            (f"{JSONProvider.__name__}", lambda: parse_space_updates(fast.loads(detector))),
+        ]),
+    ]
+    for title, variants in cases:
+        print(title)
+        baseline = None
+        for name, function in variants:
+            elapsed = best(function, repeat)
+            baseline = baseline or elapsed
+            print(f"  {name:<22} {elapsed:9.2f} ms  {baseline / elapsed:6.1f}x")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    main(args.items, args.repeat)
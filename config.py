@@ -12,26 +12,49 @@ load_dotenv()
 
 class Config:
     # JWT Configuration
-    JWT_SECRET_KEY: str = os.getenv('JWT_SECRET_KEY')
-    if not JWT_SECRET_KEY:
-        logger.error("Error: 'JWT_SECRET_KEY' must be set in the .env file.")
-        raise ValueError("Error: 'JWT_SECRET_KEY' must be set in the .env file.")
+    JWT_SECRET_KEY: Optional[str] = os.getenv('JWT_SECRET_KEY')
 
-    # Database Configuration
-    DATABASE_URL: str = os.getenv('DATABASE_URL')
-    if not DATABASE_URL:
-        logger.error("Error: 'DATABASE_URL' must be set in the .env file.")
-        raise ValueError("Error: 'DATABASE_URL' must be set in the .env file.")
+    # Database Configuration (connections are opened on first use)
+    DATABASE_URL: Optional[str] = os.getenv('DATABASE_URL')
 
     # Application Settings
     DEBUG: bool = os.getenv('DEBUG', 'False').lower() in ['true', '1', 't', 'yes']
     HOST: str = os.getenv('HOST', '0.0.0.0')  # Default to listening on all interfaces
     PORT: int = int(os.getenv('PORT', 5000))  # Default port for Flask
 
+    # Shared token detectors send in the X-Detector-Token header (/update_spaces answers 503 when unset)
+    DETECTOR_TOKEN: Optional[str] = os.getenv('DETECTOR_TOKEN')
+    # Token monitoring tools send in the X-Metrics-Token header to read /stats (a valid access token works too)
+    METRICS_TOKEN: Optional[str] = os.getenv('METRICS_TOKEN')
+
+    # Mail Configuration (emails are sent by the outbox sender, see utils/mailer.py)
+    MAIL_SERVER: str = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+    MAIL_PORT: int = int(os.getenv('MAIL_PORT', 587))
+    MAIL_USE_TLS: bool = os.getenv('MAIL_USE_TLS', 'True').lower() in ['true', '1', 't', 'yes']
+    MAIL_USERNAME: Optional[str] = os.getenv('MAIL_USERNAME')
+    MAIL_PASSWORD: Optional[str] = os.getenv('MAIL_PASSWORD')
+    OUTBOX_WORKER: bool = os.getenv('OUTBOX_WORKER', 'True').lower() in ['true', '1', 't', 'yes']  # Run an email sender thread in each worker
+
+    # SocketIO: async mode (threading, gevent or eventlet; gevent when it patched the process, else threading) and the
+    # message queue, e.g. redis://, that lets several worker processes emit to the same rooms
+    SOCKETIO_ASYNC_MODE: Optional[str] = os.getenv('SOCKETIO_ASYNC_MODE')
+    SOCKETIO_MESSAGE_QUEUE: Optional[str] = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+
     # Optional Configurations
     SQLALCHEMY_TRACK_MODIFICATIONS: bool = False  # Disable SQLAlchemy modification tracking
     CORS_ALLOWED_ORIGINS: List[str] = os.getenv('CORS_ALLOWED_ORIGINS', '*').split(',')  # Parse CORS allowed origins
 
+    # Settings create_app() refuses to start without
+    REQUIRED = ('JWT_SECRET_KEY', 'DATABASE_URL')
+
+    @classmethod
+    def validate(cls):
+        """Raise ValueError when a required setting is missing."""
+        for name in cls.REQUIRED:
+            if not getattr(cls, name, None):
+                logger.error(f"Error: '{name}' must be set in the .env file.")
+                raise ValueError(f"Error: '{name}' must be set in the .env file.")
+
     # Log configuration loading
     logger.info("Configuration loaded successfully.")
     logger.debug(f"JWT_SECRET_KEY: {JWT_SECRET_KEY}")
@@ -0,0 +1,170 @@
+"""
+Load test for many concurrent, mostly idle clients.
+
+Opens ``--clients`` keep-alive HTTP connections that each request ``--path``
+every ``--think`` seconds, and ``--subscribers`` SocketIO clients holding
+long-poll connections, then reports throughput, latency percentiles and
+errors. Run it against each serving mode to compare them, e.g.::
+
+    python app.py                                   # threaded server
+    python serve.py                                 # gevent server
+    python loadtest.py --clients 2000 --subscribers 1000 --duration 60 \\
+        --path /parking_spots --token "$ACCESS_TOKEN"
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+import statistics
+from urllib.parse import urlsplit
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+class Results:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.subscribed = 0
+
+    def summary(self, duration):
+        latencies = [latency * 1000 for latency in self.latencies]
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "subscribed": self.subscribed,
+            "requests_per_second": round(len(latencies) / duration, 1),
+            "p50_ms": round(percentile(latencies, 0.50), 1),
+            "p95_ms": round(percentile(latencies, 0.95), 1),
+            "p99_ms": round(percentile(latencies, 0.99), 1),
+            "mean_ms": round(statistics.fmean(latencies), 1) if latencies else 0.0,
+        }
+
+class Connection:
+    """One client HTTP connection, kept alive when the server allows it and reopened otherwise."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port, self.netloc = parts.hostname, parts.port or 80, parts.netloc
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=None, body=b''):
+        """Send one HTTP/1.1 request and return (status, body)."""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.netloc}", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await self.writer.drain()
+        status_line = (await self.reader.readline()).split()
+        if len(status_line) < 2:
+            self.close()
+            raise ConnectionResetError("Connection closed by the server")
+        keep_alive = status_line[0] == b'HTTP/1.1'
+        length, chunked = None, False
+        while (line := await self.reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode().partition(':')
+            name, value = name.lower(), value.strip().lower()
+            if name == 'content-length':
+                length = int(value)
+            elif name == 'transfer-encoding':
+                chunked = 'chunked' in value
+            elif name == 'connection':
+                keep_alive = value == 'keep-alive' or (keep_alive and value != 'close')
+        if chunked:
+            data = b''
+            while (size := int((await self.reader.readline()).strip(), 16)):
+                data += (await self.reader.readexactly(size + 2))[:-2]
+            await self.reader.readline()
+        elif length is not None:
+            data = await self.reader.readexactly(length)
+        else:
+            data, keep_alive = await self.reader.read(), False
+        if not keep_alive:
+            self.close()
+        return int(status_line[1]), data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+async def http_client(url, path, headers, think, ramp, deadline, results):
+    connection = Connection(url)
+    try:
+        await asyncio.sleep(random.uniform(0, ramp))
+        while time.monotonic() < deadline:
+            start = time.monotonic()
+            try:
+                status, _ = await connection.request('GET', path, headers)
+                results.latencies.append(time.monotonic() - start)
+                if status >= 400:
+                    results.errors += 1
+            except (OSError, ValueError, asyncio.IncompleteReadError):
+                results.errors += 1
+                connection.close()
+            await asyncio.sleep(think)
+    finally:
+        connection.close()
+
+def engineio_packets(body):
+    """Split an Engine.IO long-polling payload into its packets, which are separated by \\x1e."""
+    return body.split(b'\x1e') if body else []
+
+async def subscriber(url, token, lot_id, ramp, deadline, results):
+    """A SocketIO client on the long-polling transport: connect, subscribe, then wait for messages."""
+    connection = Connection(url)
+    try:
+        await asyncio.sleep(random.uniform(0, ramp))
+        base = '/socket.io/?EIO=4&transport=polling'
+        _, body = await connection.request('GET', base)
+        sid = json.loads(body[body.index(b'{'):])['sid']
+        poll = f"{base}&sid={sid}"
+        plain = {"Content-Type": "text/plain;charset=UTF-8"}
+        await connection.request('POST', poll, plain, f'40{json.dumps({"token": token})}'.encode())
+        _, body = await connection.request('GET', poll)
+        if not body.startswith(b'40'):
+            raise ValueError(f"SocketIO connection refused: {body[:100]!r}")
+        await connection.request('POST', poll, plain, f'42{json.dumps(["subscribe", {"lot_id": lot_id}])}'.encode())
+        results.subscribed += 1
+        while time.monotonic() < deadline:
+            _, body = await connection.request('GET', poll)
+            packets = engineio_packets(body)
+            if b'1' in packets:  # Engine.IO close
+                raise ConnectionResetError("SocketIO session closed by the server")
+            pings = packets.count(b'2')
+            if pings:  # Pings can arrive together with messages; each one needs a pong
+                await connection.request('POST', poll, plain, b'\x1e'.join([b'3'] * pings))
+    except (OSError, ValueError, KeyError, asyncio.IncompleteReadError):
+        results.errors += 1
+    finally:
+        connection.close()
+
+async def main(args):
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    deadline = time.monotonic() + args.duration
+    results = Results()
+    tasks = [http_client(args.url, args.path, headers, args.think, args.ramp, deadline, results) for _ in range(args.clients)]
+    tasks += [subscriber(args.url, args.token, args.lot_id, args.ramp, deadline, results) for _ in range(args.subscribers)]
+    started = time.monotonic()
+    outcomes = await asyncio.gather(*(asyncio.wait_for(task, args.duration + 30) for task in tasks), return_exceptions=True)
+    results.errors += sum(isinstance(outcome, Exception) for outcome in outcomes)
+    print(json.dumps(results.summary(min(time.monotonic() - started, args.duration)), indent=2))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--token', default='', help="Access token for protected paths and SocketIO")
+    parser.add_argument('--lot-id', default='default')
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--subscribers', type=int, default=0)
+    parser.add_argument('--think', type=float, default=1.0, help="Seconds each client idles between requests")
+    parser.add_argument('--ramp', type=float, default=0.0, help="Seconds over which clients start, instead of all at once")
+    parser.add_argument('--duration', type=float, default=30.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,10 @@
+-- Link parking spots to the detector cameras that watch them and store their live occupancy.
+ALTER TABLE parking_spots
+    ADD COLUMN IF NOT EXISTS camera_id TEXT,
+    ADD COLUMN IF NOT EXISTS camera_spot_id INTEGER,
+    ADD COLUMN IF NOT EXISTS is_occupied BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS status_updated_at TIMESTAMPTZ;
+
+-- Target of the ON CONFLICT clause used by the /update_spaces bulk upsert.
+CREATE UNIQUE INDEX IF NOT EXISTS parking_spots_camera_spot_idx
+    ON parking_spots (camera_id, camera_spot_id);
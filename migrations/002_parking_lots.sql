@@ -0,0 +1,5 @@
+-- Group parking spots into lots so clients can subscribe to one lot at a time.
+ALTER TABLE parking_spots
+    ADD COLUMN IF NOT EXISTS lot_id TEXT NOT NULL DEFAULT 'default';
+
+CREATE INDEX IF NOT EXISTS parking_spots_lot_idx ON parking_spots (lot_id);
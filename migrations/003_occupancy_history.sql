@@ -0,0 +1,46 @@
+-- Status transitions of every spot, partitioned by month.
+CREATE TABLE IF NOT EXISTS spot_status_events (
+    spot_id INTEGER NOT NULL,
+    lot_id TEXT NOT NULL,
+    is_occupied BOOLEAN NOT NULL,
+    changed_at TIMESTAMPTZ NOT NULL
+) PARTITION BY RANGE (changed_at);
+
+CREATE INDEX IF NOT EXISTS spot_status_events_spot_idx ON spot_status_events (spot_id, changed_at);
+
+-- Catches events for months whose partition has not been created yet.
+CREATE TABLE IF NOT EXISTS spot_status_events_default PARTITION OF spot_status_events DEFAULT;
+
+CREATE OR REPLACE FUNCTION create_spot_status_partition(month DATE) RETURNS VOID AS $$
+DECLARE
+    month_start DATE := date_trunc('month', month);
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF spot_status_events FOR VALUES FROM (%L) TO (%L)',
+        'spot_status_events_' || to_char(month_start, 'YYYY_MM'),
+        month_start,
+        month_start + INTERVAL '1 month'
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_spot_status_partition(CURRENT_DATE);
+SELECT create_spot_status_partition((CURRENT_DATE + INTERVAL '1 month')::DATE);
+
+-- Occupied seconds per spot and hour, maintained incrementally by the ingest path.
+CREATE TABLE IF NOT EXISTS spot_occupancy_hourly (
+    spot_id INTEGER NOT NULL,
+    lot_id TEXT NOT NULL,
+    hour TIMESTAMPTZ NOT NULL,
+    occupied_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (spot_id, hour)
+);
+
+-- Occupied seconds summed over the spots of a lot, and the peak number of occupied spots, per hour.
+CREATE TABLE IF NOT EXISTS lot_occupancy_hourly (
+    lot_id TEXT NOT NULL,
+    hour TIMESTAMPTZ NOT NULL,
+    occupied_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    peak_occupied INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (lot_id, hour)
+);
@@ -0,0 +1,5 @@
+-- Keyset pagination walks rows in id order within the filtered set.
+CREATE INDEX IF NOT EXISTS reservations_user_id_idx ON reservations (user_id, id);
+
+DROP INDEX IF EXISTS parking_spots_lot_idx;
+CREATE INDEX IF NOT EXISTS parking_spots_lot_id_idx ON parking_spots (lot_id, id);
@@ -0,0 +1,41 @@
+-- Reservations cover a time range; two reservations of one spot may not overlap.
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+ALTER TABLE reservations
+    ADD COLUMN IF NOT EXISTS starts_at TIMESTAMPTZ,
+    ADD COLUMN IF NOT EXISTS ends_at TIMESTAMPTZ;
+
+-- Reservations made before ranges existed only have a start time; they last an hour.
+UPDATE reservations
+SET starts_at = time::timestamptz, ends_at = time::timestamptz + INTERVAL '1 hour'
+WHERE starts_at IS NULL;
+
+-- Reservations were never checked for conflicts, so existing rows can overlap. Empty
+-- periods and every reservation overlapping an earlier one (lower id) of the same spot
+-- are moved to reservations_conflicts for review before the constraints are added.
+CREATE TABLE IF NOT EXISTS reservations_conflicts (LIKE reservations);
+
+BEGIN;
+-- No reservation can be written between the clean-up and the constraints
+LOCK TABLE reservations IN SHARE ROW EXCLUSIVE MODE;
+
+WITH conflicting AS (
+    DELETE FROM reservations r
+    WHERE r.ends_at <= r.starts_at OR EXISTS (
+        SELECT 1 FROM reservations earlier
+        WHERE earlier.spot_id = r.spot_id AND earlier.id < r.id
+          AND earlier.ends_at > earlier.starts_at
+          AND tstzrange(earlier.starts_at, earlier.ends_at) && tstzrange(r.starts_at, r.ends_at)
+    )
+    RETURNING r.*
+)
+INSERT INTO reservations_conflicts SELECT * FROM conflicting;
+
+ALTER TABLE reservations
+    ALTER COLUMN starts_at SET NOT NULL,
+    ALTER COLUMN ends_at SET NOT NULL,
+    ADD CONSTRAINT reservations_period_check CHECK (ends_at > starts_at),
+    ADD CONSTRAINT reservations_no_overlap
+        EXCLUDE USING gist (spot_id WITH =, tstzrange(starts_at, ends_at) WITH &&);
+
+COMMIT;
@@ -0,0 +1,19 @@
+-- Emails waiting to be sent. Request handlers insert rows in their own
+-- transaction; the background sender claims due rows, sends them and marks
+-- them sent, or reschedules them with a backoff.
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    sender TEXT,
+    recipients TEXT[] NOT NULL,
+    subject TEXT NOT NULL,
+    body TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    last_error TEXT,
+    sent_at TIMESTAMPTZ,
+    failed_at TIMESTAMPTZ  -- Set when the sender gave up
+);
+
+CREATE INDEX IF NOT EXISTS email_outbox_due_idx
+    ON email_outbox (next_attempt_at) WHERE sent_at IS NULL AND failed_at IS NULL;
@@ -0,0 +1,2 @@
+-- Logins look users up by lower-cased email.
+CREATE INDEX IF NOT EXISTS users_email_lower_idx ON users (lower(email));
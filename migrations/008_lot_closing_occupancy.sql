@@ -0,0 +1,3 @@
+-- Occupied spots of a lot after the last status change of each hour. Hours without a
+-- change carry the level of the last hour that had one; NULL when the hour had none.
+ALTER TABLE lot_occupancy_hourly ADD COLUMN IF NOT EXISTS closing_occupied INTEGER;
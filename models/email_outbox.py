@@ -0,0 +1,69 @@
+from utils.database import Database
+from utils.query import Query
+from utils.mailer import outbox_worker
+
+ENQUEUE_EMAIL = Query('enqueue_email', """
+    INSERT INTO email_outbox (sender, recipients, subject, body) VALUES (%s, %s, %s, %s) RETURNING id
+""")
+# Due messages are leased for a while so that concurrent senders skip them
+CLAIM_EMAILS = Query('claim_emails', """
+    UPDATE email_outbox SET next_attempt_at = now() + make_interval(secs => %s)
+    WHERE id IN (
+        SELECT id FROM email_outbox
+        WHERE sent_at IS NULL AND failed_at IS NULL AND next_attempt_at <= now()
+        ORDER BY next_attempt_at, id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, sender, recipients, subject, body, attempts
+""", prepare=True)
+MARK_SENT = Query('mark_emails_sent', "UPDATE email_outbox SET sent_at = now() WHERE id = ANY(%s) RETURNING id")
+RETRY_EMAIL = Query('retry_email', """
+    UPDATE email_outbox
+    SET attempts = attempts + 1, last_error = %s, next_attempt_at = now() + make_interval(secs => %s)
+    WHERE id = %s
+    RETURNING id
+""")
+FAIL_EMAIL = Query('fail_email', """
+    UPDATE email_outbox SET attempts = attempts + 1, last_error = %s, failed_at = now() WHERE id = %s RETURNING id
+""")
+
+class EmailOutbox:
+    @staticmethod
+    def enqueue(subject, recipients, body, sender=None):
+        """
+        Queue an email for the background sender.
+
+        Called within an open transaction, the email is only sent if that
+        transaction commits. Returns the outbox ID.
+        """
+        with Database.transaction() as db:
+            email_id = db.fetchone(ENQUEUE_EMAIL, (sender, list(recipients), subject, body))[0]
+            db.on_commit(outbox_worker.wake)
+            return email_id
+
+    @staticmethod
+    def claim(limit, lease):
+        """
+        Lease up to ``limit`` due emails for ``lease`` seconds and return them
+        as dicts, oldest first.
+        """
+        with Database.transaction() as db:
+            return [
+                {"id": row[0], "sender": row[1], "recipients": row[2], "subject": row[3], "body": row[4], "attempts": row[5]}
+                for row in db.fetchall(CLAIM_EMAILS, (lease, limit))
+            ]
+
+    @staticmethod
+    def mark_sent(email_ids):
+        with Database.transaction() as db:
+            db.fetchall(MARK_SENT, (list(email_ids),))
+
+    @staticmethod
+    def mark_failed(email_id, error, retry_in=None):
+        """Reschedule an email ``retry_in`` seconds from now, or give up on it when None."""
+        with Database.transaction() as db:
+            if retry_in is None:
+                db.fetchone(FAIL_EMAIL, (error, email_id))
+            else:
+                db.fetchone(RETRY_EMAIL, (error, retry_in, email_id))
@@ -0,0 +1,115 @@
+from utils.database import Database
+from utils.query import Query
+
+ENSURE_PARTITIONS = Query('ensure_history_partitions', """
+    SELECT create_spot_status_partition((CURRENT_DATE + make_interval(months => m))::date)
+    FROM generate_series(0, %s) AS m
+""")
+# Rollups only hold closed intervals; a spot still occupied is counted from the
+# hour it was taken up to now. Hours are those with start <= hour < end.
+SPOT_OCCUPANCY = Query('spot_occupancy', """
+    WITH bounds AS (
+        SELECT %s::int AS spot_id, %s::timestamptz AS start, LEAST(%s::timestamptz, now()) AS stop
+    ),
+    open AS (
+        SELECT h.hour, EXTRACT(EPOCH FROM LEAST(h.hour + INTERVAL '1 hour', now()) - GREATEST(h.hour, s.status_updated_at)) AS seconds
+        FROM parking_spots s
+        JOIN bounds b ON s.id = b.spot_id
+        CROSS JOIN LATERAL generate_series(
+            date_trunc('hour', GREATEST(s.status_updated_at, b.start)), b.stop, INTERVAL '1 hour'
+        ) AS h(hour)
+        WHERE s.is_occupied AND s.status_updated_at IS NOT NULL AND h.hour >= b.start AND h.hour < b.stop
+    )
+    SELECT date_trunc(%s, hour) AS bucket, sum(seconds) / 60 FROM (
+        SELECT r.hour, r.occupied_seconds AS seconds
+        FROM spot_occupancy_hourly r JOIN bounds b ON r.spot_id = b.spot_id
+        WHERE r.hour >= b.start AND r.hour < b.stop
+        UNION ALL
+        SELECT hour, seconds FROM open
+    ) t
+    GROUP BY bucket ORDER BY bucket
+""", prepare=True)
+# Occupied spots are counted per hour from the hour they were taken. Hours
+# without a status change have no peak of their own: they keep the closing
+# level of the last hour that had one.
+LOT_OCCUPANCY = Query('lot_occupancy', """
+    WITH bounds AS (
+        SELECT lot_id, start, stop,
+               date_trunc('hour', start) + CASE WHEN date_trunc('hour', start) < start THEN INTERVAL '1 hour' ELSE INTERVAL '0' END AS first
+        FROM (SELECT %s::text AS lot_id, %s::timestamptz AS start, LEAST(%s::timestamptz, now()) AS stop) b
+    ),
+    hours AS (
+        SELECT h.hour FROM bounds b
+        CROSS JOIN LATERAL generate_series(b.first, b.stop, INTERVAL '1 hour') AS h(hour)
+        WHERE h.hour < b.stop
+    ),
+    open AS (
+        SELECT hour, count(*) AS spots,
+               sum(EXTRACT(EPOCH FROM LEAST(hour + INTERVAL '1 hour', now()) - GREATEST(hour, since))) AS seconds
+        FROM (
+            SELECT GREATEST(date_trunc('hour', s.status_updated_at), b.first) AS hour, s.status_updated_at AS since
+            FROM parking_spots s JOIN bounds b ON s.lot_id = b.lot_id
+            WHERE s.is_occupied AND s.status_updated_at IS NOT NULL
+        ) o
+        GROUP BY hour
+    ),
+    levels AS (
+        SELECT h.hour, r.occupied_seconds, r.peak_occupied, r.closing_occupied,
+               COALESCE(o.seconds, 0)
+                   + (sum(COALESCE(o.spots, 0)) OVER (ORDER BY h.hour) - COALESCE(o.spots, 0))
+                     * EXTRACT(EPOCH FROM LEAST(h.hour + INTERVAL '1 hour', now()) - h.hour) AS open_seconds,
+               count(r.closing_occupied) OVER (ORDER BY h.hour) AS run
+        FROM hours h
+        LEFT JOIN lot_occupancy_hourly r ON r.lot_id = (SELECT lot_id FROM bounds) AND r.hour = h.hour
+        LEFT JOIN open o ON o.hour = h.hour
+    ),
+    filled AS (
+        SELECT hour, COALESCE(occupied_seconds, 0) + open_seconds AS seconds,
+               CASE WHEN closing_occupied IS NOT NULL THEN peak_occupied
+                    ELSE GREATEST(COALESCE(peak_occupied, 0), COALESCE(max(closing_occupied) OVER (PARTITION BY run), (
+                        SELECT r.closing_occupied FROM lot_occupancy_hourly r JOIN bounds b ON r.lot_id = b.lot_id
+                        WHERE r.hour < b.first AND r.closing_occupied IS NOT NULL
+                        ORDER BY r.hour DESC LIMIT 1
+                    ), 0)) END AS peak
+        FROM levels
+    )
+    SELECT date_trunc(%s, hour) AS bucket, sum(seconds) / 60, max(peak)
+    FROM filled
+    GROUP BY bucket HAVING sum(seconds) > 0 OR max(peak) > 0 ORDER BY bucket
+""", prepare=True)
+
+class OccupancyHistory:
+    @staticmethod
+    def ensure_partitions(months_ahead=1):
+        """
+        Create the monthly event partitions for the current month and the
+        next ``months_ahead`` months, if they do not exist yet.
+        """
+        with Database.transaction() as db:
+            db.fetchall(ENSURE_PARTITIONS, (months_ahead,))
+
+    @staticmethod
+    def get_spot_occupancy(spot_id, start, end, granularity):
+        """
+        Occupied minutes of one spot per hour or day between start and end,
+        read from the hourly rollup, plus the interval it is still occupied in.
+        """
+        with Database.transaction() as db:
+            return [
+                {"period": bucket.isoformat(), "occupied_minutes": round(minutes, 1)}
+                for bucket, minutes in db.fetchall(SPOT_OCCUPANCY, (spot_id, start, end, granularity))
+            ]
+
+    @staticmethod
+    def get_lot_occupancy(lot_id, start, end, granularity):
+        """
+        Occupied spot-minutes and peak number of occupied spots of one lot per
+        hour or day between start and end, read from the hourly rollup.
+        Spots still occupied count up to now, and hours without a status
+        change report the occupancy carried over from the last change.
+        """
+        with Database.transaction() as db:
+            return [
+                {"period": bucket.isoformat(), "occupied_minutes": round(minutes, 1), "peak_occupied": peak}
+                for bucket, minutes, peak in db.fetchall(LOT_OCCUPANCY, (lot_id, start, end, granularity))
+            ]
@@ -1,56 +1,238 @@
 from utils.database import Database
+from utils.query import Query
+from utils.pagination import select_page, page_columns, split_page
+from utils.cache import spot_cache
+from utils.availability import availability_index
+
+ALL_SPOTS = Query('all_spots', "SELECT id, location, is_reserved FROM parking_spots")
+LOT_SPOTS = Query(
+    'lot_spots', "SELECT id, location, is_reserved, is_occupied FROM parking_spots WHERE lot_id = %s", prepare=True
+)
+ADD_SPOT = Query('add_spot', "INSERT INTO parking_spots (location, is_reserved) VALUES (%s, %s) RETURNING id, lot_id")
+ADD_SPOTS = Query('add_spots', """
+    INSERT INTO parking_spots (location, is_reserved, lot_id)
+    SELECT v.location, v.is_reserved, %s
+    FROM unnest(%s::text[], %s::bool[]) WITH ORDINALITY AS v(location, is_reserved, position)
+    ORDER BY v.position
+    RETURNING id
+""")
+DELETE_SPOT = Query('delete_spot', "DELETE FROM parking_spots WHERE id = %s RETURNING lot_id")
+# Held until commit, so that batches touching one lot read each other's statuses and
+# occupancy levels; taken in name order. Spots not registered yet go to the default lot.
+LOCK_LOTS = Query('lock_lots', """
+    SELECT pg_advisory_xact_lock(hashtext('lot_occupancy:' || lot_id))
+    FROM (
+        SELECT DISTINCT COALESCE(p.lot_id, 'default') AS lot_id
+        FROM unnest(%s::text[], %s::int[]) AS v(camera_id, camera_spot_id)
+        LEFT JOIN parking_spots p USING (camera_id, camera_spot_id)
+        ORDER BY 1
+    ) l
+""", prepare=True)
+# Runs for every detector batch
+BULK_UPDATE_STATUS = Query('bulk_update_status', """
+    WITH input AS (
+        SELECT * FROM unnest(%s::text[], %s::int[], %s::bool[]) AS v(camera_id, camera_spot_id, is_occupied)
+    ),
+    previous AS (
+        SELECT p.id, p.lot_id, p.is_occupied, p.status_updated_at
+        FROM parking_spots p JOIN input v USING (camera_id, camera_spot_id)
+    ),
+    changed AS (
+        INSERT INTO parking_spots (location, is_reserved, camera_id, camera_spot_id, is_occupied, status_updated_at)
+        SELECT v.camera_id || ':' || v.camera_spot_id, FALSE, v.camera_id, v.camera_spot_id, v.is_occupied, now()
+        FROM input v
+        ON CONFLICT (camera_id, camera_spot_id) DO UPDATE
+        SET is_occupied = EXCLUDED.is_occupied, status_updated_at = EXCLUDED.status_updated_at
+        WHERE parking_spots.is_occupied IS DISTINCT FROM EXCLUDED.is_occupied
+        RETURNING id, camera_id, camera_spot_id, is_occupied, lot_id, status_updated_at, xmax = 0 AS inserted
+    ),
+    events AS (
+        INSERT INTO spot_status_events (spot_id, lot_id, is_occupied, changed_at)
+        SELECT id, lot_id, is_occupied, status_updated_at FROM changed
+    ),
+    closed AS (
+        SELECT c.id AS spot_id, c.lot_id, h.hour,
+               EXTRACT(EPOCH FROM LEAST(h.hour + INTERVAL '1 hour', c.status_updated_at)
+                                  - GREATEST(h.hour, p.status_updated_at)) AS seconds
+        FROM changed c
+        JOIN previous p ON p.id = c.id
+        CROSS JOIN LATERAL generate_series(
+            date_trunc('hour', p.status_updated_at), c.status_updated_at, INTERVAL '1 hour'
+        ) AS h(hour)
+        WHERE p.is_occupied AND NOT c.is_occupied AND p.status_updated_at IS NOT NULL
+    ),
+    spot_rollup AS (
+        INSERT INTO spot_occupancy_hourly (spot_id, lot_id, hour, occupied_seconds)
+        SELECT spot_id, lot_id, hour, sum(seconds) FROM closed GROUP BY spot_id, lot_id, hour
+        ON CONFLICT (spot_id, hour) DO UPDATE
+        SET occupied_seconds = spot_occupancy_hourly.occupied_seconds + EXCLUDED.occupied_seconds
+    ),
+    lot_levels AS (
+        SELECT d.lot_id, d.delta,
+               (SELECT count(*) FROM parking_spots s WHERE s.lot_id = d.lot_id AND s.is_occupied) AS before
+        FROM (
+            SELECT c.lot_id, sum(c.is_occupied::int - COALESCE(p.is_occupied, FALSE)::int) AS delta
+            FROM changed c LEFT JOIN previous p ON p.id = c.id
+            GROUP BY c.lot_id
+        ) d
+    ),
+    lot_rollup AS (
+        INSERT INTO lot_occupancy_hourly (lot_id, hour, occupied_seconds, peak_occupied, closing_occupied)
+        SELECT lot_id, hour, sum(seconds), max(peak), max(closing) FROM (
+            SELECT lot_id, hour, seconds, 0 AS peak, NULL::int AS closing FROM closed
+            UNION ALL
+            SELECT lot_id, date_trunc('hour', now()), 0, GREATEST(before, before + delta), before + delta FROM lot_levels
+        ) t
+        GROUP BY lot_id, hour
+        ON CONFLICT (lot_id, hour) DO UPDATE
+        SET occupied_seconds = lot_occupancy_hourly.occupied_seconds + EXCLUDED.occupied_seconds,
+            peak_occupied = GREATEST(lot_occupancy_hourly.peak_occupied, EXCLUDED.peak_occupied),
+            closing_occupied = COALESCE(EXCLUDED.closing_occupied, lot_occupancy_hourly.closing_occupied)
+    )
+    SELECT id, camera_id, camera_spot_id, is_occupied, lot_id, inserted FROM changed
+""", prepare=True)
 
 class ParkingSpot:
+    # Columns that list endpoints can return, and those returned by default
+    FIELDS = ('id', 'location', 'is_reserved', 'is_occupied', 'lot_id', 'camera_id', 'camera_spot_id', 'status_updated_at')
+    DEFAULT_FIELDS = ('id', 'location', 'is_reserved')
+    # Filters of list endpoints: (type, SQL condition)
+    FILTERS = {
+        'lot_id': (str, "lot_id = %s"),
+        'camera_id': (str, "camera_id = %s"),
+        'is_reserved': (bool, "is_reserved = %s"),
+        'is_occupied': (bool, "is_occupied = %s"),
+        'free': (bool, "(NOT is_reserved AND NOT is_occupied) = %s"),
+    }
+    # Fields and filters that change with detector updates; listings using them
+    # depend on the 'status' cache version as well as on 'spots'
+    STATUS_FIELDS = ('is_occupied', 'status_updated_at', 'free')
+
+    @staticmethod
+    def cache_versions(fields, filters):
+        """Cache versions a listing with these fields and filters depends on."""
+        if any(name in ParkingSpot.STATUS_FIELDS for name in (*fields, *filters)):
+            return ('spots', 'status')
+        return ('spots',)
+
     @staticmethod
     def get_all_spots():
         """
-        Fetch all parking spots from the database.
+        Fetch all parking spots, served from the spot cache until a spot is added or removed.
+        """
+        def load():
+            with Database.transaction() as db:
+                return [
+                    {"id": spot[0], "location": spot[1], "is_reserved": spot[2]}
+                    for spot in db.fetchall(ALL_SPOTS)
+                ]
+        return spot_cache.get_or_load('all_spots', ('spots',), load)
+
+    @staticmethod
+    def list_spots(fields, filters, after=None, limit=100):
+        """
+        Fetch one page of parking spots ordered by id.
+
+        Each distinct combination of fields and filters is prepared once per connection.
+
+        Returns:
+            tuple: (spots, next_cursor) where next_cursor is None on the last page.
+        """
+        columns = page_columns(fields)
+        query, params = select_page('parking_spots', columns, ParkingSpot.FILTERS, filters, after, limit + 1)
+        with Database.transaction() as db:
+            rows = db.fetchall(Query.dynamic('list_spots', db.as_string(query), prepare=True), params)
+            return split_page(rows, columns, fields, limit)
+
+    @staticmethod
+    def stream_spots(fields, filters):
+        """
+        Yield every matching parking spot as a dict, reading them through a
+        server-side cursor so the result set is never held in memory.
+        """
+        query, params = select_page('parking_spots', fields, ParkingSpot.FILTERS, filters)
+        with Database.transaction() as db:
+            for row in db.stream(Query.dynamic('export_spots', db.as_string(query)), params, 'spot_export'):
+                yield dict(zip(fields, row))
+
+    @staticmethod
+    def get_lot_spots(lot_id):
+        """
+        Fetch the parking spots of one lot with their live status.
         """
-        connection = Database.get_connection()
-        cursor = connection.cursor()
-        try:
-            cursor.execute("SELECT id, location, is_reserved FROM parking_spots")
-            spots = cursor.fetchall()
-            return [{"id": spot[0], "location": spot[1], "is_reserved": spot[2]} for spot in spots]
-        except Exception as e:
-            raise e
-        finally:
-            Database.return_connection(connection)
+        with Database.transaction() as db:
+            return [
+                {"id": spot[0], "location": spot[1], "is_reserved": spot[2], "is_occupied": spot[3]}
+                for spot in db.fetchall(LOT_SPOTS, (lot_id,))
+            ]
 
     @staticmethod
     def add_spot(location, is_reserved=False):
         """
         Add a new parking spot to the database.
+        Returns the spot ID and its lot.
+        """
+        with Database.transaction() as db:
+            spot_id, lot_id = db.fetchone(ADD_SPOT, (location, is_reserved))
+            db.on_commit(lambda: ParkingSpot.spots_changed(lot_id))
+            return spot_id, lot_id
+
+    @staticmethod
+    def add_spots(lot_id, locations, reserved):
+        """
+        Add many parking spots to one lot with a single multi-row insert.
+
+        Returns the new spot IDs in the order of ``locations``.
         """
-        connection = Database.get_connection()
-        cursor = connection.cursor()
-        try:
-            cursor.execute(
-                "INSERT INTO parking_spots (location, is_reserved) VALUES (%s, %s) RETURNING id",
-                (location, is_reserved)
-            )
-            spot_id = cursor.fetchone()[0]
-            connection.commit()
-            return spot_id
-        except Exception as e:
-            connection.rollback()
-            raise e
-        finally:
-            Database.return_connection(connection)
+        with Database.transaction() as db:
+            spot_ids = [row[0] for row in db.fetchall(ADD_SPOTS, (lot_id, locations, reserved))]
+            db.on_commit(lambda: ParkingSpot.spots_changed(lot_id))
+            return spot_ids
 
     @staticmethod
     def delete_spot(spot_id):
         """
         Delete a parking spot by ID.
+        Returns the lot of the deleted spot, or None when it did not exist.
+        """
+        with Database.transaction() as db:
+            deleted = db.fetchone(DELETE_SPOT, (spot_id,))
+            if deleted is None:
+                return None
+            db.on_commit(lambda: ParkingSpot.spots_changed(deleted[0]))
+            return deleted[0]
+
+    @staticmethod
+    def spots_changed(lot_id=None):
+        """Invalidate what depends on the set of spots, after a spot was added or removed."""
+        spot_cache.invalidate('spots')
+        availability_index.invalidate(lot_id)
+
+    @staticmethod
+    def bulk_update_status(camera_ids, spot_ids, occupied):
+        """
+        Apply detector statuses for many spots in a single statement.
+
+        The three lists are sent as arrays and unnested server-side. Spots not
+        seen before are registered; existing rows are only written when their
+        status actually changed. Returns the changed rows as
+        (id, camera_id, camera_spot_id, is_occupied, lot_id) tuples.
+
+        The same statement appends every change to ``spot_status_events`` and
+        folds the occupied interval each release closes into the hourly
+        rollups. Intervals still open are added when reports are read.
+
+        Batches are serialized per lot before the statement takes its
+        snapshot. Two batches for the same spot therefore never both close
+        the same interval, and the lot's peak and closing levels include
+        every batch that committed before.
         """
-        connection = Database.get_connection()
-        cursor = connection.cursor()
-        try:
-            cursor.execute("DELETE FROM parking_spots WHERE id = %s", (spot_id,))
-            connection.commit()
-            return cursor.rowcount > 0
-        except Exception as e:
-            connection.rollback()
-            raise e
-        finally:
-            Database.return_connection(connection)
\ No newline at end of file
+        with Database.transaction() as db:
+            db.fetchall(LOCK_LOTS, (camera_ids, spot_ids))
+            changed = db.fetchall(BULK_UPDATE_STATUS, (camera_ids, spot_ids, occupied))
+            if changed:
+                db.on_commit(lambda: spot_cache.invalidate('status'))
+            if any(row[5] for row in changed):
+                # Newly registered spots change the listings themselves, not only statuses
+                db.on_commit(ParkingSpot.spots_changed)
+            return [row[:5] for row in changed]
@@ -1,38 +1,146 @@
+from datetime import datetime
 from utils.database import Database
+from utils.query import Query
+from utils.availability import availability_index
+from utils.pagination import select_page, page_columns, split_page
+
+# Runs for every reservation
+CREATE_RESERVATION = Query('create_reservation', """
+    INSERT INTO reservations (spot_id, user_id, time, starts_at, ends_at) VALUES (%s, %s, %s, %s, %s)
+    RETURNING id, (SELECT lot_id FROM parking_spots WHERE id = %s)
+""", prepare=True)
+SPOT_LOTS = Query('spot_lots', "SELECT id, lot_id FROM parking_spots WHERE id = ANY(%s)")
+CREATE_RESERVATIONS = Query('create_reservations', """
+    INSERT INTO reservations (spot_id, user_id, time, starts_at, ends_at)
+    SELECT v.spot_id, %s, v.starts_at, v.starts_at, v.ends_at
+    FROM unnest(%s::int[], %s::timestamptz[], %s::timestamptz[]) WITH ORDINALITY
+        AS v(spot_id, starts_at, ends_at, position)
+    WHERE v.spot_id = ANY(%s)
+    ORDER BY v.position
+    ON CONFLICT DO NOTHING
+    RETURNING id, spot_id, starts_at, ends_at
+""")
+AVAILABLE_SPOTS = Query('available_spots', """
+    SELECT s.id, s.location FROM parking_spots s
+    WHERE s.lot_id = %s AND NOT EXISTS (
+        SELECT 1 FROM reservations r
+        WHERE r.spot_id = s.id AND tstzrange(r.starts_at, r.ends_at) && tstzrange(%s, %s)
+    )
+    ORDER BY s.id
+""", prepare=True)
+LOT_SPOT_LOCATIONS = Query('lot_spot_locations', "SELECT id, location FROM parking_spots WHERE lot_id = %s ORDER BY id")
+LOT_RESERVATIONS = Query('lot_reservations', """
+    SELECT r.spot_id, r.starts_at, r.ends_at FROM reservations r
+    JOIN parking_spots s ON s.id = r.spot_id
+    WHERE s.lot_id = %s AND tstzrange(r.starts_at, r.ends_at) && tstzrange(%s, %s)
+""")
 
 class Reservation:
+    # Columns that list endpoints can return
+    FIELDS = ('id', 'spot_id', 'user_id', 'starts_at', 'ends_at')
+    # Filters of list endpoints: (type, SQL condition); user_id is always set from the token
+    FILTERS = {
+        'spot_id': (int, "spot_id = %s"),
+        'user_id': (str, "user_id = %s"),
+        'from': (datetime, "ends_at > %s"),
+        'until': (datetime, "starts_at < %s"),
+    }
+
     @staticmethod
-    def create_reservation(spot_id, user_id, time):
+    def create_reservation(spot_id, user_id, starts_at, ends_at):
         """
         Create a new reservation in the database.
+        Returns the reservation ID and the lot of the reserved spot.
+
+        Raises psycopg2.errors.ExclusionViolation when the spot is already
+        reserved for an overlapping period.
         """
-        connection = Database.get_connection()
-        cursor = connection.cursor()
-        try:
-            cursor.execute(
-                "INSERT INTO reservations (spot_id, user_id, time) VALUES (%s, %s, %s) RETURNING id",
-                (spot_id, user_id, time)
+        with Database.transaction() as db:
+            reservation_id, lot_id = db.fetchone(
+                CREATE_RESERVATION, (spot_id, user_id, starts_at.isoformat(), starts_at, ends_at, spot_id)
             )
-            reservation_id = cursor.fetchone()[0]
-            connection.commit()
-            return reservation_id
-        except Exception as e:
-            connection.rollback()
-            raise e
-        finally:
-            Database.return_connection(connection)
+            db.on_commit(lambda: availability_index.add(lot_id, spot_id, starts_at, ends_at))
+            return reservation_id, lot_id
 
     @staticmethod
-    def get_reservations_by_user(user_id):
-        """
-        Fetch all reservations for a specific user.
-        """
-        connection = Database.get_connection()
-        cursor = connection.cursor()
-        try:
-            cursor.execute("SELECT * FROM reservations WHERE user_id = %s", (user_id,))
-            return cursor.fetchall()
-        except Exception as e:
-            raise e
-        finally:
-            Database.return_connection(connection)
\ No newline at end of file
+    def create_reservations(user_id, spot_ids, starts, ends):
+        """
+        Create many reservations for one user with a single multi-row insert.
+
+        Periods that overlap an existing reservation, or an earlier one of the
+        batch, are skipped. Returns one ``(status, reservation_id, lot_id)``
+        per input, where status is 'created', 'conflict' or 'not_found'.
+        """
+        with Database.transaction() as db:
+            lots = dict(db.fetchall(SPOT_LOTS, (spot_ids,)))
+            created = {
+                (spot_id, starts_at, ends_at): reservation_id
+                for reservation_id, spot_id, starts_at, ends_at
+                in db.fetchall(CREATE_RESERVATIONS, (user_id, spot_ids, starts, ends, list(lots)))
+            }
+
+            results = []
+            for spot_id, starts_at, ends_at in zip(spot_ids, starts, ends):
+                if spot_id not in lots:
+                    results.append(('not_found', None, None))
+                    continue
+                reservation_id = created.pop((spot_id, starts_at, ends_at), None)
+                if reservation_id is None:
+                    results.append(('conflict', None, lots[spot_id]))
+                    continue
+                db.on_commit(lambda args=(lots[spot_id], spot_id, starts_at, ends_at): availability_index.add(*args))
+                results.append(('created', reservation_id, lots[spot_id]))
+            return results
+
+    @staticmethod
+    def find_available_spots(lot_id, starts_at, ends_at):
+        """
+        Fetch the spots of a lot without a reservation overlapping the period.
+
+        Periods in the hot window come from the in-memory availability index;
+        others are searched through the exclusion constraint's GiST index.
+        """
+        spots = availability_index.free_spots(lot_id, starts_at, ends_at, Reservation.load_lot_window)
+        if spots is not None:
+            return spots
+        with Database.transaction() as db:
+            return [
+                {"id": spot[0], "location": spot[1]}
+                for spot in db.fetchall(AVAILABLE_SPOTS, (lot_id, starts_at, ends_at))
+            ]
+
+    @staticmethod
+    def load_lot_window(lot_id, window_start, window_end):
+        """
+        Fetch the spots of a lot and their reservations overlapping a window,
+        as ``(spots, reservations)`` for the availability index.
+        """
+        with Database.transaction() as db:
+            spots = db.fetchall(LOT_SPOT_LOCATIONS, (lot_id,))
+            return spots, db.fetchall(LOT_RESERVATIONS, (lot_id, window_start, window_end))
+
+    @staticmethod
+    def get_reservations_by_user(user_id, fields=FIELDS, filters=None, after=None, limit=100):
+        """
+        Fetch one page of a user's reservations ordered by id.
+
+        Returns:
+            tuple: (reservations, next_cursor) where next_cursor is None on the last page.
+        """
+        columns = page_columns(fields)
+        filters = {**(filters or {}), 'user_id': user_id}
+        query, params = select_page('reservations', columns, Reservation.FILTERS, filters, after, limit + 1)
+        with Database.transaction() as db:
+            rows = db.fetchall(Query.dynamic('list_reservations', db.as_string(query), prepare=True), params)
+            return split_page(rows, columns, fields, limit)
+
+    @staticmethod
+    def stream_reservations_by_user(user_id, fields=FIELDS, filters=None):
+        """
+        Yield every reservation of a user as a dict through a server-side cursor.
+        """
+        filters = {**(filters or {}), 'user_id': user_id}
+        query, params = select_page('reservations', fields, Reservation.FILTERS, filters)
+        with Database.transaction() as db:
+            for row in db.stream(Query.dynamic('export_reservations', db.as_string(query)), params, 'reservation_export'):
+                yield dict(zip(fields, row))
@@ -1,38 +1,100 @@
 from utils.database import Database
-from werkzeug.security import generate_password_hash, check_password_hash
+from utils.query import Query
+from utils.passwords import password_hasher
+from utils.cache import user_cache, normalize_email
+
+CREATE_USER = Query('create_user', """
+    INSERT INTO users (username, password, first_name, last_name, date_of_birth, address, email, gender)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
+""")
+# Run on cache misses at login and for JWT identities
+GET_USER_BY_EMAIL = Query(
+    'get_user_by_email', "SELECT id, username, email, password FROM users WHERE lower(email) = %s ORDER BY id LIMIT 1",
+    prepare=True
+)
+GET_USER_BY_ID = Query('get_user_by_id', "SELECT id, username, email, password FROM users WHERE id = %s", prepare=True)
+UPDATE_PASSWORD = Query('update_password', "UPDATE users SET password = %s WHERE id = %s AND password = %s RETURNING id")
+
+def _record(row):
+    return None if row is None else {"id": row[0], "username": row[1], "email": row[2], "password": row[3]}
 
 class User:
     @staticmethod
     def create_user(username, password, first_name, last_name, date_of_birth, address, email, gender):
-        hashed_password = generate_password_hash(password)
-        connection = Database.get_connection()
-        cursor = connection.cursor()
-        try:
-            cursor.execute("""
-                INSERT INTO users (username, password, first_name, last_name, date_of_birth, address, email, gender)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
-            """, (username, hashed_password, first_name, last_name, date_of_birth, address, email, gender))
-            user_id = cursor.fetchone()[0]
-            connection.commit()
+        hashed_password = password_hasher.hash(password)
+        return User.insert_user(username, hashed_password, first_name, last_name, date_of_birth, address, email, gender)
+
+    @staticmethod
+    def insert_user(username, hashed_password, first_name, last_name, date_of_birth, address, email, gender):
+        """
+        Insert a user whose password is already hashed and return its ID.
+
+        Callers that write more rows in the same transaction hash first, so
+        that no pooled connection is held while the password is hashed.
+        """
+        with Database.transaction() as db:
+            user_id = db.fetchone(
+                CREATE_USER,
+                (username, hashed_password, first_name, last_name, date_of_birth, address, email, gender)
+            )[0]
+            # Drop a cached "unknown email" for this address
+            db.on_commit(lambda: user_cache.invalidate(email=email))
             return user_id
-        except Exception as e:
-            connection.rollback()
-            raise e
-        finally:
-            Database.return_connection(connection)
 
     @staticmethod
     def get_user_by_email(email):
-        connection = Database.get_connection()
-        cursor = connection.cursor()
-        try:
-            cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-            return cursor.fetchone()
-        except Exception as e:
-            raise e
-        finally:
-            Database.return_connection(connection)
+        """
+        Fetch the user with this email (compared case-insensitively) as a dict
+        with id, username, email and password hash, or None. Served from the
+        user cache; unknown emails are cached briefly too. Anything but a
+        string matches no user.
+        """
+        if not isinstance(email, str):
+            return None
+
+        def load():
+            with Database.transaction() as db:
+                return _record(db.fetchone(GET_USER_BY_EMAIL, (normalize_email(email),)))
+        return user_cache.get_by_email(email, load)
+
+    @staticmethod
+    def get_user_by_id(user_id):
+        """
+        Fetch the user with this ID as a dict with id, username and email, or
+        None. Served from the user cache; used to resolve JWT identities.
+        """
+        def load():
+            with Database.transaction() as db:
+                return _record(db.fetchone(GET_USER_BY_ID, (user_id,)))
+        user = user_cache.get_by_id(user_id, load)
+        return None if user is None else {key: value for key, value in user.items() if key != 'password'}
+
+    @staticmethod
+    def update_password_hash(user, new_hash):
+        """Replace the user's password hash unless it was changed concurrently."""
+        with Database.transaction() as db:
+            db.fetchone(UPDATE_PASSWORD, (new_hash, user["id"], user["password"]))
+            db.on_commit(lambda: user_cache.invalidate(user["id"], user["email"]))
 
     @staticmethod
     def verify_password(stored_password, provided_password):
-        return check_password_hash(stored_password, provided_password)
\ No newline at end of file
+        return password_hasher.verify(stored_password, provided_password)[0]
+
+    @staticmethod
+    def authenticate(email, password):
+        """
+        Return the user with this email if the password matches, otherwise None.
+
+        A stored hash made with another method or older parameters is
+        replaced by one with the current settings, unless it was changed
+        concurrently. Raises PasswordPoolBusy when hashing is saturated.
+        """
+        user = User.get_user_by_email(email)
+        if user is None:
+            return None
+        valid, new_hash = password_hasher.verify(user["password"], password)
+        if not valid:
+            return None
+        if new_hash is not None:
+            User.update_password_hash(user, new_hash)
+        return user
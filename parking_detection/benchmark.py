@@ -0,0 +1,200 @@
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tracemalloc
+import cv2
+import numpy as np
+import logging
+from camera_monitor import (
+    SpotMonitor, load_parking_layout, open_capture,
+    PARKING_THRESHOLD, PARKING_POSITIONS_FILE, FRAME_WIDTH, FRAME_HEIGHT,
+)
+from timing import StageTimer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SPOT_GAP = 6  # Pixels between synthetic parking spots
+OCCUPANCY_PATTERNS = ['random', 'churn', 'empty', 'full']
+
+class SyntheticLot:
+    """
+    Generated parking lot: an asphalt background with painted spot outlines
+    and a textured car patch that is pasted into every occupied spot.
+    """
+
+    def __init__(self, spots, width, height, spot_width, spot_height, seed=0):
+        cols = (width - SPOT_GAP) // (spot_width + SPOT_GAP)
+        rows = -(-spots // max(cols, 1))
+        if cols < 1 or SPOT_GAP + rows * (spot_height + SPOT_GAP) > height:
+            raise ValueError(f"Error: {spots} spots of {spot_width}x{spot_height} do not fit in a {width}x{height} frame.")
+
+        self.rng = np.random.default_rng(seed)
+        self.positions = [
+            (SPOT_GAP + (i % cols) * (spot_width + SPOT_GAP), SPOT_GAP + (i // cols) * (spot_height + SPOT_GAP))
+            for i in range(spots)
+        ]
+
+        asphalt = self.rng.normal(90, 6, (height, width)).clip(0, 255).astype(np.uint8)
+        self.empty = cv2.cvtColor(cv2.GaussianBlur(asphalt, (5, 5), 2), cv2.COLOR_GRAY2BGR)
+        self.full = self.empty.copy()
+        self.labels = np.full((height, width), -1, dtype=np.int32)
+        for i, (x, y) in enumerate(self.positions):
+            cv2.rectangle(self.empty, (x - 2, y - 2), (x + spot_width + 1, y + spot_height + 1), (230, 230, 230), 1)
+            car = self.rng.integers(0, 255, (spot_height // 4, spot_width // 4, 3), dtype=np.uint8)
+            self.full[y:y + spot_height, x:x + spot_width] = cv2.resize(car, (spot_width, spot_height), interpolation=cv2.INTER_NEAREST)
+            self.labels[y:y + spot_height, x:x + spot_width] = i
+        self.full[self.labels < 0] = self.empty[self.labels < 0]
+
+    def render(self, occupied):
+        """Compose a frame with the given spots occupied."""
+        mask = np.append(occupied, False)[self.labels]
+        return np.where(mask[..., None], self.full, self.empty)
+
+def occupancy_sequence(pattern, spots, occupancy, churn, rng):
+    """Yield the occupied mask of every frame for an occupancy pattern."""
+    if pattern == 'empty':
+        occupied = np.zeros(spots, dtype=bool)
+    elif pattern == 'full':
+        occupied = np.ones(spots, dtype=bool)
+    else:
+        occupied = rng.random(spots) < occupancy
+    while True:
+        yield occupied
+        if pattern == 'churn':
+            occupied = occupied ^ (rng.random(spots) < churn)
+
+def synthetic_frames(args, lot):
+    rng = np.random.default_rng(args.seed + 1)
+    for occupied in occupancy_sequence(args.pattern, len(lot.positions), args.occupancy, args.churn, rng):
+        yield lot.render(occupied)
+
+def video_frames(path, timer):
+    cap = open_capture(path)
+    if not cap.isOpened():
+        raise ValueError(f"Error: Unable to open video '{path}'.")
+    try:
+        while True:
+            with timer.stage("decode"):
+                success, frame = cap.read()
+            if not success:
+                return
+            yield frame
+    finally:
+        cap.release()
+
+def run_benchmark(args):
+    """Replay frames through the detection pipeline and return the report."""
+    timer = StageTimer()
+
+    if args.video:
+        positions = load_parking_layout(args.positions).boxes
+        spot_width, spot_height = FRAME_WIDTH, FRAME_HEIGHT
+        threshold = args.threshold or PARKING_THRESHOLD
+        frames = video_frames(args.video, timer)
+        source = {"video": args.video, "positions": args.positions}
+    else:
+        spot_width, spot_height = args.spot_width, args.spot_height
+        lot = SyntheticLot(args.spots, args.width, args.height, spot_width, spot_height, args.seed)
+        positions = lot.positions
+        # Scale the default threshold with the spot area
+        threshold = args.threshold or int(PARKING_THRESHOLD * spot_width * spot_height / (FRAME_WIDTH * FRAME_HEIGHT))
+        frames = synthetic_frames(args, lot)
+        source = {
+            "synthetic": True, "spots": args.spots, "resolution": [args.width, args.height],
+            "pattern": args.pattern, "occupancy": args.occupancy, "churn": args.churn,
+        }
+
+    monitor = SpotMonitor(
+        positions, spot_width, spot_height, threshold,
+        roi_mode=args.roi, motion_gating=args.motion, timer=timer,
+    )
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    processed = 0
+    spaces_published = 0
+    wall_start = time.perf_counter()
+    for frame in frames:
+        if processed >= args.frames:
+            break
+        spaces, snapshot = monitor.update(frame, now=processed / args.fps)
+        with timer.stage("publish"):
+            if spaces:
+                json.dumps({'spaces': spaces, 'snapshot': snapshot})
+                spaces_published += len(spaces)
+        processed += 1
+    wall = time.perf_counter() - wall_start
+
+    memory = {"max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    if args.trace_memory:
+        memory["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 2)
+        tracemalloc.stop()
+
+    stages = timer.summary(processed)
+    pipeline_ms = sum(stage["total_ms"] for name, stage in stages.items() if name != "decode")
+    return {
+        "source": source,
+        "config": {
+            "spot_size": [spot_width, spot_height], "threshold": threshold,
+            "roi": args.roi, "motion_gating": args.motion, "frames": args.frames,
+        },
+        "frames": processed,
+        "frames_skipped": monitor.frames_skipped,
+        "spaces_published": spaces_published,
+        "wall_seconds": round(wall, 3),
+        "fps": round(processed / wall, 2) if wall else None,
+        "pipeline_fps": round(processed * 1000 / pipeline_ms, 2) if pipeline_ms else None,
+        "stages": stages,
+        "memory": memory,
+        "environment": {"python": platform.python_version(), "opencv": cv2.__version__, "numpy": np.__version__},
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the parking detection pipeline without a display.")
+    parser.add_argument('--video', help="Replay this video file instead of a synthetic lot.")
+    parser.add_argument('--positions', default=PARKING_POSITIONS_FILE, help="Positions file used with --video.")
+    parser.add_argument('--spots', type=int, default=400, help="Number of synthetic spots.")
+    parser.add_argument('--width', type=int, default=1920, help="Synthetic frame width.")
+    parser.add_argument('--height', type=int, default=1080, help="Synthetic frame height.")
+    parser.add_argument('--spot-width', type=int, default=80, help="Synthetic spot width.")
+    parser.add_argument('--spot-height', type=int, default=36, help="Synthetic spot height.")
+    parser.add_argument('--pattern', choices=OCCUPANCY_PATTERNS, default='random', help="Synthetic occupancy pattern.")
+    parser.add_argument('--occupancy', type=float, default=0.5, help="Fraction of occupied spots for random/churn.")
+    parser.add_argument('--churn', type=float, default=0.01, help="Per-frame probability that a spot flips (churn).")
+    parser.add_argument('--threshold', type=int, help="Occupied pixel threshold (scaled to the spot size by default).")
+    parser.add_argument('--frames', type=int, default=300, help="Number of frames to process.")
+    parser.add_argument('--fps', type=float, default=30.0, help="Frame rate used for the pipeline clock.")
+    parser.add_argument('--roi', action='store_true', help="Enable ROI preprocessing.")
+    parser.add_argument('--motion', action='store_true', help="Enable motion gating.")
+    parser.add_argument('--trace-memory', action='store_true', help="Track the Python allocation peak (slower).")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the JSON report to this file.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        report = run_benchmark(args)
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    for name, stage in report["stages"].items():
+        logger.info(f"{name:>10}: {stage['per_frame_ms']:8.3f} ms/frame (p95 {stage['p95_ms']:.3f} ms)")
+    logger.info(f"{report['frames']} frames, {report['fps']} fps overall, {report['pipeline_fps']} fps pipeline, "
+                f"{report['memory']['max_rss_mb']} MB max RSS")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Report written to {args.output}.")
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,18 @@
 import cv2
-import pickle
 import requests
 import numpy as np
 import os
+import time
 import logging
 from dotenv import load_dotenv
+from occupancy import positions_to_boxes, score_spots
+from roi import build_roi_tiles, process_roi
+from hysteresis import SpotStateTracker
+from motion import MotionGate, MOTION_GATING
+from preview import PreviewServer, HEADLESS, PREVIEW_PORT
+from timing import NULL_TIMER
+from layout import load_layout, SPOT_WIDTH, SPOT_HEIGHT
+from uploader import StatusUploader
 
 # Load environment variables
 load_dotenv()
@@ -17,60 +25,156 @@ logger = logging.getLogger(__name__)
 PARKING_THRESHOLD = int(os.getenv('PARKING_THRESHOLD', 900))
 PARKING_UPDATE_URL = os.getenv('PARKING_UPDATE_URL', 'http://localhost:5000/update_spaces')
 PARKING_POSITIONS_FILE = os.getenv('PARKING_POSITIONS_FILE', 'CarParkPos')
-FRAME_WIDTH, FRAME_HEIGHT = 107, 48
-
-def load_parking_positions(file_path):
-    """Load parking positions from the specified file."""
+CAMERA_SOURCE = os.getenv('CAMERA_SOURCE', '0')
+CAMERA_ID = os.getenv('CAMERA_ID')
+FRAME_WIDTH, FRAME_HEIGHT = SPOT_WIDTH, SPOT_HEIGHT
+ROI_MODE = os.getenv('ROI_MODE', 'False').lower() in ['true', '1', 't', 'yes']
+
+def load_parking_layout(file_path, width=FRAME_WIDTH, height=FRAME_HEIGHT):
+    """
+    Load the spot layout from the specified file.
+
+    ``width`` and ``height`` only apply to legacy pickled positions; layout
+    files carry the size of every spot.
+    """
     try:
-        with open(file_path, 'rb') as f:
-            logger.info(f"Loaded parking positions from {file_path}.")
-            return pickle.load(f)
+        layout = load_layout(file_path, width, height)
+        logger.info(f"Loaded {len(layout.boxes)} parking positions from {file_path}.")
+        return layout
     except FileNotFoundError:
         logger.error(f"Error: '{file_path}' file not found. Exiting...")
         exit()
 
-def check_parking_space(img_pro, positions):
+def check_parking_space(img_pro, positions, threshold=PARKING_THRESHOLD):
     """Check the status of parking spaces and return their statuses."""
-    spaces = []
-    for i, pos in enumerate(positions):
-        x, y = pos
-        img_crop = img_pro[y:y + FRAME_HEIGHT, x:x + FRAME_WIDTH]
-        non_zero_count = cv2.countNonZero(img_crop)
-
-        # Determine if the parking space is free or occupied
-        status = "free" if non_zero_count < PARKING_THRESHOLD else "occupied"
-        spaces.append({"id": i, "status": status})
-    return spaces
-
-def process_frame(frame, positions):
-    """Process a single frame to detect parking spaces."""
-    img_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    img_blur = cv2.GaussianBlur(img_gray, (3, 3), 1)
-    img_threshold = cv2.adaptiveThreshold(
-        img_blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 25, 16
-    )
-    img_median = cv2.medianBlur(img_threshold, 5)
-    img_dilate = cv2.dilate(img_median, np.ones((3, 3), np.uint8), iterations=1)
+    boxes = positions_to_boxes(positions, FRAME_WIDTH, FRAME_HEIGHT)
+    occupied, _ = score_spots(img_pro, boxes, threshold)
+    return [
+        {"id": i, "status": "occupied" if is_occupied else "free"}
+        for i, is_occupied in enumerate(occupied.tolist())
+    ]
+
+def process_frame(frame, positions, tiles=None, timer=NULL_TIMER):
+    """
+    Process a single frame to detect parking spaces.
+
+    When ``tiles`` from ``build_roi_tiles`` are given, only the regions
+    around the parking spots are filtered and the rest of the mask stays zero.
+    ``timer`` records the duration of each filter stage.
+    """
+    if tiles is not None:
+        return process_roi(frame, tiles, lambda region: process_frame(region, positions, timer=timer))
+
+    with timer.stage("grayscale"):
+        img_gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    with timer.stage("blur"):
+        img_blur = cv2.GaussianBlur(img_gray, (3, 3), 1)
+    with timer.stage("threshold"):
+        img_threshold = cv2.adaptiveThreshold(
+            img_blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 25, 16
+        )
+    with timer.stage("median"):
+        img_median = cv2.medianBlur(img_threshold, 5)
+    with timer.stage("dilate"):
+        img_dilate = cv2.dilate(img_median, np.ones((3, 3), np.uint8), iterations=1)
     return img_dilate
 
-def send_status_updates(spaces):
-    """Send parking space status updates to the server."""
+def send_status_updates(spaces, snapshot=False):
+    """
+    Send parking space status updates to the server.
+
+    ``snapshot`` marks a full list of every space rather than only the changed ones.
+    """
     try:
-        response = requests.post(PARKING_UPDATE_URL, json={'spaces': spaces})
+        response = requests.post(PARKING_UPDATE_URL, json={'spaces': spaces, 'snapshot': snapshot})
         if response.status_code != 200:
             logger.error(f"Error: Unable to update spaces on server. Status code: {response.status_code}")
     except requests.exceptions.RequestException as e:
         logger.error(f"HTTP Request failed: {e}")
 
-def process_video_feed():
-    """Process the video feed to monitor parking spaces."""
-    cap = cv2.VideoCapture(0)
+class SpotMonitor:
+    """
+    Per-camera detection pipeline from a captured frame to status updates.
+
+    Holds the spot boxes, the ROI tiles, the optional motion gate and the
+    hysteresis tracker. With motion gating, frames where no spot changed are
+    skipped entirely and only the spots that moved are re-evaluated; the
+    other spots keep their last evaluated status. ``timer`` records the
+    duration of every stage.
+    """
+
+    def __init__(self, positions, width=FRAME_WIDTH, height=FRAME_HEIGHT, threshold=PARKING_THRESHOLD,
+                 roi_mode=ROI_MODE, motion_gating=MOTION_GATING, timer=NULL_TIMER, ids=None):
+        self.positions = positions
+        self.boxes = positions_to_boxes(positions, width, height)
+        self.threshold = threshold
+        self.roi_mode = roi_mode
+        self.tiles = None
+        self.gate = MotionGate(self.boxes) if motion_gating else None
+        self.tracker = SpotStateTracker(ids=ids)
+        self.occupied = np.zeros(len(self.boxes), dtype=bool)
+        self.frames_skipped = 0
+        self.timer = timer
+
+    def update(self, frame, now=None):
+        """
+        Process one frame. Returns ``(spaces, snapshot)`` as given by
+        ``SpotStateTracker.update``, or no spaces when the frame was skipped.
+        """
+        now = time.monotonic() if now is None else now
+
+        # Cover the parking spots with ROI tiles once the frame size is known
+        if self.roi_mode and self.tiles is None:
+            self.tiles = build_roi_tiles(self.boxes, frame.shape)
+            logger.info(f"ROI mode: {len(self.tiles)} tiles cover {len(self.boxes)} spots.")
+
+        evaluate = np.ones(len(self.boxes), dtype=bool)
+        tiles = self.tiles
+        if self.gate is not None:
+            # Spots still waiting for a state change to be confirmed are always re-evaluated
+            with self.timer.stage("motion"):
+                evaluate = self.gate.select(frame, self.tracker.pending(), now)
+            if not evaluate.any():
+                self.frames_skipped += 1
+                return [], False
+            if self.roi_mode and not evaluate.all():
+                tiles = build_roi_tiles(self.boxes[evaluate], frame.shape)
+
+        img_processed = process_frame(frame, self.positions, tiles, self.timer)
+        with self.timer.stage("scoring"):
+            self.occupied[evaluate] = score_spots(img_processed, self.boxes[evaluate], self.threshold)[0]
+        with self.timer.stage("hysteresis"):
+            return self.tracker.update(self.occupied, now)
+
+    def draw(self, frame):
+        """Draw every parking space on the frame, green when free and red when occupied."""
+        for (x, y, w, h), is_occupied in zip(self.boxes.tolist(), self.occupied.tolist()):
+            color = (0, 0, 255) if is_occupied else (0, 255, 0)
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+        return frame
+
+def open_capture(source):
+    """Open a camera index ("0"), video file or stream URI for capture."""
+    return cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+
+def process_video_feed(source=CAMERA_SOURCE, headless=HEADLESS, preview_port=PREVIEW_PORT):
+    """
+    Process the video feed to monitor parking spaces.
+
+    In headless mode nothing is drawn or shown; the annotated frame is only
+    rendered for clients of the preview server, when ``preview_port`` is set.
+    """
+    cap = open_capture(source)
 
     if not cap.isOpened():
         logger.error("Error: Unable to access the camera.")
         return
 
-    positions = load_parking_positions(PARKING_POSITIONS_FILE)
+    layout = load_parking_layout(PARKING_POSITIONS_FILE)
+    monitor = SpotMonitor(layout.boxes, ids=layout.ids)
+    # Spaces are identified on the server by camera and stable spot id
+    uploader = StatusUploader(PARKING_UPDATE_URL, CAMERA_ID or layout.camera_id or 'default').start()
+    preview = PreviewServer(preview_port).start() if preview_port else None
 
     try:
         while True:
@@ -80,29 +184,39 @@ def process_video_feed():
                 break
 
             # Process the frame
-            img_processed = process_frame(frame, positions)
-            spaces = check_parking_space(img_processed, positions)
+            spaces, snapshot = monitor.update(frame)
 
-            # Send status updates
-            send_status_updates(spaces)
+            # Queue only the spaces whose debounced status changed, or a periodic full snapshot
+            if spaces:
+                uploader.submit(spaces, snapshot)
 
-            # Draw rectangles for parking spaces
-            for pos in positions:
-                x, y = pos
-                cv2.rectangle(frame, (x, y), (x + FRAME_WIDTH, y + FRAME_HEIGHT), (0, 255, 0), 2)
+            if headless:
+                # Render only when a preview client is watching
+                if preview:
+                    preview.offer(frame, monitor.draw)
+                continue
 
-            # Show the frame
+            # Draw rectangles for parking spaces and show the frame
+            monitor.draw(frame)
             cv2.imshow("Parking Monitor", frame)
+            if preview:
+                preview.offer(frame, lambda annotated: annotated)
 
             # Exit on 'q' key press
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 logger.info("Exiting monitoring...")
                 break
+    except KeyboardInterrupt:
+        logger.info("Exiting monitoring...")
     finally:
         # Release resources
         cap.release()
-        cv2.destroyAllWindows()
-        logger.info("Camera and resources released.")
+        if not headless:
+            cv2.destroyAllWindows()
+        if preview:
+            preview.stop()
+        uploader.stop()
+        logger.info(f"Camera and resources released. Upload stats: {uploader.stats()}")
 
 if __name__ == "__main__":
     process_video_feed()
\ No newline at end of file
@@ -1,11 +1,15 @@
 import os
 import cv2
-import pickle
 import cvzone
 import numpy as np
 from datetime import datetime
 import logging
 from dotenv import load_dotenv
+from occupancy import score_spots
+from roi import build_roi_tiles, process_roi
+from motion import MotionGate, MOTION_GATING
+from preview import PreviewServer, HEADLESS, PREVIEW_PORT
+from layout import load_layout, SPOT_WIDTH, SPOT_HEIGHT
 
 # Load environment variables
 load_dotenv()
@@ -15,43 +19,52 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Constants
-WIDTH = int(os.getenv('WIDTH', 107))
-HEIGHT = int(os.getenv('HEIGHT', 48))
+WIDTH = int(os.getenv('WIDTH', SPOT_WIDTH))
+HEIGHT = int(os.getenv('HEIGHT', SPOT_HEIGHT))
 THRESHOLD = int(os.getenv('THRESHOLD', 900))
+ROI_MODE = os.getenv('ROI_MODE', 'False').lower() in ['true', '1', 't', 'yes']
 PARKING_POSITIONS_FILE = os.getenv('PARKING_POSITIONS_FILE', 'CarParkPos')
 
 # Initialize video capture
 cap = cv2.VideoCapture(0)  # Default camera (webcam)
 
-# Load parking positions from file
+# Load the spot layout as an (N, 4) int array of x, y, w, h for batched scoring
+# (WIDTH and HEIGHT only apply to legacy pickled positions)
 try:
-    with open(PARKING_POSITIONS_FILE, 'rb') as f:
-        posList = pickle.load(f)
-    logger.info(f"Loaded parking positions: {posList}")
+    spot_boxes = load_layout(PARKING_POSITIONS_FILE, WIDTH, HEIGHT).boxes
+    logger.info(f"Loaded {len(spot_boxes)} parking positions from {PARKING_POSITIONS_FILE}.")
 except FileNotFoundError:
     logger.error(f"Error: '{PARKING_POSITIONS_FILE}' file not found. Ensure the file exists and contains parking positions.")
     exit()
 
-def preprocess_frame(frame):
+# Last evaluated status of every spot, kept across frames skipped by the motion gate
+spot_occupied = np.zeros(len(spot_boxes), dtype=bool)
+motion_gate = MotionGate(spot_boxes) if MOTION_GATING else None
+
+def preprocess_frame(frame, tiles=None):
     """
     Preprocess the input frame for parking space detection.
     - Convert to grayscale
     - Apply Gaussian blur
     - Perform adaptive thresholding
     - Apply median blur and dilation
+
+    When ``tiles`` are given, only the ROI tiles around the spots are processed.
     """
+    if tiles is not None:
+        return process_roi(frame, tiles, preprocess_frame)
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
     blur = cv2.GaussianBlur(gray, (3, 3), 1)
     thresh = cv2.adaptiveThreshold(blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 25, 16)
     median = cv2.medianBlur(thresh, 5)
     return cv2.dilate(median, np.ones((3, 3), np.uint8), iterations=1)
 
-def draw_parking_space(frame, pos, color, status):
+def draw_parking_space(frame, box, color, status):
     """
     Draw a rectangle and status text for a parking space.
     """
-    x, y = pos
-    cv2.rectangle(frame, pos, (x + WIDTH, y + HEIGHT), color, 2)
+    x, y, w, h = box
+    cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
     cvzone.putTextRect(frame, status, (x, y + 9), scale=0.5, thickness=1, offset=0, colorR=color)
 
 def update_free_space_count(frame, free_spaces, total_spaces):
@@ -75,30 +88,47 @@ def display_current_time(frame):
     current_time = datetime.now().strftime("%H:%M:%S")
     cvzone.putTextRect(frame, current_time, (500, 50), scale=1.5, thickness=2, offset=10, colorR=(255, 255, 255))
 
-def check_parking_space(imgPro, frame):
+def check_parking_space(imgPro, evaluate=None):
     """
-    Check the status of parking spaces (free or occupied) and overlay visual indicators.
+    Check the status of parking spaces (free or occupied) and return the free count.
+
+    Only the spots selected by ``evaluate`` are re-scored; when ``imgPro`` is
+    None the last evaluated statuses are kept as they are.
     """
-    space_counter = 0
+    if imgPro is not None:
+        selected = slice(None) if evaluate is None else evaluate
+        spot_occupied[selected] = score_spots(imgPro, spot_boxes[selected], THRESHOLD)[0]
+    return int(len(spot_boxes) - spot_occupied.sum())
 
-    for pos in posList:
-        x, y = pos
-        imgCrop = imgPro[y:y + HEIGHT, x:x + WIDTH]
-        pixel_count = cv2.countNonZero(imgCrop)
+def annotate_frame(frame):
+    """
+    Overlay the status of every parking space, the free space count and the current time.
+    """
+    space_counter = int(len(spot_boxes) - spot_occupied.sum())
 
+    for box, is_occupied in zip(spot_boxes.tolist(), spot_occupied.tolist()):
         # Determine parking space status
-        if pixel_count < THRESHOLD:
-            color, status = (0, 255, 0), "Free"
-            space_counter += 1
-        else:
+        if is_occupied:
             color, status = (0, 0, 255), "Occupied"
+        else:
+            color, status = (0, 255, 0), "Free"
 
         # Draw rectangle and status text for each parking spot
-        draw_parking_space(frame, pos, color, status)
+        draw_parking_space(frame, box, color, status)
 
     # Update free space count
-    update_free_space_count(frame, space_counter, len(posList))
-    return space_counter
+    update_free_space_count(frame, space_counter, len(spot_boxes))
+
+    # Display current time
+    display_current_time(frame)
+    return frame
+
+# ROI tiles are built on the first frame, once the frame size is known
+roi_tiles = None
+
+# In headless mode frames are only rendered for preview clients
+preview = PreviewServer(PREVIEW_PORT).start() if PREVIEW_PORT else None
+last_free_spaces = None
 
 try:
     while True:
@@ -107,22 +137,43 @@ try:
             logger.error("Error: Unable to read camera frame.")
             break
 
-        # Process frame and check parking spaces
-        imgPro = preprocess_frame(frame)
-        free_spaces = check_parking_space(imgPro, frame)
+        if ROI_MODE and roi_tiles is None:
+            roi_tiles = build_roi_tiles(spot_boxes, frame.shape)
 
-        # Display current time
-        display_current_time(frame)
+        # Skip the filter chain when no parking spot changed since it was last evaluated
+        evaluate = motion_gate.select(frame) if motion_gate else None
+        imgPro = None
+        if evaluate is None or evaluate.any():
+            imgPro = preprocess_frame(frame, roi_tiles)
 
-        # Show the frame
+        # Process frame and check parking spaces
+        free_spaces = check_parking_space(imgPro, evaluate)
+
+        if HEADLESS:
+            if free_spaces != last_free_spaces:
+                logger.info(f"Free: {free_spaces}/{len(spot_boxes)}")
+                last_free_spaces = free_spaces
+            if preview:
+                preview.offer(frame, annotate_frame)
+            continue
+
+        # Draw the parking spaces and show the frame
+        annotate_frame(frame)
         cv2.imshow("Parking Lot", frame)
+        if preview:
+            preview.offer(frame, lambda annotated: annotated)
 
         # Break loop on 'q' key press
         if cv2.waitKey(1) & 0xFF == ord('q'):
             logger.info("Exiting program.")
             break
+except KeyboardInterrupt:
+    logger.info("Exiting program.")
 finally:
     # Release camera and close windows
     cap.release()
-    cv2.destroyAllWindows()
+    if not HEADLESS:
+        cv2.destroyAllWindows()
+    if preview:
+        preview.stop()
     logger.info("Camera and resources released.")
\ No newline at end of file
@@ -0,0 +1,84 @@
+import os
+import time
+import numpy as np
+import logging
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+CONFIRM_FRAMES = int(os.getenv('CONFIRM_FRAMES', 5))
+CONFIRM_SECONDS = float(os.getenv('CONFIRM_SECONDS', 0))
+SNAPSHOT_INTERVAL = float(os.getenv('SNAPSHOT_INTERVAL', 60))
+
+class SpotStateTracker:
+    """
+    Per-spot state machine that debounces detections into stable statuses.
+
+    A spot only changes state after the detector has reported the other
+    state for ``confirm_frames`` consecutive frames and for at least
+    ``confirm_seconds``. ``update`` returns just the spots whose accepted
+    state changed, plus a full snapshot every ``snapshot_interval`` seconds
+    so the server can resync. Spaces are identified by ``ids`` when given,
+    otherwise by their index.
+    """
+
+    def __init__(self, confirm_frames=CONFIRM_FRAMES, confirm_seconds=CONFIRM_SECONDS, snapshot_interval=SNAPSHOT_INTERVAL, ids=None):
+        self.confirm_frames = confirm_frames
+        self.confirm_seconds = confirm_seconds
+        self.snapshot_interval = snapshot_interval
+        self.state = None
+        self.streak = None
+        self.pending_since = None
+        self.last_snapshot = 0.0
+        self.ids = None if ids is None else np.asarray(ids).tolist()
+
+    def reset(self, occupied, now):
+        self.state = occupied.copy()
+        self.streak = np.zeros(len(occupied), dtype=np.int32)
+        self.pending_since = np.zeros(len(occupied), dtype=np.float64)
+        self.last_snapshot = now
+
+    def pending(self):
+        """Boolean mask of spots with an unconfirmed state change, or None before the first frame."""
+        return None if self.streak is None else self.streak > 0
+
+    def spaces(self, indices):
+        """Build status payloads for the given spot indices."""
+        ids = self.ids
+        return [
+            {"id": i if ids is None else ids[i], "status": "occupied" if self.state[i] else "free"}
+            for i in np.asarray(indices).tolist()
+        ]
+
+    def update(self, occupied, now=None):
+        """
+        Feed the detector output of one frame.
+
+        Returns a tuple ``(spaces, snapshot)`` with the spaces to publish and
+        whether they are a full snapshot rather than a delta.
+        """
+        now = time.monotonic() if now is None else now
+        occupied = np.asarray(occupied, dtype=bool)
+
+        if self.state is None or len(self.state) != len(occupied):
+            self.reset(occupied, now)
+            return self.spaces(np.arange(len(occupied))), True
+
+        disagree = occupied != self.state
+        self.streak = np.where(disagree, self.streak + 1, 0)
+        self.pending_since = np.where(disagree & (self.streak == 1), now, self.pending_since)
+
+        accepted = disagree & (self.streak >= self.confirm_frames) & (now - self.pending_since >= self.confirm_seconds)
+        self.state[accepted] = occupied[accepted]
+        self.streak[accepted] = 0
+
+        if now - self.last_snapshot >= self.snapshot_interval:
+            self.last_snapshot = now
+            return self.spaces(np.arange(len(self.state))), True
+        return self.spaces(np.flatnonzero(accepted)), False
@@ -0,0 +1,145 @@
+import os
+import sys
+import struct
+import pickle
+import argparse
+import logging
+from collections import namedtuple
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Binary layout format
+#
+#   header (64 bytes, little endian):
+#     magic b'PKLY', version (u16), header size (u16), frame width (u32),
+#     frame height (u32), spot count (u32), camera id (32 bytes, UTF-8, NUL padded),
+#     next id (u32; 0 in files written before it existed)
+#   boxes: spot count x 4 int32 (x, y, w, h)
+#   ids:   spot count int32, stable across edits; ids below next id are never handed out again
+LAYOUT_MAGIC = b'PKLY'
+LAYOUT_VERSION = 1
+HEADER = struct.Struct('<4sHHIII32sI')
+HEADER_SIZE = 64
+CAMERA_ID_SIZE = 32
+
+# Size of a spot. The detectors score boxes of this size, so the editor draws new
+# spots, and every tool converts legacy positions, at the same size.
+SPOT_WIDTH, SPOT_HEIGHT = 107, 48
+
+SpotLayout = namedtuple('SpotLayout', ['camera_id', 'frame_size', 'boxes', 'ids', 'next_id'])
+
+class _PositionsUnpickler(pickle.Unpickler):
+    """Unpickler for legacy CarParkPos files that refuses to import any object."""
+
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from a positions file.")
+
+def is_layout_file(file_path):
+    with open(file_path, 'rb') as f:
+        return f.read(len(LAYOUT_MAGIC)) == LAYOUT_MAGIC
+
+def load_legacy_positions(file_path):
+    """
+    Load a legacy pickled list of (x, y) tuples without executing any code.
+    """
+    with open(file_path, 'rb') as f:
+        positions = _PositionsUnpickler(f).load()
+    if not all(isinstance(pos, (tuple, list)) and len(pos) == 2 and all(isinstance(v, int) for v in pos) for pos in positions):
+        raise ValueError(f"Error: '{file_path}' is not a list of (x, y) positions.")
+    return [tuple(pos) for pos in positions]
+
+def load_layout(file_path, width=None, height=None):
+    """
+    Load a spot layout.
+
+    Layout files are memory-mapped, so ``boxes`` and ``ids`` are read-only
+    views of the file. Legacy pickled positions are still accepted when the
+    spot ``width`` and ``height`` are given; their ids are the list indices.
+    ``next_id`` is the id the next new spot gets: above every id the layout
+    ever held, including removed spots.
+    """
+    if not is_layout_file(file_path):
+        if width is None or height is None:
+            raise ValueError(f"Error: '{file_path}' is a legacy positions file; a spot width and height are required.")
+        positions = load_legacy_positions(file_path)
+        logger.warning(f"'{file_path}' uses the legacy pickle format; convert it with 'python layout.py convert'.")
+        boxes = np.array([(x, y, width, height) for x, y in positions], dtype=np.int32).reshape(-1, 4)
+        return SpotLayout('', (0, 0), boxes, np.arange(len(boxes), dtype=np.int32), len(boxes))
+
+    with open(file_path, 'rb') as f:
+        magic, version, header_size, frame_w, frame_h, count, camera_id, next_id = HEADER.unpack(f.read(HEADER.size))
+    if version > LAYOUT_VERSION:
+        raise ValueError(f"Error: '{file_path}' has layout version {version}, this reader supports up to {LAYOUT_VERSION}.")
+
+    if count:
+        boxes = np.memmap(file_path, dtype='<i4', mode='r', offset=header_size, shape=(count, 4))
+        ids = np.memmap(file_path, dtype='<i4', mode='r', offset=header_size + count * 16, shape=(count,))
+    else:
+        boxes = np.empty((0, 4), dtype=np.int32)
+        ids = np.empty(0, dtype=np.int32)
+    next_id = max(next_id, int(ids.max()) + 1 if count else 0)
+    return SpotLayout(camera_id.rstrip(b'\0').decode('utf-8'), (frame_w, frame_h), boxes, ids, next_id)
+
+def save_layout(file_path, boxes, ids=None, camera_id='', frame_size=(0, 0), next_id=0):
+    """
+    Write a spot layout. The file is replaced atomically, so readers that
+    have the previous version mapped keep a consistent view. ``next_id`` is
+    raised to one above the highest id when lower.
+    """
+    boxes = np.ascontiguousarray(boxes, dtype='<i4').reshape(-1, 4)
+    ids = np.arange(len(boxes)) if ids is None else ids
+    ids = np.ascontiguousarray(ids, dtype='<i4')
+    if len(ids) != len(boxes):
+        raise ValueError("Error: a layout needs exactly one id per spot.")
+    if len(np.unique(ids)) != len(ids):
+        raise ValueError("Error: spot ids in a layout must be unique.")
+    camera_bytes = camera_id.encode('utf-8')
+    if len(camera_bytes) > CAMERA_ID_SIZE:
+        raise ValueError(f"Error: camera id must be at most {CAMERA_ID_SIZE} bytes.")
+
+    next_id = max(next_id, int(ids.max()) + 1 if len(ids) else 0)
+    header = HEADER.pack(LAYOUT_MAGIC, LAYOUT_VERSION, HEADER_SIZE, frame_size[0], frame_size[1], len(boxes), camera_bytes, next_id)
+    temp_path = f"{file_path}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE, b'\0'))
+        f.write(boxes.tobytes())
+        f.write(ids.tobytes())
+    os.replace(temp_path, file_path)
+
+def convert_pickle(pickle_path, layout_path, width, height, camera_id='', frame_size=(0, 0)):
+    """Convert a legacy pickled positions file into a layout file."""
+    layout = load_layout(pickle_path, width, height)
+    save_layout(layout_path, layout.boxes, layout.ids, camera_id, frame_size, layout.next_id)
+    logger.info(f"Converted {len(layout.boxes)} spots from {pickle_path} to {layout_path}.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parking spot layout files.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help="Convert a legacy pickled positions file.")
+    convert.add_argument('source')
+    convert.add_argument('target')
+    convert.add_argument('--width', type=int, default=SPOT_WIDTH, help="Spot width of the legacy positions.")
+    convert.add_argument('--height', type=int, default=SPOT_HEIGHT, help="Spot height of the legacy positions.")
+    convert.add_argument('--camera-id', default='')
+    convert.add_argument('--frame-size', type=int, nargs=2, default=(0, 0), metavar=('WIDTH', 'HEIGHT'))
+
+    info = commands.add_parser('info', help="Show the header of a layout file.")
+    info.add_argument('path')
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'convert':
+            convert_pickle(args.source, args.target, args.width, args.height, args.camera_id, tuple(args.frame_size))
+        else:
+            layout = load_layout(args.path)
+            print(f"camera: {layout.camera_id or '-'}, frame: {layout.frame_size[0]}x{layout.frame_size[1]}, spots: {len(layout.boxes)}")
+    except (OSError, ValueError, pickle.UnpicklingError) as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os
+import time
+import cv2
+import numpy as np
+import logging
+from dotenv import load_dotenv
+from occupancy import box_sums
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+MOTION_GATING = os.getenv('MOTION_GATING', 'False').lower() in ['true', '1', 't', 'yes']
+MOTION_SCALE = int(os.getenv('MOTION_SCALE', 4))
+MOTION_THRESHOLD = float(os.getenv('MOTION_THRESHOLD', 8.0))
+MAX_STALENESS = float(os.getenv('MAX_STALENESS', 30.0))
+
+class MotionGate:
+    """
+    Cheap change detector that decides which spots need a full evaluation.
+
+    Each frame is downscaled by ``scale`` and compared with a reference image
+    holding every spot as it looked when it was last evaluated. A spot is
+    selected when its mean absolute difference exceeds ``threshold`` gray
+    levels, or when it has not been evaluated for ``max_staleness`` seconds.
+    """
+
+    def __init__(self, boxes, scale=MOTION_SCALE, threshold=MOTION_THRESHOLD, max_staleness=MAX_STALENESS):
+        self.boxes = boxes
+        self.scale = scale
+        self.threshold = threshold
+        self.max_staleness = max_staleness
+        self.small_boxes = None
+        self.small_areas = None
+        self.reference = None
+        self.last_evaluated = None
+
+    def downscale(self, frame):
+        small = cv2.resize(frame, None, fx=1 / self.scale, fy=1 / self.scale, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def reset(self, small, now):
+        frame_h, frame_w = small.shape[:2]
+        x0 = np.clip(self.boxes[:, 0] // self.scale, 0, frame_w)
+        y0 = np.clip(self.boxes[:, 1] // self.scale, 0, frame_h)
+        x1 = np.clip(-(-(self.boxes[:, 0] + self.boxes[:, 2]) // self.scale), 0, frame_w)
+        y1 = np.clip(-(-(self.boxes[:, 1] + self.boxes[:, 3]) // self.scale), 0, frame_h)
+        self.small_boxes = np.stack([x0, y0, x1 - x0, y1 - y0], axis=1).astype(np.int32)
+        self.small_areas = np.maximum((x1 - x0) * (y1 - y0), 1)
+        self.reference = small
+        self.last_evaluated = np.full(len(self.boxes), now, dtype=np.float64)
+
+    def select(self, frame, force=None, now=None):
+        """
+        Return a boolean mask of the spots to evaluate on this frame.
+
+        ``force`` can mark extra spots to evaluate regardless of motion. The
+        selected spots are assumed evaluated: their reference image and
+        timestamp are refreshed.
+        """
+        now = time.monotonic() if now is None else now
+        small = self.downscale(frame)
+
+        if self.reference is None or self.reference.shape != small.shape:
+            self.reset(small, now)
+            return np.ones(len(self.boxes), dtype=bool)
+
+        change = box_sums(cv2.absdiff(small, self.reference), self.small_boxes) / self.small_areas
+        evaluate = (change > self.threshold) | (now - self.last_evaluated >= self.max_staleness)
+        if force is not None:
+            evaluate |= force
+
+        if evaluate.all():
+            self.reference = small
+        else:
+            for x, y, w, h in self.small_boxes[evaluate].tolist():
+                self.reference[y:y + h, x:x + w] = small[y:y + h, x:x + w]
+        self.last_evaluated[evaluate] = now
+        return evaluate
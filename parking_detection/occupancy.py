@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def positions_to_boxes(positions, width, height):
+    """
+    Convert parking positions into an (N, 4) int32 array of x, y, w, h.
+
+    Accepts the (x, y) tuples stored in CarParkPos, in which case every spot
+    gets the given width and height, or an existing (N, 4) box array which is
+    returned unchanged.
+    """
+    if isinstance(positions, np.ndarray) and positions.ndim == 2 and positions.shape[1] == 4:
+        return positions
+    boxes = np.empty((len(positions), 4), dtype=np.int32)
+    if len(positions):
+        boxes[:, :2] = np.asarray(positions, dtype=np.int32).reshape(-1, 2)
+    boxes[:, 2] = width
+    boxes[:, 3] = height
+    return boxes
+
+def box_sums(img, boxes):
+    """
+    Sum the pixel values of an image under every box.
+
+    Builds one summed-area table and gathers the four corners of every box at
+    once, so the cost per box is constant. Boxes are clipped to the image the
+    same way slicing ``img[y:y + h, x:x + w]`` would.
+    """
+    frame_h, frame_w = img.shape[:2]
+    integral = cv2.integral(img)
+
+    x0 = np.clip(boxes[:, 0], 0, frame_w)
+    y0 = np.clip(boxes[:, 1], 0, frame_h)
+    x1 = np.clip(boxes[:, 0] + boxes[:, 2], 0, frame_w)
+    y1 = np.clip(boxes[:, 1] + boxes[:, 3], 0, frame_h)
+
+    sums = integral[y1, x1] - integral[y0, x1] - integral[y1, x0] + integral[y0, x0]
+    return np.maximum(sums, 0)
+
+def count_nonzero(img_pro, boxes):
+    """Count the non-zero pixels under every box of a processed frame."""
+    return box_sums((img_pro != 0).view(np.uint8), boxes)
+
+def score_spots(img_pro, boxes, threshold):
+    """
+    Score every parking spot of a processed frame in one pass.
+
+    Returns a tuple ``(occupied, counts)`` where ``occupied`` is a boolean
+    status array (True when the pixel count reaches the threshold) and
+    ``counts`` holds the raw non-zero pixel count of each spot.
+    """
+    counts = count_nonzero(img_pro, boxes)
+    return counts >= threshold, counts
@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+import cv2
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+HEADLESS = os.getenv('HEADLESS', 'False').lower() in ['true', '1', 't', 'yes']
+PREVIEW_HOST = os.getenv('PREVIEW_HOST', '0.0.0.0')
+PREVIEW_PORT = int(os.getenv('PREVIEW_PORT', 0))  # 0 disables the preview server
+PREVIEW_FPS = float(os.getenv('PREVIEW_FPS', 2.0))
+PREVIEW_TIMEOUT = 5.0  # Seconds a snapshot request waits for a rendered frame
+JPEG_QUALITY = 80
+
+class PreviewServer:
+    """
+    On-demand annotated preview over HTTP.
+
+    ``GET /snapshot.jpg`` returns the next rendered frame and
+    ``GET /stream.mjpg`` streams frames as MJPEG. The detection loop hands
+    every frame to ``offer``, which only renders and encodes it while at
+    least one client is connected, and at most ``fps`` times per second.
+    """
+
+    def __init__(self, port=PREVIEW_PORT, host=PREVIEW_HOST, fps=PREVIEW_FPS):
+        self.address = (host, port)
+        self.interval = 1 / fps
+        self.condition = threading.Condition()
+        self.viewers = 0
+        self.jpeg = None
+        self.sequence = 0
+        self.last_render = 0.0
+        self.server = None
+
+    def start(self):
+        preview = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/snapshot.jpg':
+                    preview.serve_snapshot(self)
+                elif self.path == '/stream.mjpg':
+                    preview.serve_stream(self)
+                else:
+                    self.send_error(404)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self.server = ThreadingHTTPServer(self.address, Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="preview-server", daemon=True).start()
+        logger.info(f"Preview available at http://{self.address[0]}:{self.server.server_address[1]}/stream.mjpg")
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def watching(self):
+        return self.viewers > 0
+
+    def offer(self, frame, render):
+        """
+        Publish a frame to connected clients.
+
+        ``render(frame)`` draws the annotations and returns the image to send;
+        it is only called when someone is watching and the rate limit allows.
+        """
+        if not self.viewers:
+            return
+        now = time.monotonic()
+        if now - self.last_render < self.interval:
+            return
+        self.last_render = now
+
+        success, buffer = cv2.imencode('.jpg', render(frame), [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if not success:
+            return
+        with self.condition:
+            self.jpeg = buffer.tobytes()
+            self.sequence += 1
+            self.condition.notify_all()
+
+    def next_frame(self, after):
+        """Wait for a frame newer than sequence number ``after``."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence > after, PREVIEW_TIMEOUT)
+            return self.sequence, self.jpeg if self.sequence > after else None
+
+    def add_viewer(self, delta):
+        with self.condition:
+            self.viewers += delta
+
+    def serve_snapshot(self, handler):
+        self.add_viewer(1)
+        try:
+            _, jpeg = self.next_frame(self.sequence)
+        finally:
+            self.add_viewer(-1)
+        if jpeg is None:
+            handler.send_error(503, "No frame rendered yet")
+            return
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'image/jpeg')
+        handler.send_header('Content-Length', str(len(jpeg)))
+        handler.end_headers()
+        handler.wfile.write(jpeg)
+
+    def serve_stream(self, handler):
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'multipart/x-mixed-replace; boundary=frame')
+        handler.end_headers()
+        self.add_viewer(1)
+        try:
+            sequence = self.sequence
+            while True:
+                sequence, jpeg = self.next_frame(sequence)
+                if jpeg is None:
+                    continue
+                handler.wfile.write(
+                    b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: '
+                    + str(len(jpeg)).encode() + b'\r\n\r\n' + jpeg + b'\r\n'
+                )
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.add_viewer(-1)
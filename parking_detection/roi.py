@@ -0,0 +1,85 @@
+import numpy as np
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Pixels of context the filter chain reads around each output pixel:
+# GaussianBlur 3x3 (1) + adaptiveThreshold 25x25 (12) + medianBlur 5 (2) + dilate 3x3 (1)
+ROI_PADDING = 16
+
+# Side of the grid cells used to cover the parking spots
+ROI_CELL_SIZE = 32
+
+def build_roi_tiles(boxes, frame_shape, cell_size=ROI_CELL_SIZE, padding=ROI_PADDING):
+    """
+    Compute a tiled cover of the parking spots for a given frame size.
+
+    The frame is split into a grid of ``cell_size`` cells, every cell touched
+    by a spot is marked, and runs of marked cells are merged into rectangles
+    (horizontally within a row, then vertically across rows with the same run).
+    Each tile is returned as ``(x0, y0, x1, y1, px0, py0, px1, py1)``: the
+    region whose results are kept and the same region grown by ``padding`` so
+    the filters see the pixels they would see on the full frame.
+    """
+    frame_h, frame_w = frame_shape[:2]
+    rows = -(-frame_h // cell_size)
+    cols = -(-frame_w // cell_size)
+    covered = np.zeros((rows, cols), dtype=bool)
+
+    for x, y, w, h in np.asarray(boxes).tolist():
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, frame_w), min(y + h, frame_h)
+        if x1 <= x0 or y1 <= y0:
+            continue
+        covered[y0 // cell_size:(y1 - 1) // cell_size + 1, x0 // cell_size:(x1 - 1) // cell_size + 1] = True
+
+    # Merge marked cells into horizontal runs, then stack identical runs
+    open_runs = {}
+    merged = []
+    for row in range(rows):
+        runs = []
+        col = 0
+        while col < cols:
+            if covered[row, col]:
+                start = col
+                while col < cols and covered[row, col]:
+                    col += 1
+                runs.append((start, col))
+            col += 1
+        next_open = {}
+        for run in runs:
+            first_row = open_runs.pop(run, row)
+            next_open[run] = first_row
+        merged.extend((run, first_row, row) for run, first_row in open_runs.items())
+        open_runs = next_open
+    merged.extend((run, first_row, rows) for run, first_row in open_runs.items())
+
+    tiles = []
+    for (col0, col1), row0, row1 in merged:
+        x0, y0 = col0 * cell_size, row0 * cell_size
+        x1, y1 = min(col1 * cell_size, frame_w), min(row1 * cell_size, frame_h)
+        tiles.append((
+            x0, y0, x1, y1,
+            max(x0 - padding, 0), max(y0 - padding, 0),
+            min(x1 + padding, frame_w), min(y1 + padding, frame_h),
+        ))
+
+    tiles = np.array(tiles, dtype=np.int32).reshape(-1, 8)
+    covered_area = int(((tiles[:, 6] - tiles[:, 4]) * (tiles[:, 7] - tiles[:, 5])).sum())
+    logger.debug(f"ROI cover: {len(tiles)} tiles, {covered_area / (frame_w * frame_h):.0%} of the frame processed.")
+    return tiles
+
+def process_roi(frame, tiles, process):
+    """
+    Run ``process`` on each padded tile and stitch the results into one mask.
+
+    Pixels outside the tiles are left at zero; inside the tiles the output is
+    identical to running ``process`` on the whole frame.
+    """
+    result = np.zeros(frame.shape[:2], dtype=np.uint8)
+    for x0, y0, x1, y1, px0, py0, px1, py1 in tiles.tolist():
+        processed = process(frame[py0:py1, px0:px1])
+        result[y0:y1, x0:x1] = processed[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+    return result
@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import time
+import queue
+import logging
+import multiprocessing as mp
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+CAMERA_MANIFEST_FILE = os.getenv('CAMERA_MANIFEST_FILE', 'cameras.json')
+PUBLISH_INTERVAL = float(os.getenv('PUBLISH_INTERVAL', 1.0))
+RESTART_DELAY = float(os.getenv('RESTART_DELAY', 1.0))
+MAX_RESTART_DELAY = float(os.getenv('MAX_RESTART_DELAY', 60.0))
+STABLE_RUN_TIME = 60.0  # Seconds a worker must run before its restart delay resets
+
+def load_manifest(file_path):
+    """
+    Load the camera manifest.
+
+    The manifest is a JSON list of cameras, each with an ``id``, a ``source``
+    (camera index, video file or stream URI) and a ``positions_file`` (layout
+    file or legacy pickled positions). ``threshold``, ``roi`` and
+    ``motion_gating`` are optional and default to the camera_monitor settings,
+    as are the ``width`` and ``height`` used for legacy positions.
+    ``preview_port`` enables the on-demand preview server for that camera.
+    """
+    with open(file_path) as f:
+        cameras = json.load(f)
+    ids = [camera['id'] for camera in cameras]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"Error: camera ids in '{file_path}' must be unique.")
+    logger.info(f"Loaded {len(cameras)} cameras from {file_path}.")
+    return cameras
+
+def run_camera_worker(camera, status_queue):
+    """
+    Detection loop for one camera, run in its own process.
+
+    Spaces whose debounced status changed, and periodic full snapshots, are
+    put on the status queue as ``(camera_id, spaces, snapshot)``. The process exits with
+    a non-zero code when the feed cannot be read so the supervisor restarts it.
+    """
+    import camera_monitor
+    from preview import PreviewServer
+
+    camera_id = camera['id']
+    # Legacy pickled positions use the manifest spot size, layout files carry their own
+    layout = camera_monitor.load_parking_layout(
+        camera['positions_file'],
+        camera.get('width', camera_monitor.FRAME_WIDTH),
+        camera.get('height', camera_monitor.FRAME_HEIGHT),
+    )
+    monitor = camera_monitor.SpotMonitor(
+        layout.boxes,
+        threshold=camera.get('threshold', camera_monitor.PARKING_THRESHOLD),
+        roi_mode=camera.get('roi', camera_monitor.ROI_MODE),
+        motion_gating=camera.get('motion_gating', camera_monitor.MOTION_GATING),
+        ids=layout.ids,
+    )
+
+    cap = camera_monitor.open_capture(camera['source'])
+    if not cap.isOpened():
+        logger.error(f"Error: Unable to open source for camera {camera_id}.")
+        sys.exit(1)
+
+    # Workers are always headless; frames are only rendered for preview clients
+    preview = PreviewServer(camera['preview_port']).start() if camera.get('preview_port') else None
+
+    try:
+        while True:
+            success, frame = cap.read()
+            if not success:
+                logger.error(f"Error: Unable to read frame from camera {camera_id}.")
+                sys.exit(1)
+
+            spaces, snapshot = monitor.update(frame)
+            if spaces:
+                status_queue.put((camera_id, spaces, snapshot))
+            if preview:
+                preview.offer(frame, monitor.draw)
+    finally:
+        cap.release()
+        if preview:
+            preview.stop()
+
+class CameraSupervisor:
+    """
+    Run one detection worker process per camera and publish their statuses.
+
+    Crashed workers are restarted with an exponential backoff. Status changes
+    from all cameras are merged per spot and sent in a single update every
+    ``publish_interval`` seconds, as ``publish(spaces, snapshot)``. The update
+    is marked as a snapshot when it includes a camera's full snapshot.
+    """
+
+    def __init__(self, cameras, publish, publish_interval=PUBLISH_INTERVAL):
+        self.cameras = {camera['id']: camera for camera in cameras}
+        self.publish = publish
+        self.publish_interval = publish_interval
+        self.status_queue = mp.Queue()
+        self.workers = {}
+        self.started_at = {}
+        self.restart_delay = {camera_id: RESTART_DELAY for camera_id in self.cameras}
+        self.restart_at = {}
+        self.latest = {}
+        self.snapshot = False
+
+    def start_worker(self, camera_id):
+        worker = mp.Process(
+            target=run_camera_worker,
+            args=(self.cameras[camera_id], self.status_queue),
+            name=f"camera-{camera_id}",
+            daemon=True,
+        )
+        worker.start()
+        self.workers[camera_id] = worker
+        self.started_at[camera_id] = time.monotonic()
+        logger.info(f"Started worker for camera {camera_id} (pid {worker.pid}).")
+
+    def check_workers(self):
+        """Schedule restarts for dead workers and start the ones that are due."""
+        now = time.monotonic()
+        for camera_id, worker in list(self.workers.items()):
+            if worker.is_alive():
+                continue
+            del self.workers[camera_id]
+            if now - self.started_at[camera_id] >= STABLE_RUN_TIME:
+                self.restart_delay[camera_id] = RESTART_DELAY
+            delay = self.restart_delay[camera_id]
+            self.restart_at[camera_id] = now + delay
+            self.restart_delay[camera_id] = min(delay * 2, MAX_RESTART_DELAY)
+            logger.warning(f"Worker for camera {camera_id} exited with code {worker.exitcode}, restarting in {delay:.0f}s.")
+
+        for camera_id, due in list(self.restart_at.items()):
+            if now >= due:
+                del self.restart_at[camera_id]
+                self.start_worker(camera_id)
+
+    def drain(self, timeout):
+        """Collect worker updates, keeping only the latest status per spot."""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                camera_id, spaces, snapshot = self.status_queue.get(timeout=remaining)
+            except queue.Empty:
+                return
+            self.snapshot = self.snapshot or snapshot
+            camera_spaces = self.latest.setdefault(camera_id, {})
+            for space in spaces:
+                camera_spaces[space['id']] = space
+
+    def flush(self):
+        """Publish the pending status changes of all cameras as one update."""
+        if not self.latest:
+            return
+        spaces = [
+            {"camera_id": camera_id, **space}
+            for camera_id, camera_spaces in self.latest.items()
+            for space in camera_spaces.values()
+        ]
+        self.latest = {}
+        snapshot, self.snapshot = self.snapshot, False
+        self.publish(spaces, snapshot)
+
+    def run(self):
+        for camera_id in self.cameras:
+            self.start_worker(camera_id)
+        try:
+            while True:
+                self.drain(self.publish_interval)
+                self.flush()
+                self.check_workers()
+        except KeyboardInterrupt:
+            logger.info("Stopping camera workers...")
+        finally:
+            for worker in self.workers.values():
+                worker.terminate()
+            for worker in self.workers.values():
+                worker.join()
+            logger.info("All camera workers stopped.")
+
+def main():
+    """Start the supervisor for every camera in the manifest."""
+    from camera_monitor import PARKING_UPDATE_URL
+    from uploader import StatusUploader
+
+    manifest_file = sys.argv[1] if len(sys.argv) > 1 else CAMERA_MANIFEST_FILE
+    cameras = load_manifest(manifest_file)
+    uploader = StatusUploader(PARKING_UPDATE_URL).start()
+    try:
+        CameraSupervisor(cameras, uploader.submit).run()
+    finally:
+        uploader.stop()
+        logger.info(f"Upload stats: {uploader.stats()}")
+
+if __name__ == "__main__":
+    main()
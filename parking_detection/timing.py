@@ -0,0 +1,46 @@
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+import numpy as np
+
+class StageTimer:
+    """
+    Collect wall-clock samples for named pipeline stages.
+
+    Use ``with timer.stage("threshold"):`` around each stage. A stage that
+    runs several times per frame (e.g. once per ROI tile) records one sample
+    per call, so per-frame figures come from ``summary(frames)``.
+    """
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples[name].append(time.perf_counter() - start)
+
+    def summary(self, frames):
+        """Per-stage totals in milliseconds, averaged over ``frames``."""
+        result = {}
+        for name, samples in self.samples.items():
+            values = np.array(samples) * 1000
+            result[name] = {
+                "calls": len(values),
+                "total_ms": round(float(values.sum()), 3),
+                "per_frame_ms": round(float(values.sum()) / max(frames, 1), 4),
+                "p50_ms": round(float(np.percentile(values, 50)), 4),
+                "p95_ms": round(float(np.percentile(values, 95)), 4),
+            }
+        return result
+
+class NullTimer:
+    """Timer that records nothing, used when the pipeline is not being measured."""
+
+    def stage(self, name):
+        return nullcontext()
+
+NULL_TIMER = NullTimer()
@@ -0,0 +1,138 @@
+import os
+import time
+import threading
+import requests
+import logging
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+MAX_PENDING_SPOTS = int(os.getenv('MAX_PENDING_SPOTS', 10000))
+UPLOAD_TIMEOUT = float(os.getenv('UPLOAD_TIMEOUT', 5.0))
+UPLOAD_RETRY_DELAY = float(os.getenv('UPLOAD_RETRY_DELAY', 0.5))
+UPLOAD_MAX_RETRY_DELAY = float(os.getenv('UPLOAD_MAX_RETRY_DELAY', 30.0))
+DETECTOR_TOKEN = os.getenv('DETECTOR_TOKEN')
+
+class StatusUploader:
+    """
+    Send parking space updates from a background thread.
+
+    ``submit`` never blocks on the network: updates are merged into a bounded
+    map keyed by (camera_id, spot id), so a spot that changes again before the
+    previous update went out only sends its latest status. The thread posts
+    everything pending in one request over a keep-alive session and retries
+    failed batches with exponential backoff. ``camera_id`` is sent as the
+    default camera of spaces that do not name their own.
+    """
+
+    def __init__(self, url, camera_id=None, max_pending=MAX_PENDING_SPOTS, timeout=UPLOAD_TIMEOUT, token=DETECTOR_TOKEN):
+        self.url = url
+        self.camera_id = camera_id
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.session = requests.Session()
+        if token:
+            self.session.headers['X-Detector-Token'] = token
+        self.pending = {}
+        self.pending_snapshot = False
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.counters = {"submitted": 0, "sent": 0, "coalesced": 0, "dropped": 0, "failed_requests": 0, "retries": 0}
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="status-uploader", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=UPLOAD_TIMEOUT):
+        """Stop the thread after one last attempt to send what is pending."""
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread:
+            self.thread.join(timeout)
+        self.session.close()
+
+    def stats(self):
+        with self.condition:
+            return {**self.counters, "pending": len(self.pending)}
+
+    def merge(self, spaces, overwrite=True):
+        """Add spaces to the pending map. Must be called with the condition held."""
+        for space in spaces:
+            key = (space.get("camera_id"), space["id"])
+            if key in self.pending:
+                if overwrite:
+                    self.pending[key] = space
+                    self.counters["coalesced"] += 1
+            elif len(self.pending) < self.max_pending:
+                self.pending[key] = space
+            else:
+                self.counters["dropped"] += 1
+
+    def submit(self, spaces, snapshot=False):
+        """Queue spaces for upload without waiting on the network."""
+        with self.condition:
+            self.counters["submitted"] += len(spaces)
+            self.merge(spaces)
+            self.pending_snapshot = self.pending_snapshot or snapshot
+            self.condition.notify()
+
+    def post(self, spaces, snapshot):
+        """
+        Post one batch. Returns True when it was delivered or should not be
+        retried, False when the server or network failed.
+        """
+        payload = {'spaces': spaces, 'snapshot': snapshot}
+        if self.camera_id:
+            payload['camera_id'] = self.camera_id
+        try:
+            response = self.session.post(self.url, json=payload, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"HTTP Request failed: {e}")
+            return False
+        if response.status_code == 200:
+            return True
+        logger.error(f"Error: Unable to update spaces on server. Status code: {response.status_code}")
+        # Client errors will not succeed on retry
+        return response.status_code < 500
+
+    def run(self):
+        delay = UPLOAD_RETRY_DELAY
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                batch, self.pending = self.pending, {}
+                snapshot, self.pending_snapshot = self.pending_snapshot, False
+                stopping = not self.running
+
+            delivered = self.post(list(batch.values()), snapshot)
+
+            with self.condition:
+                if delivered:
+                    self.counters["sent"] += len(batch)
+                    delay = UPLOAD_RETRY_DELAY
+                    continue
+                self.counters["failed_requests"] += 1
+                if stopping:
+                    self.counters["dropped"] += len(batch)
+                    return
+                # Newer updates for the same spots win over the failed batch
+                self.merge(batch.values(), overwrite=False)
+                self.pending_snapshot = self.pending_snapshot or snapshot
+                self.counters["retries"] += 1
+                retry_at = time.monotonic() + delay
+                while self.running and time.monotonic() < retry_at:
+                    self.condition.wait(retry_at - time.monotonic())
+                delay = min(delay * 2, UPLOAD_MAX_RETRY_DELAY)
@@ -1,27 +1,53 @@
+import os
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token
+from marshmallow import ValidationError
 from models.user import User
+from models.email_outbox import EmailOutbox
+from utils.database import Database
+from utils.passwords import PasswordPoolBusy, password_hasher
 from utils.schemas import UserSchema
+from utils.codec import schema
+from utils.pool import PoolTimeout
 
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/signup', methods=['POST'])
 def signup():
-    data = request.get_json()
-    errors = UserSchema().validate(data)
-    if errors:
-        return jsonify(errors), 400
     try:
-        user_id = User.create_user(**data)
+        data = schema(UserSchema).load(request.get_json(silent=True) or {})
+    except ValidationError as e:
+        return jsonify(e.messages), 400
+    try:
+        # Hashed before the transaction so that no connection is held meanwhile; the
+        # verification email is queued in the same transaction and sent in the background
+        hashed_password = password_hasher.hash(data.pop('password'))
+        with Database.transaction():
+            user_id = User.insert_user(hashed_password=hashed_password, **data)
+            EmailOutbox.enqueue(
+                "Verify Your Email", [data['email']],
+                f"Please verify your email by clicking this link: {os.getenv('APP_URL')}/verify/{user_id}"
+            )
         return jsonify({"msg": "User created successfully", "user_id": user_id}), 201
+    except PasswordPoolBusy as e:
+        return jsonify({"msg": str(e)}), 503, {"Retry-After": "1"}
+    except PoolTimeout:
+        raise  # Answered with 503 by the app
     except Exception as e:
         return jsonify({"msg": "Error creating user", "error": str(e)}), 500
 
 @auth_bp.route('/login', methods=['POST'])
 def login():
-    data = request.get_json()
-    user = User.get_user_by_email(data.get('email'))
-    if user and User.verify_password(user[2], data.get('password')):
-        access_token = create_access_token(identity=user[0])
+    data = request.get_json(silent=True)
+    password = data.get('password') if isinstance(data, dict) else None
+    if not isinstance(password, str):
+        return jsonify({"msg": "Invalid credentials"}), 401
+    try:
+        user = User.authenticate(data.get('email'), password)
+    except PasswordPoolBusy as e:
+        return jsonify({"msg": str(e)}), 503, {"Retry-After": "1"}
+    if user:
+        # PyJWT requires the subject to be a string
+        access_token = create_access_token(identity=str(user["id"]))
         return jsonify({"access_token": access_token}), 200
     return jsonify({"msg": "Invalid credentials"}), 401
\ No newline at end of file
@@ -0,0 +1,47 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from models.occupancy_history import OccupancyHistory
+from utils.schemas import parse_history_range
+from utils.pool import PoolTimeout
+
+history_bp = Blueprint('history', __name__)
+
+@history_bp.route('/history/spots/<int:spot_id>', methods=['GET'])
+@jwt_required()
+def spot_history(spot_id):
+    """
+    Occupied minutes of a spot per hour or day.
+
+    Query arguments: ``from``, ``to`` (ISO 8601) and ``granularity`` (hour or day).
+    """
+    try:
+        start, end, granularity = parse_history_range(request.args)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    try:
+        periods = OccupancyHistory.get_spot_occupancy(spot_id, start, end, granularity)
+        return jsonify({"spot_id": spot_id, "granularity": granularity, "periods": periods}), 200
+    except PoolTimeout:
+        raise  # Answered with 503 by the app
+    except Exception as e:
+        return jsonify({"msg": "Error fetching spot history", "error": str(e)}), 500
+
+@history_bp.route('/history/lots/<lot_id>', methods=['GET'])
+@jwt_required()
+def lot_history(lot_id):
+    """
+    Occupied spot-minutes and peak occupancy of a lot per hour or day.
+
+    Query arguments: ``from``, ``to`` (ISO 8601) and ``granularity`` (hour or day).
+    """
+    try:
+        start, end, granularity = parse_history_range(request.args)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    try:
+        periods = OccupancyHistory.get_lot_occupancy(lot_id, start, end, granularity)
+        return jsonify({"lot_id": lot_id, "granularity": granularity, "periods": periods}), 200
+    except PoolTimeout:
+        raise  # Answered with 503 by the app
+    except Exception as e:
+        return jsonify({"msg": "Error fetching lot history", "error": str(e)}), 500
@@ -0,0 +1,42 @@
+import hmac
+from flask import Blueprint, request, jsonify, current_app
+from models.parking_spot import ParkingSpot
+from utils.schemas import parse_space_updates
+from utils.realtime import broadcaster
+from utils.pool import PoolTimeout
+
+ingest_bp = Blueprint('ingest', __name__)
+
+@ingest_bp.route('/update_spaces', methods=['POST'])
+def update_spaces():
+    """
+    Endpoint for detector status batches from one or many cameras.
+
+    Detectors authenticate with the shared ``X-Detector-Token`` header. Updates
+    are refused while DETECTOR_TOKEN is not configured, since they register new
+    spots and are broadcast to every lot.
+    """
+    token = current_app.config.get('DETECTOR_TOKEN')
+    if not token:
+        current_app.logger.error("Error: detector update refused, DETECTOR_TOKEN is not set.")
+        return jsonify({"msg": "Detector updates are not configured"}), 503
+    if not hmac.compare_digest(request.headers.get('X-Detector-Token', ''), token):
+        return jsonify({"msg": "Invalid detector token"}), 401
+
+    try:
+        camera_ids, spot_ids, occupied = parse_space_updates(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    if not spot_ids:
+        return jsonify({"received": 0, "changed": 0}), 200
+
+    try:
+        changed = ParkingSpot.bulk_update_status(camera_ids, spot_ids, occupied)
+        for spot_id, _, _, is_occupied, lot_id in changed:
+            broadcaster.publish(lot_id, spot_id, is_occupied=is_occupied)
+        return jsonify({"received": len(spot_ids), "changed": len(changed)}), 200
+    except PoolTimeout:
+        raise  # Answered with 503 by the app
+    except Exception as e:
+        current_app.logger.error(f"Error updating spaces: {str(e)}")
+        return jsonify({"msg": "Error updating spaces", "error": str(e)}), 500
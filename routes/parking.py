@@ -1,59 +1,184 @@
+import os
+import sys
 import cv2
-import pickle
+import numpy as np
 import logging
+from collections import defaultdict
+
+# Add the parking detection folder to the Python path
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'parking_detection'))
+
+from layout import load_layout, save_layout, SPOT_WIDTH, SPOT_HEIGHT
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Parking spot dimensions
-WIDTH = 26
-HEIGHT = 58
+# Dimensions of new parking spots (and of spots in legacy pickled files), the size the detectors score
+WIDTH = SPOT_WIDTH
+HEIGHT = SPOT_HEIGHT
 
-# File to store parking positions
+# File to store parking positions (edits since it was last written go to '<file>.journal')
 PARKING_POSITIONS_FILE = 'CarParkPos'
 
-def load_positions():
-    """
-    Load existing parking positions from a file.
-    If the file doesn't exist, return an empty list.
-    """
-    try:
-        with open(PARKING_POSITIONS_FILE, 'rb') as f:
-            positions = pickle.load(f)
-            logger.info("Loaded parking positions from file.")
-            return positions
-    except FileNotFoundError:
-        logger.info("No existing positions found. Starting fresh.")
-        return []
+# Number of journaled edits after which the layout file is rewritten and the journal cleared
+COMPACT_EVERY = 500
 
-def save_positions(positions):
-    """
-    Save the parking positions to a file.
-    """
-    with open(PARKING_POSITIONS_FILE, 'wb') as f:
-        pickle.dump(positions, f)
-    logger.info("Parking positions saved.")
+# Side of the grid cells used to find the spot under a click
+GRID_CELL_SIZE = 64
 
-def add_spot(positions, x, y):
+class SpotGrid:
     """
-    Add a new parking spot at the specified coordinates.
+    Grid-bucketed spatial index of parking spots.
+
+    Every spot is registered in each cell its rectangle overlaps, so a click
+    only has to be tested against the few spots sharing its cell.
     """
-    positions.append((x, y))
-    logger.info(f"Added spot at {x}, {y}")
-    save_positions(positions)
 
-def remove_spot(positions, x, y):
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = defaultdict(set)
+
+    def cells_for(self, x, y, w, h):
+        size = self.cell_size
+        for cx in range(x // size, (x + w) // size + 1):
+            for cy in range(y // size, (y + h) // size + 1):
+                yield cx, cy
+
+    def add(self, spot_id, box):
+        for cell in self.cells_for(*box):
+            self.cells[cell].add(spot_id)
+
+    def remove(self, spot_id, box):
+        for cell in self.cells_for(*box):
+            self.cells[cell].discard(spot_id)
+            if not self.cells[cell]:
+                del self.cells[cell]
+
+    def hit(self, spots, x, y):
+        """Return the id of the oldest spot containing the point, or None."""
+        candidates = self.cells.get((x // self.cell_size, y // self.cell_size), ())
+        hits = [
+            spot_id for spot_id in candidates
+            if spots[spot_id][0] < x < spots[spot_id][0] + spots[spot_id][2]
+            and spots[spot_id][1] < y < spots[spot_id][1] + spots[spot_id][3]
+        ]
+        return min(hits) if hits else None
+
+class LayoutEditor:
     """
-    Remove a parking spot at the specified coordinates.
+    Editable spot layout backed by a layout file and an append-only journal.
+
+    Each edit appends one line (``add`` or ``remove`` with the spot id and
+    box) to the journal instead of rewriting the layout. On load, the journal
+    is replayed on top of the layout file. Every ``compact_every`` edits, and
+    on close, the layout is rewritten and the journal cleared. Undo applies
+    the inverse of the last edit and journals it like any other edit.
+
+    Ids are never reused: the server keys spot status and history on them.
+    ``next_id`` only grows; the layout file stores it, and every journaled
+    edit carries its id, so removed spots keep their ids reserved.
     """
-    for i, pos in enumerate(positions):
-        x1, y1 = pos
-        if x1 < x < x1 + WIDTH and y1 < y < y1 + HEIGHT:  # Check if click is within a spot
-            positions.pop(i)
-            logger.info(f"Removed spot at {x1}, {y1}")
-            save_positions(positions)
-            break
+
+    def __init__(self, layout_file=PARKING_POSITIONS_FILE, journal_file=None, compact_every=COMPACT_EVERY):
+        self.layout_file = layout_file
+        self.journal_file = journal_file or f"{layout_file}.journal"
+        self.compact_every = compact_every
+        self.spots = {}
+        self.grid = SpotGrid()
+        self.history = []
+        self.journaled = 0
+        self.version = 0
+        self.next_id = 0
+        self.load()
+        self.journal = open(self.journal_file, 'a')
+
+    def load(self):
+        try:
+            layout = load_layout(self.layout_file, WIDTH, HEIGHT)
+            for spot_id, box in zip(layout.ids.tolist(), layout.boxes.tolist()):
+                self.apply('add', spot_id, tuple(box))
+            self.next_id = max(self.next_id, layout.next_id)
+            logger.info("Loaded parking positions from file.")
+        except FileNotFoundError:
+            logger.info("No existing positions found. Starting fresh.")
+
+        try:
+            with open(self.journal_file) as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) != 6 or parts[0] not in ('add', 'remove'):
+                        logger.warning(f"Skipping malformed journal entry: {line.strip()}")
+                        continue
+                    op, spot_id, *box = parts[0], *map(int, parts[1:])
+                    self.apply(op, spot_id, tuple(box))
+                    self.history.append((op, spot_id, tuple(box)))
+                    self.journaled += 1
+            logger.info(f"Replayed {self.journaled} journaled edits.")
+        except FileNotFoundError:
+            pass
+
+    def apply(self, op, spot_id, box):
+        if op == 'add':
+            self.spots[spot_id] = box
+            self.grid.add(spot_id, box)
+            self.next_id = max(self.next_id, spot_id + 1)
+        else:
+            self.spots.pop(spot_id, None)
+            self.grid.remove(spot_id, box)
+        self.version += 1
+
+    def record(self, op, spot_id, box):
+        """Apply an edit and append it to the journal."""
+        self.apply(op, spot_id, box)
+        self.journal.write(f"{op} {spot_id} {' '.join(map(str, box))}\n")
+        self.journal.flush()
+        self.journaled += 1
+        if self.journaled >= self.compact_every:
+            self.compact()
+
+    def add_spot(self, x, y, w=WIDTH, h=HEIGHT):
+        """Add a new parking spot at the specified coordinates with a new stable id."""
+        spot_id = self.next_id
+        self.record('add', spot_id, (x, y, w, h))
+        self.history.append(('add', spot_id, (x, y, w, h)))
+        logger.info(f"Added spot {spot_id} at {x}, {y}")
+        return spot_id
+
+    def remove_spot(self, x, y):
+        """Remove the parking spot under the specified coordinates, if any."""
+        spot_id = self.grid.hit(self.spots, x, y)
+        if spot_id is None:
+            return None
+        box = self.spots[spot_id]
+        self.record('remove', spot_id, box)
+        self.history.append(('remove', spot_id, box))
+        logger.info(f"Removed spot {spot_id} at {box[0]}, {box[1]}")
+        return spot_id
+
+    def undo(self):
+        """Revert the last edit. Returns False when there is nothing to undo."""
+        if not self.history:
+            return False
+        op, spot_id, box = self.history.pop()
+        self.record('remove' if op == 'add' else 'add', spot_id, box)
+        logger.info(f"Undid {op} of spot {spot_id}")
+        return True
+
+    def compact(self):
+        """Write the current layout and clear the journal."""
+        ids = sorted(self.spots)
+        save_layout(self.layout_file, np.array([self.spots[i] for i in ids], dtype=np.int32).reshape(-1, 4), ids,
+                    next_id=self.next_id)
+        self.journal.truncate(0)
+        self.journal.seek(0)
+        self.journaled = 0
+        logger.info("Parking positions saved.")
+
+    def close(self):
+        if self.journaled:
+            self.compact()
+        self.journal.close()
 
 def mouseClick(events, x, y, flags, params):
     """
@@ -62,18 +187,21 @@ def mouseClick(events, x, y, flags, params):
     - Left-click to add a new parking spot.
     - Right-click to remove an existing parking spot.
     """
-    positions = params['positions']
+    editor = params['editor']
     if events == cv2.EVENT_LBUTTONDOWN:  # Add a parking spot
-        add_spot(positions, x, y)
+        editor.add_spot(x, y)
     elif events == cv2.EVENT_RBUTTONDOWN:  # Remove a parking spot
-        remove_spot(positions, x, y)
+        editor.remove_spot(x, y)
 
 def main():
     """
     Main function to run the parking spot management application.
+
+    - Left-click to add a spot, right-click to remove one.
+    - Press 'u' to undo the last edit and 'q' to quit.
     """
-    # Load existing parking positions
-    posList = load_positions()
+    # Load existing parking positions and replay unsaved edits
+    editor = LayoutEditor()
 
     # Initialize video capture
     cap = cv2.VideoCapture(0)  # Use the default camera
@@ -82,6 +210,13 @@ def main():
         logger.error("Error: Could not open video capture.")
         exit()
 
+    # Set up mouse click callback once
+    cv2.namedWindow("Parking Spot Manager")
+    cv2.setMouseCallback("Parking Spot Manager", mouseClick, {'editor': editor})
+
+    # Spot rectangles are drawn on an overlay that is only redrawn after an edit
+    overlay, overlay_mask, overlay_version = None, None, -1
+
     try:
         while True:
             success, img = cap.read()
@@ -89,25 +224,32 @@ def main():
                 logger.error("Error: Unable to read camera frame.")
                 break
 
+            if overlay is None or overlay.shape != img.shape or overlay_version != editor.version:
+                overlay = np.zeros_like(img)
+                for x, y, w, h in editor.spots.values():
+                    cv2.rectangle(overlay, (x, y), (x + w, y + h), (255, 0, 255), 2)
+                overlay_mask = overlay.any(axis=2)
+                overlay_version = editor.version
+
             # Draw rectangles for existing parking spots
-            for pos in posList:
-                cv2.rectangle(img, pos, (pos[0] + WIDTH, pos[1] + HEIGHT), (255, 0, 255), 2)
+            img[overlay_mask] = overlay[overlay_mask]
 
             # Display the video feed with parking spots
             cv2.imshow("Parking Spot Manager", img)
 
-            # Set up mouse click callback
-            cv2.setMouseCallback("Parking Spot Manager", mouseClick, {'positions': posList})
-
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('u'):
+                editor.undo()
             # Press 'q' to quit the application
-            if cv2.waitKey(1) & 0xFF == ord('q'):
+            elif key == ord('q'):
                 logger.info("Exiting application.")
                 break
     finally:
         # Release resources
         cap.release()
         cv2.destroyAllWindows()
+        editor.close()
         logger.info("Camera and resources released.")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
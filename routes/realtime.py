@@ -0,0 +1,35 @@
+from flask import current_app
+from flask_jwt_extended import decode_token
+from flask_socketio import join_room, leave_room, emit
+from extensions import socketio
+from models.parking_spot import ParkingSpot
+from utils.realtime import lot_room
+
+@socketio.on('connect')
+def connect(auth=None):
+    """
+    Accept SocketIO clients that send a valid access token as ``{"token": ...}`` in the auth payload.
+    """
+    try:
+        decode_token((auth or {}).get('token', ''))
+    except Exception:
+        return False
+
+@socketio.on('subscribe')
+def subscribe(data):
+    """
+    Join the room of a lot and receive its current spots as ``spot_snapshot``.
+    Changes then arrive as ``spot_updates`` messages.
+    """
+    lot_id = (data or {}).get('lot_id', 'default')
+    join_room(lot_room(lot_id))
+    try:
+        emit('spot_snapshot', {"lot_id": lot_id, "spots": ParkingSpot.get_lot_spots(lot_id)})
+    except Exception as e:
+        current_app.logger.error(f"Error fetching spot snapshot: {str(e)}")
+        emit('error', {"msg": "Error fetching parking spots"})
+
+@socketio.on('unsubscribe')
+def unsubscribe(data):
+    """Leave the room of a lot."""
+    leave_room(lot_room((data or {}).get('lot_id', 'default')))
@@ -1,30 +1,139 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from marshmallow import ValidationError, EXCLUDE
+from psycopg2 import errors
 from models.reservation import Reservation
-from utils.schemas import ReservationSchema
+from utils.schemas import ReservationSchema, parse_list_args, load_batch, MAX_BATCH_RESERVATIONS
+from utils.realtime import broadcaster
+from utils.codec import schema
+from utils.pagination import paginated_response, json_array_chunks
+from utils.pool import PoolTimeout
 
 reservation_bp = Blueprint('reservation', __name__)
 
 @reservation_bp.route('/reserve', methods=['POST'])
 @jwt_required()
 def reserve():
-    data = request.get_json()
-    errors = ReservationSchema().validate(data)
-    if errors:
-        return jsonify(errors), 400
+    try:
+        data = schema(ReservationSchema).load(request.get_json())
+    except ValidationError as e:
+        return jsonify(e.messages), 400
     try:
         user_id = get_jwt_identity()
-        reservation_id = Reservation.create_reservation(data['spot_id'], user_id, data['time'])
+        reservation_id, lot_id = Reservation.create_reservation(
+            data['spot_id'], user_id, data['starts_at'], data['ends_at']
+        )
+        if lot_id is not None:
+            broadcaster.publish(lot_id, data['spot_id'], reserved_at=data['starts_at'].isoformat(),
+                                reserved_until=data['ends_at'].isoformat())
         return jsonify({"msg": "Reservation created successfully", "reservation_id": reservation_id}), 201
+    except errors.ExclusionViolation:
+        return jsonify({"msg": "The spot is already reserved for an overlapping period."}), 409
+    except PoolTimeout:
+        raise  # Answered with 503 by the app
     except Exception as e:
         return jsonify({"msg": "Error creating reservation", "error": str(e)}), 500
 
+@reservation_bp.route('/reserve/batch', methods=['POST'])
+@jwt_required()
+def reserve_batch():
+    """
+    Endpoint to create many reservations for the caller in one transaction.
+
+    Body: ``{"reservations": [{"spot_id": int, "starts_at": str, "ends_at": str}, ...]}``.
+    Each reservation is reported as created, invalid, conflict (overlaps an
+    existing or earlier reservation) or not_found.
+    """
+    try:
+        valid, results = load_batch(
+            request.get_json(silent=True), 'reservations',
+            schema(ReservationSchema, partial=('user_id',)), MAX_BATCH_RESERVATIONS
+        )
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    if not valid:
+        return jsonify({"created": 0, "results": results}), 400
+
+    try:
+        outcomes = Reservation.create_reservations(
+            get_jwt_identity(),
+            [item['spot_id'] for _, item in valid],
+            [item['starts_at'] for _, item in valid],
+            [item['ends_at'] for _, item in valid],
+        )
+    except PoolTimeout:
+        raise  # Answered with 503 by the app
+    except Exception as e:
+        return jsonify({"msg": "Error creating reservations", "error": str(e)}), 500
+
+    created = 0
+    for (index, item), (status, reservation_id, lot_id) in zip(valid, outcomes):
+        result = {"index": index, "status": status}
+        if status == 'created':
+            created += 1
+            result["reservation_id"] = reservation_id
+            broadcaster.publish(lot_id, item['spot_id'], reserved_at=item['starts_at'].isoformat(),
+                                reserved_until=item['ends_at'].isoformat())
+        results.append(result)
+    results.sort(key=lambda result: result["index"])
+    return jsonify({"created": created, "results": results}), 201 if created == len(results) else 207
+
+@reservation_bp.route('/availability', methods=['GET'])
+@jwt_required()
+def availability():
+    """
+    Endpoint listing the spots of a lot that are free for a whole period.
+
+    Query arguments: ``lot_id`` (default 'default'), ``starts_at`` and ``ends_at`` (ISO 8601).
+    """
+    lot_id = request.args.get('lot_id', 'default')
+    try:
+        period = schema(ReservationSchema, only=('starts_at', 'ends_at'), unknown=EXCLUDE).load(request.args.to_dict())
+    except ValidationError as e:
+        return jsonify(e.messages), 400
+    try:
+        spots = Reservation.find_available_spots(lot_id, period['starts_at'], period['ends_at'])
+        return jsonify({
+            "lot_id": lot_id,
+            "starts_at": period['starts_at'].isoformat(),
+            "ends_at": period['ends_at'].isoformat(),
+            "spots": spots,
+        }), 200
+    except PoolTimeout:
+        raise  # Answered with 503 by the app
+    except Exception as e:
+        return jsonify({"msg": "Error searching availability", "error": str(e)}), 500
+
 @reservation_bp.route('/my-reservations', methods=['GET'])
 @jwt_required()
 def my_reservations():
+    """
+    Endpoint to fetch the caller's reservations, one page at a time.
+
+    Query arguments: ``fields``, ``after``, ``limit`` and ``spot_id``.
+    """
+    try:
+        fields, filters, after, limit = parse_list_args(request.args, Reservation.FIELDS, Reservation.FILTERS)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
     try:
         user_id = get_jwt_identity()
-        reservations = Reservation.get_reservations_by_user(user_id)
-        return jsonify(reservations), 200
+        reservations, next_cursor = Reservation.get_reservations_by_user(user_id, fields, filters, after, limit)
+        return paginated_response(reservations, next_cursor), 200
+    except PoolTimeout:
+        raise  # Answered with 503 by the app
     except Exception as e:
-        return jsonify({"msg": "Error fetching reservations", "error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"msg": "Error fetching reservations", "error": str(e)}), 500
+
+@reservation_bp.route('/my-reservations/export', methods=['GET'])
+@jwt_required()
+def export_my_reservations():
+    """
+    Endpoint streaming all of the caller's reservations as one JSON array.
+    """
+    try:
+        fields, filters, _, _ = parse_list_args(request.args, Reservation.FIELDS, Reservation.FILTERS)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    rows = Reservation.stream_reservations_by_user(get_jwt_identity(), fields, filters)
+    return Response(stream_with_context(json_array_chunks(rows, current_app.json.dumps)), mimetype='application/json')
@@ -0,0 +1,148 @@
+import hashlib
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from flask_jwt_extended import jwt_required
+from models.parking_spot import ParkingSpot
+from utils.schemas import ParkingSpotSchema, parse_list_args, load_batch, MAX_BATCH_SPOTS
+from utils.pagination import with_cursor, json_array_chunks
+from utils.cache import spot_cache
+from utils.realtime import broadcaster
+from utils.codec import schema
+from utils.pool import PoolTimeout
+
+spots_bp = Blueprint('spots', __name__)
+
+@spots_bp.route('/parking_spots', methods=['GET'])
+@jwt_required()
+def get_parking_spots():
+    """
+    Endpoint to fetch parking spots, one page at a time.
+
+    Query arguments: ``fields`` (comma separated), ``after`` (cursor from the
+    ``X-Next-Cursor`` header of the previous page), ``limit`` and the filters
+    ``lot_id``, ``camera_id``, ``is_reserved``, ``is_occupied`` and ``free``.
+
+    Pages are served from the spot cache with an ``ETag``; a matching
+    ``If-None-Match`` gets a 304 without touching the database.
+    """
+    try:
+        fields, filters, after, limit = parse_list_args(
+            request.args, ParkingSpot.FIELDS, ParkingSpot.FILTERS, ParkingSpot.DEFAULT_FIELDS
+        )
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    def load():
+        spots, next_cursor = ParkingSpot.list_spots(fields, filters, after, limit)
+        body = current_app.json.dumps(spots)
+        return {"body": body, "etag": hashlib.sha1(body.encode()).hexdigest(), "next_cursor": next_cursor}
+
+    try:
+        key = repr((fields, sorted(filters.items()), after, limit))
+        page = spot_cache.get_or_load(key, ParkingSpot.cache_versions(fields, filters), load)
+        response = with_cursor(Response(page["body"], mimetype='application/json'), page["next_cursor"])
+        response.set_etag(page["etag"])
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+    except PoolTimeout:
+        raise  # Answered with 503 by the app
+    except Exception as e:
+        current_app.logger.error(f"Error fetching parking spots: {str(e)}")
+        return jsonify({"msg": "Error fetching parking spots", "error": str(e)}), 500
+
+@spots_bp.route('/parking_spots/export', methods=['GET'])
+@jwt_required()
+def export_parking_spots():
+    """
+    Endpoint streaming every matching parking spot as one JSON array.
+
+    Accepts the ``fields`` and filter arguments of ``GET /parking_spots``.
+    """
+    try:
+        fields, filters, _, _ = parse_list_args(
+            request.args, ParkingSpot.FIELDS, ParkingSpot.FILTERS, ParkingSpot.DEFAULT_FIELDS
+        )
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    rows = ParkingSpot.stream_spots(fields, filters)
+    return Response(stream_with_context(json_array_chunks(rows, current_app.json.dumps)), mimetype='application/json')
+
+@spots_bp.route('/parking_spots', methods=['POST'])
+@jwt_required()
+def add_parking_spot():
+    """
+    Endpoint to add a new parking spot.
+    """
+    data = request.get_json()
+    errors = schema(ParkingSpotSchema).validate(data)
+    if errors:
+        return jsonify(errors), 400
+
+    location = data.get('location')
+    is_reserved = data.get('is_reserved', False)
+
+    try:
+        spot_id, lot_id = ParkingSpot.add_spot(f"({location[0]},{location[1]})", is_reserved)
+        broadcaster.publish(lot_id, spot_id, event="added", location=f"({location[0]},{location[1]})",
+                            is_reserved=is_reserved, is_occupied=False)
+        return jsonify({"msg": "Parking spot added successfully", "id": spot_id}), 201
+    except PoolTimeout:
+        raise  # Answered with 503 by the app
+    except Exception as e:
+        current_app.logger.error(f"Error adding parking spot: {str(e)}")
+        return jsonify({"msg": "Error adding parking spot", "error": str(e)}), 500
+
+@spots_bp.route('/parking_spots/batch', methods=['POST'])
+@jwt_required()
+def add_parking_spots():
+    """
+    Endpoint to add many parking spots to a lot in one transaction.
+
+    Body: ``{"lot_id": str (optional), "spots": [{"location": [x, y], "is_reserved": bool}, ...]}``.
+    Valid spots are inserted together; the response has one result per spot.
+    """
+    data = request.get_json(silent=True)
+    try:
+        valid, results = load_batch(data, 'spots', schema(ParkingSpotSchema, partial=('id',)), MAX_BATCH_SPOTS)
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+    if not valid:
+        return jsonify({"created": 0, "results": results}), 400
+
+    lot_id = data.get('lot_id', 'default')
+    if not isinstance(lot_id, str) or not lot_id:
+        return jsonify({"msg": "'lot_id' must be a non-empty string."}), 400
+    locations = [f"({spot['location'][0]:g},{spot['location'][1]:g})" for _, spot in valid]
+    reserved = [spot['is_reserved'] for _, spot in valid]
+    try:
+        spot_ids = ParkingSpot.add_spots(lot_id, locations, reserved)
+    except PoolTimeout:
+        raise  # Answered with 503 by the app
+    except Exception as e:
+        current_app.logger.error(f"Error adding parking spots: {str(e)}")
+        return jsonify({"msg": "Error adding parking spots", "error": str(e)}), 500
+
+    for (index, _), spot_id, location, is_reserved in zip(valid, spot_ids, locations, reserved):
+        results.append({"index": index, "status": "created", "id": spot_id})
+        broadcaster.publish(lot_id, spot_id, event="added", location=location, is_reserved=is_reserved, is_occupied=False)
+    results.sort(key=lambda result: result["index"])
+    return jsonify({"created": len(spot_ids), "results": results}), 201 if len(spot_ids) == len(results) else 207
+
+@spots_bp.route('/parking_spots/<int:spot_id>', methods=['DELETE'])
+@jwt_required()
+def delete_parking_spot(spot_id):
+    """
+    Endpoint to remove a parking spot by ID.
+    """
+    try:
+        lot_id = ParkingSpot.delete_spot(spot_id)
+        if lot_id is not None:
+            broadcaster.publish(lot_id, spot_id, event="deleted")
+            return jsonify({"msg": f"Parking spot {spot_id} removed successfully."}), 200
+        else:
+            return jsonify({"msg": "Parking spot not found."}), 404
+    except PoolTimeout:
+        raise  # Answered with 503 by the app
+    except Exception as e:
+        current_app.logger.error(f"Error removing parking spot: {str(e)}")
+        return jsonify({"msg": "Error removing parking spot", "error": str(e)}), 500
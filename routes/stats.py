@@ -0,0 +1,63 @@
+import hmac
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import verify_jwt_in_request
+from utils.database import Database
+from utils.cache import spot_cache, user_cache
+from utils.passwords import password_hasher
+from utils.mailer import outbox_worker
+
+stats_bp = Blueprint('stats', __name__, url_prefix='/stats')
+
+@stats_bp.before_request
+def require_stats_access():
+    """
+    Stats are served to monitoring tools sending the ``X-Metrics-Token``
+    header when METRICS_TOKEN is configured, and to callers with a valid
+    access token.
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and hmac.compare_digest(request.headers.get('X-Metrics-Token', ''), token):
+        return None
+    verify_jwt_in_request()
+
+@stats_bp.route('/db', methods=['GET'])
+def database_stats():
+    """
+    Endpoint exposing connection pool usage: size, in use, waiting and wait times.
+    """
+    return jsonify(Database.stats()), 200
+
+@stats_bp.route('/queries', methods=['GET'])
+def query_stats():
+    """
+    Endpoint exposing call counts and timings per named query.
+    """
+    return jsonify(Database.query_stats()), 200
+
+@stats_bp.route('/cache', methods=['GET'])
+def cache_stats():
+    """
+    Endpoint exposing spot cache entries, hits and misses.
+    """
+    return jsonify(spot_cache.store.stats()), 200
+
+@stats_bp.route('/users', methods=['GET'])
+def user_cache_stats():
+    """
+    Endpoint exposing user cache entries, hits, misses and hits on unknown users.
+    """
+    return jsonify(user_cache.stats()), 200
+
+@stats_bp.route('/passwords', methods=['GET'])
+def password_stats():
+    """
+    Endpoint exposing password hashing pool saturation: pending, rejected and timed out hashes.
+    """
+    return jsonify(password_hasher.stats()), 200
+
+@stats_bp.route('/mail', methods=['GET'])
+def mail_stats():
+    """
+    Endpoint exposing the email sender: emails sent, retried and given up, and SMTP connections opened.
+    """
+    return jsonify(outbox_worker.stats()), 200
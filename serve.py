@@ -0,0 +1,22 @@
+"""
+Production server: one gevent process serving the API and SocketIO.
+
+    python serve.py
+
+Every client connection is a greenlet, so thousands of mostly idle HTTP
+clients and SocketIO subscribers fit in one process. See README.md for the
+worker model.
+"""
+from gevent import monkey
+
+# Must run before anything imports socket, ssl, threading or time
+monkey.patch_all()
+
+from config import Config  # noqa: E402
+from app import create_app  # noqa: E402
+from extensions import socketio  # noqa: E402
+
+app = create_app()
+
+if __name__ == '__main__':
+    socketio.run(app, host=Config.HOST, port=Config.PORT)
@@ -0,0 +1,167 @@
+import pytest
+from config import Config
+from app import create_app
+from utils.database import Database
+
+class AppConfig(Config):
+    JWT_SECRET_KEY = 'test-secret'
+    DATABASE_URL = 'postgresql://localhost/unused'
+    TESTING = True
+    OUTBOX_WORKER = False
+
+def test_create_app_does_not_connect():
+    """Building the app registers every route once and opens no database connection."""
+    app = create_app(AppConfig)
+    rules = [rule.rule for rule in app.url_map.iter_rules()]
+    assert rules.count('/signup') == 1 and rules.count('/login') == 1
+    assert '/parking_spots' in rules and '/stats/db' in rules
+    assert Database.stats() is None
+    assert app.test_client().get('/').status_code == 200
+
+def test_missing_setting_is_reported_by_create_app():
+    """A missing required setting fails create_app, not the import of config."""
+    class Incomplete(AppConfig):
+        DATABASE_URL = None
+
+    with pytest.raises(ValueError, match="DATABASE_URL"):
+        create_app(Incomplete)
+
+@pytest.mark.parametrize("body", [
+    {"spot_id": 1, "time": "2024-13-45T99:99:99"},
+    {"spot_id": 1, "time": "2024-05-01T08:00:00 tomorrow"},
+    {"spot_id": 1, "time": "2024-05-01T08:00:00", "starts_at": "2024-05-01T09:00:00"},
+])
+def test_invalid_reservation_time_is_a_bad_request(body):
+    """Times matching the format but not a real date, or mixed with a range, are rejected before the database."""
+    from flask_jwt_extended import create_access_token
+    from utils.cache import user_cache
+
+    app = create_app(AppConfig)
+    user_cache.store.set("id:1", {"id": 1, "username": "ann", "email": "ann@example.com", "password": "x"})
+    with app.app_context():
+        token = create_access_token(identity="1")
+    response = app.test_client().post('/reserve', json={**body, "user_id": "1"}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 400 and "time" in response.get_json()
+    assert Database.stats() is None
+
+@pytest.mark.parametrize("lot_id", [7, None, ["a"], ""])
+def test_batch_spots_need_a_string_lot_id(lot_id):
+    """A lot id that is not a non-empty string is a bad request, not a database error."""
+    from flask_jwt_extended import create_access_token
+    from utils.cache import user_cache
+
+    app = create_app(AppConfig)
+    user_cache.store.set("id:1", {"id": 1, "username": "ann", "email": "ann@example.com", "password": "x"})
+    with app.app_context():
+        token = create_access_token(identity="1")
+    body = {"lot_id": lot_id, "spots": [{"location": [1, 2], "is_reserved": False}]}
+    response = app.test_client().post('/parking_spots/batch', json=body, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 400 and "lot_id" in response.get_json()["msg"]
+    assert Database.stats() is None
+
+@pytest.mark.parametrize("body", [{"password": "secret1"}, {"email": None, "password": "secret1"}, {"email": ["a"], "password": "x"}])
+def test_login_without_email_string_is_unauthorized(body):
+    """A login body with a missing or non-string email is refused without a lookup."""
+    app = create_app(AppConfig)
+    assert app.test_client().post('/login', json=body).status_code == 401
+    assert Database.stats() is None
+
+@pytest.mark.parametrize("body", [{"email": "ann@example.com"}, {"email": "ann@example.com", "password": None},
+                                  {"email": "ann@example.com", "password": 123456}, ["ann@example.com"]])
+def test_login_without_password_string_is_unauthorized(body):
+    """A missing or non-string password is refused before the user is looked up or a hash is checked."""
+    from werkzeug.security import generate_password_hash
+    from utils.cache import user_cache
+
+    stored = generate_password_hash('secret1', method='pbkdf2:sha256:1000')
+    user_cache.store.set("email:ann@example.com", {"id": 1, "username": "ann", "email": "ann@example.com", "password": stored})
+    response = create_app(AppConfig).test_client().post('/login', json=body)
+    assert response.status_code == 401 and response.get_json() == {"msg": "Invalid credentials"}
+    assert Database.stats() is None
+
+def test_signup_stores_the_user_and_queues_the_verification_email(monkeypatch):
+    """Signup validates every user field, hashes outside the transaction and queues the email in it."""
+    from contextlib import nullcontext
+    from models.user import User
+    from models.email_outbox import EmailOutbox
+    from routes import auth
+
+    calls = []
+    monkeypatch.setattr(auth.password_hasher, 'hash', lambda password: f"hashed:{password}")
+    monkeypatch.setattr(Database, 'transaction', classmethod(lambda cls, timeout=None: nullcontext()))
+    monkeypatch.setattr(User, 'insert_user', staticmethod(lambda **user: calls.append(user) or 7))
+    monkeypatch.setattr(EmailOutbox, 'enqueue', staticmethod(lambda subject, recipients, body: calls.append(recipients)))
+    client = create_app(AppConfig).test_client()
+
+    body = {"username": "ann", "password": "secret1", "email": "ann@example.com", "first_name": "Ann"}
+    response = client.post('/signup', json=body)
+    assert response.status_code == 201 and response.get_json()["user_id"] == 7
+    assert calls == [
+        {"username": "ann", "hashed_password": "hashed:secret1", "email": "ann@example.com", "first_name": "Ann",
+         "last_name": None, "date_of_birth": None, "address": None, "gender": None},
+        ["ann@example.com"],
+    ]
+    response = client.post('/signup', json={"username": "bob", "password": "secret1", "email": "not-an-email"})
+    assert response.status_code == 400 and "email" in response.get_json()
+    assert client.post('/signup', json={"username": "bob", "password": "secret1"}).status_code == 400
+    assert len(calls) == 2
+
+def test_login_token_is_accepted_by_protected_routes(monkeypatch):
+    """The token /login returns carries a string subject, so jwt_required routes accept it."""
+    from models.user import User
+    from utils.cache import user_cache
+
+    user = {"id": 1, "username": "ann", "email": "ann@example.com", "password": "x"}
+    monkeypatch.setattr(User, 'authenticate', staticmethod(lambda email, password: user))
+    user_cache.store.set("id:1", user)
+    client = create_app(AppConfig).test_client()
+    response = client.post('/login', json={"email": "ann@example.com", "password": "secret1"})
+    assert response.status_code == 200
+    token = response.get_json()["access_token"]
+    assert client.get('/stats/db', headers={"Authorization": f"Bearer {token}"}).status_code == 200
+    assert Database.stats() is None
+
+def test_detector_updates_need_the_detector_token():
+    """Updates are refused without a configured token and with a wrong one, before the database."""
+    class DetectorConfig(AppConfig):
+        DETECTOR_TOKEN = 'detector-secret'
+
+    body = {"camera_id": "cam1", "spaces": [{"id": 1, "status": "occupied"}]}
+    assert create_app(AppConfig).test_client().post('/update_spaces', json=body).status_code == 503
+    client = create_app(DetectorConfig).test_client()
+    assert client.post('/update_spaces', json=body).status_code == 401
+    assert client.post('/update_spaces', json=body, headers={'X-Detector-Token': 'wrong'}).status_code == 401
+    response = client.post('/update_spaces', json={"spaces": []}, headers={'X-Detector-Token': 'detector-secret'})
+    assert response.status_code == 200 and response.get_json() == {"received": 0, "changed": 0}
+    assert Database.stats() is None
+
+def test_exhausted_database_pool_is_a_503_with_retry_after(monkeypatch):
+    """A request that gets no pooled connection is shed with 503, without the raw error text."""
+    from flask_jwt_extended import create_access_token
+    from models.parking_spot import ParkingSpot
+    from utils.cache import user_cache
+    from utils.pool import PoolTimeout
+
+    def busy(*args):
+        raise PoolTimeout("No database connection available within 5.0 seconds.")
+
+    monkeypatch.setattr(ParkingSpot, 'add_spots', staticmethod(busy))
+    app = create_app(AppConfig)
+    user_cache.store.set("id:1", {"id": 1, "username": "ann", "email": "ann@example.com", "password": "x"})
+    with app.app_context():
+        token = create_access_token(identity="1")
+    body = {"spots": [{"location": [1, 2], "is_reserved": False}]}
+    response = app.test_client().post('/parking_spots/batch', json=body, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 503 and response.headers["Retry-After"] == "1"
+    assert "error" not in response.get_json()
+
+def test_stats_need_a_metrics_or_access_token():
+    """Stats endpoints refuse anonymous callers and accept the metrics token."""
+    class MetricsConfig(AppConfig):
+        METRICS_TOKEN = 'metrics-secret'
+
+    client = create_app(MetricsConfig).test_client()
+    assert client.get('/stats/db').status_code == 401
+    assert client.get('/stats/db', headers={'X-Metrics-Token': 'wrong'}).status_code == 401
+    assert client.get('/stats/db', headers={'X-Metrics-Token': 'metrics-secret'}).status_code == 200
+    assert create_app(AppConfig).test_client().get('/stats/passwords').status_code == 401
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta, timezone
+from utils.availability import LotIntervals, AvailabilityIndex
+from utils.schemas import ReservationSchema
+
+T0 = datetime(2024, 5, 1, 8, tzinfo=timezone.utc)
+
+def hours(n):
+    return T0 + timedelta(hours=n)
+
+def test_lot_intervals_free_spots_respects_half_open_periods():
+    """A spot is free when no reservation overlaps; touching end and start points do not overlap."""
+    spots = [(1, '(0,0)'), (2, '(1,0)'), (3, '(2,0)')]
+    reservations = [(1, hours(6), hours(8)), (1, hours(2), hours(4)), (2, hours(3), hours(5))]
+    index = LotIntervals(T0, hours(24), spots, reservations)
+    assert [s["id"] for s in index.free_spots(hours(4), hours(6))] == [1, 3]
+    assert [s["id"] for s in index.free_spots(hours(1), hours(2))] == [1, 2, 3]
+    assert [s["id"] for s in index.free_spots(hours(3), hours(7))] == [3]
+    index.add(3, hours(5), hours(6))
+    assert [s["id"] for s in index.free_spots(hours(4), hours(6))] == [1]
+
+def test_availability_index_loads_hot_window_once_and_skips_cold_queries():
+    """Hot-window queries share one load per lot; periods beyond the window fall through to the database."""
+    loads = []
+
+    def load(lot_id, start, end):
+        loads.append(lot_id)
+        return [(1, '(0,0)'), (2, '(1,0)')], []
+
+    index = AvailabilityIndex(hot_window=timedelta(hours=24), ttl=60)
+    now = datetime.now(timezone.utc)
+    assert len(index.free_spots('a', now + timedelta(hours=1), now + timedelta(hours=2), load)) == 2
+    index.add('a', 2, now, now + timedelta(hours=3))
+    assert [s["id"] for s in index.free_spots('a', now + timedelta(hours=2), now + timedelta(hours=4), load)] == [1]
+    assert index.free_spots('a', now + timedelta(days=3), now + timedelta(days=4), load) is None
+    assert loads == ['a']
+
+def test_reservation_schema_accepts_legacy_time():
+    """A bare 'time' books the default duration; ranges must end after they start."""
+    data = ReservationSchema().load({'spot_id': 1, 'user_id': 'u', 'time': '2024-05-01T08:00:00'})
+    assert (data['starts_at'], data['ends_at']) == (T0, hours(1))
+    errors = ReservationSchema().validate({'spot_id': 1, 'user_id': 'u', 'starts_at': '2024-05-01T10:00:00', 'ends_at': '2024-05-01T09:00:00'})
+    assert 'ends_at' in errors
@@ -0,0 +1,26 @@
+import pytest
+from utils.schemas import load_batch, ParkingSpotSchema, ReservationSchema
+
+def test_load_batch_reports_invalid_items_by_index():
+    """Valid items are loaded with their index; invalid ones become per-item results."""
+    payload = {"spots": [
+        {"location": [1, 2], "is_reserved": False},
+        {"location": [1], "is_reserved": False},
+        {"location": [3, 4], "is_reserved": True},
+    ]}
+    valid, invalid = load_batch(payload, 'spots', ParkingSpotSchema(partial=('id',)), 10)
+    assert [index for index, _ in valid] == [0, 2]
+    assert valid[1][1] == {"location": [3.0, 4.0], "is_reserved": True}
+    assert [result["index"] for result in invalid] == [1] and "location" in invalid[0]["errors"]
+
+def test_load_batch_parses_reservation_periods_without_user():
+    """Batch reservations take the user from the token, so user_id may be omitted."""
+    payload = {"reservations": [{"spot_id": 5, "starts_at": "2024-05-01T08:00:00", "ends_at": "2024-05-01T09:00:00"}]}
+    valid, invalid = load_batch(payload, 'reservations', ReservationSchema(partial=('user_id',)), 10)
+    assert invalid == [] and valid[0][1]["spot_id"] == 5 and valid[0][1]["ends_at"].hour == 9
+
+@pytest.mark.parametrize("payload", [None, {"spots": []}, {"spots": {}}, {"spots": [{}] * 11}])
+def test_load_batch_rejects_malformed_payloads(payload):
+    """Missing, empty, non-list and oversized batches are rejected as a whole."""
+    with pytest.raises(ValueError):
+        load_batch(payload, 'spots', ParkingSpotSchema(partial=('id',)), 10)
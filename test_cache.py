@@ -0,0 +1,73 @@
+import time
+from utils.cache import TTLCache, VersionedCache, UserCache
+
+def test_ttl_cache_evicts_least_recently_used_and_expired():
+    """Entries over maxsize go in LRU order and expired entries count as misses."""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and cache.get('c') == 3
+
+    cache.ttl = 0
+    cache.set('d', 4)
+    time.sleep(0.001)
+    assert cache.get('d') is None
+    assert cache.stats() == {"entries": 1, "hits": 3, "misses": 2}
+
+def test_versioned_cache_reloads_only_after_its_versions_change():
+    """Bumping a version a value depends on forces a reload; other versions leave it cached."""
+    cache = VersionedCache(TTLCache(maxsize=10, ttl=60))
+    loads = []
+
+    def load():
+        loads.append(1)
+        return len(loads)
+
+    assert cache.get_or_load('spots', ('spots',), load) == 1
+    cache.invalidate('status')
+    assert cache.get_or_load('spots', ('spots',), load) == 1
+    cache.invalidate('spots')
+    assert cache.get_or_load('spots', ('spots',), load) == 2
+
+def test_user_cache_shares_records_between_id_and_email():
+    """A user loaded by email is then found by ID and by any casing of the email without loading again."""
+    cache = UserCache()
+    loads = []
+    record = {"id": 7, "username": "ann", "email": "Ann@Example.com", "password": "hash"}
+
+    def load():
+        loads.append(1)
+        return record
+
+    assert cache.get_by_email(" ann@example.com", load) is record
+    assert cache.get_by_email("ANN@example.com", load) is record
+    assert cache.get_by_id(7, load) is record
+    assert len(loads) == 1
+    cache.invalidate(7, "Ann@Example.com")
+    assert cache.get_by_id(7, load) is record
+    assert len(loads) == 2
+    assert cache.stats()["hits"] == 2
+
+def test_user_cache_remembers_unknown_emails_briefly():
+    """Unknown emails are cached for the negative TTL and dropped on invalidation."""
+    cache = UserCache(negative_ttl=60)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return None
+
+    assert cache.get_by_email("nobody@example.com", load) is None
+    assert cache.get_by_email("Nobody@example.com", load) is None
+    assert len(loads) == 1 and cache.stats()["negative_hits"] == 1
+    cache.invalidate(email="nobody@example.com")
+    assert cache.get_by_email("nobody@example.com", load) is None
+    assert len(loads) == 2
+
+    expired = UserCache(negative_ttl=0)
+    expired.get_by_email("nobody@example.com", load)
+    time.sleep(0.01)
+    expired.get_by_email("nobody@example.com", load)
+    assert len(loads) == 4
@@ -0,0 +1,62 @@
+import math
+import pytest
+from datetime import datetime, date, timezone
+from decimal import Decimal
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from marshmallow import ValidationError, EXCLUDE
+from utils.codec import schema, compile_schema, load_many, OrjsonProvider
+from utils.schemas import ParkingSpotSchema, ReservationSchema
+
+def test_compiled_schema_agrees_with_marshmallow():
+    """The fast path loads exactly what marshmallow loads and defers everything else to it."""
+    instance = schema(ParkingSpotSchema, partial=('id',))
+    assert schema(ParkingSpotSchema, partial=('id',)) is instance
+    fast = compile_schema(instance)
+    items = [
+        {"location": [1, 2.5], "is_reserved": False},
+        {"id": 3, "location": [0, 0], "is_reserved": True},
+        {"id": "3", "location": [1, 2], "is_reserved": True},
+        {"location": ["1", 2], "is_reserved": "yes"},
+        {"location": [1, math.nan], "is_reserved": False},
+        {"location": [1, 2, 3], "is_reserved": False},
+        {"id": 0, "location": [1, 2], "is_reserved": False},
+        {"location": [1, 2], "is_reserved": False, "extra": 1},
+        {"location": [1, 2]},
+        {"location": [True, 2], "is_reserved": False},
+        ["not", "a", "dict"],
+    ]
+    for item in items:
+        try:
+            expected = instance.load(item)
+        except ValidationError:
+            expected = None
+        loaded = fast(item)
+        if loaded is not None:
+            assert loaded == expected and all(type(a) is type(b) for a, b in zip(loaded["location"], expected["location"]))
+    assert fast(items[0]) == {"location": [1.0, 2.5], "is_reserved": False}
+
+    valid, invalid = load_many(instance, items)
+    assert [index for index, _ in valid] == [0, 1, 2, 3]
+    assert {index for index, _ in invalid} == {4, 5, 6, 7, 8, 9, 10}
+    assert compile_schema(schema(ReservationSchema)) is None
+    assert compile_schema(schema(ParkingSpotSchema, unknown=EXCLUDE)) is None
+
+def test_orjson_provider_matches_default_output():
+    """orjson output decodes to the same value as Flask's default provider, dates included."""
+    pytest.importorskip("orjson")
+    app = Flask(__name__)
+    value = {
+        "b": [1, 2.5, None, True, "é"],
+        "a": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+        "d": date(2024, 5, 1),
+        "n": Decimal("1.50"),
+    }
+    default, fast = DefaultJSONProvider(app), OrjsonProvider(app)
+    assert fast.loads(fast.dumps(value)) == default.loads(default.dumps(value))
+    assert list(fast.loads(fast.dumps(value))) == ["a", "b", "d", "n"]
+    assert fast.loads(b'{"x": [1, 2]}') == {"x": [1, 2]}
+    with app.app_context():
+        response = fast.response(items=[1, 2])
+        assert response.get_data(as_text=True) == '{"items":[1,2]}\n'
+        assert response.mimetype == 'application/json'
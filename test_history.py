@@ -0,0 +1,30 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from utils.schemas import parse_history_range
+
+NOW = datetime(2024, 5, 1, 12, tzinfo=timezone.utc)
+
+def test_parse_history_range_defaults_to_last_week_by_hour():
+    """Without arguments the range ends now, spans the default week and is bucketed by hour."""
+    start, end, granularity = parse_history_range({}, now=NOW)
+    assert (start, end, granularity) == (NOW - timedelta(days=7), NOW, "hour")
+
+def test_parse_history_range_treats_naive_timestamps_as_utc():
+    """Naive timestamps are read as UTC; explicit offsets are kept."""
+    start, end, granularity = parse_history_range(
+        {"from": "2024-04-01T00:00:00", "to": "2024-04-02T00:00:00+02:00", "granularity": "day"}, now=NOW
+    )
+    assert start == datetime(2024, 4, 1, tzinfo=timezone.utc)
+    assert end == datetime(2024, 4, 1, 22, tzinfo=timezone.utc)
+    assert granularity == "day"
+
+@pytest.mark.parametrize("args", [
+    {"from": "yesterday"},
+    {"from": "2024-05-01T12:00:00", "to": "2024-04-30T12:00:00"},
+    {"from": "2022-01-01T00:00:00"},
+    {"granularity": "minute"},
+])
+def test_parse_history_range_rejects_invalid_arguments(args):
+    """Unparseable, inverted, overlong ranges and unknown granularities are rejected."""
+    with pytest.raises(ValueError):
+        parse_history_range(args, now=NOW)
@@ -0,0 +1,36 @@
+import pytest
+from utils.schemas import parse_space_updates
+
+def test_parse_space_updates_flattens_and_deduplicates():
+    """Spaces become column lists, per-space cameras override the default and the last status wins."""
+    payload = {
+        "camera_id": "entrance",
+        "spaces": [
+            {"id": 0, "status": "free"},
+            {"id": 1, "status": "occupied"},
+            {"camera_id": "level-2", "id": 0, "status": "occupied"},
+            {"id": 0, "status": "occupied"},
+        ],
+    }
+    camera_ids, spot_ids, occupied = parse_space_updates(payload)
+    assert list(zip(camera_ids, spot_ids, occupied)) == [
+        ("entrance", 0, True),
+        ("entrance", 1, True),
+        ("level-2", 0, True),
+    ]
+
+@pytest.mark.parametrize("payload", [
+    None,
+    {"spaces": "all"},
+    {"spaces": [{"id": "0", "status": "free"}]},
+    {"spaces": [{"id": True, "status": "free"}]},
+    {"spaces": [{"id": 0, "status": "parked"}]},
+    {"spaces": [{"id": 0, "status": ["free"]}]},
+    {"spaces": [{"id": 0, "status": {"free": True}}]},
+    {"spaces": [{"id": 2 ** 31, "status": "free"}]},
+    {"spaces": [{"id": -1, "status": "free"}]},
+    {"spaces": [{"camera_id": "", "id": 0, "status": "free"}]},
+])
+def test_parse_space_updates_rejects_invalid_payloads(payload):
+    with pytest.raises(ValueError):
+        parse_space_updates(payload)
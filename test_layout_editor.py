@@ -0,0 +1,56 @@
+import os
+import sys
+
+# Make the parking detection modules importable
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parking_detection'))
+
+from layout import load_layout
+from routes.parking import LayoutEditor
+
+def test_edits_are_journaled_and_replayed(tmp_path):
+    """Edits survive a restart through the journal and are folded into the layout on close."""
+    layout_file = str(tmp_path / 'CarParkPos')
+    editor = LayoutEditor(layout_file)
+    editor.add_spot(10, 10)
+    editor.add_spot(100, 10)
+    assert editor.remove_spot(20, 20) == 0
+    assert editor.remove_spot(500, 500) is None
+    editor.journal.close()
+    assert not os.path.exists(layout_file)
+
+    editor = LayoutEditor(layout_file)
+    assert editor.spots == {1: (100, 10, 107, 48)}
+    editor.close()
+    assert os.path.getsize(layout_file + '.journal') == 0
+    assert load_layout(layout_file).ids.tolist() == [1]
+
+def test_undo_and_compaction(tmp_path):
+    """Undo reverts the last edit and compaction rewrites the layout file."""
+    layout_file = str(tmp_path / 'CarParkPos')
+    editor = LayoutEditor(layout_file, compact_every=3)
+    editor.add_spot(10, 10)
+    editor.remove_spot(15, 15)
+    assert editor.undo()
+    assert editor.spots == {0: (10, 10, 107, 48)}
+    assert load_layout(layout_file).boxes.tolist() == [[10, 10, 107, 48]]
+
+    assert editor.undo()
+    assert editor.spots == {}
+    assert not editor.undo()
+    assert editor.add_spot(300, 300) == 1
+    editor.close()
+
+def test_removed_ids_are_not_reused_after_compaction(tmp_path):
+    """Removing the highest id, compacting and reloading still hands out a new id."""
+    layout_file = str(tmp_path / 'CarParkPos')
+    editor = LayoutEditor(layout_file)
+    editor.add_spot(10, 10)
+    editor.add_spot(300, 300)
+    assert editor.remove_spot(310, 310) == 1
+    editor.close()
+    assert load_layout(layout_file).next_id == 2
+
+    editor = LayoutEditor(layout_file)
+    assert editor.spots == {0: (10, 10, 107, 48)}
+    assert editor.add_spot(300, 300) == 2
+    editor.close()
@@ -0,0 +1,168 @@
+import time
+import socketserver
+import threading
+import pytest
+from utils.mailer import SMTPConnection, OutboxWorker, backoff_delay
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Minimal local SMTP server recording connections and delivered messages."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, refused=()):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.refused = set(refused)
+        self.connections = 0
+        self.messages = []
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost ready')
+        recipients = []
+        for raw in self.rfile:
+            command = raw.decode().strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip(' <>')
+                if address in self.server.refused:
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                for data in self.rfile:
+                    if data in (b'.\r\n', b'.\n'):
+                        break
+                    lines.append(data.decode())
+                self.server.messages.append((recipients, ''.join(lines)))
+                self.reply('250 OK')
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Not implemented')
+
+class MemoryOutbox:
+    """Outbox stand-in: claimed emails that are still unsent can be claimed again once their lease ends."""
+
+    def __init__(self, emails):
+        self.emails = emails
+        self.leased_until = {}
+        self.sent = []
+        self.failed = []
+
+    def claim(self, limit, lease):
+        now = time.monotonic()
+        done = set(self.sent) | {email_id for email_id, _ in self.failed}
+        claimed = [
+            email for email in self.emails
+            if email['id'] not in done and self.leased_until.get(email['id'], 0) <= now
+        ][:limit]
+        for email in claimed:
+            self.leased_until[email['id']] = now + lease
+        return claimed
+
+    def mark_sent(self, email_ids):
+        self.sent.extend(email_ids)
+
+    def mark_failed(self, email_id, error, retry_in=None):
+        self.failed.append((email_id, retry_in))
+
+class SlowConnection:
+    """SMTP connection stand-in taking ``delay`` seconds per message."""
+
+    def __init__(self, outbox, delay, timeout):
+        self.outbox = outbox
+        self.delay = delay
+        self.timeout = timeout
+        self.connects = 0
+        self.marked_before = []
+
+    def send(self, message):
+        self.marked_before.append(list(self.outbox.sent))
+        time.sleep(self.delay)
+
+def email(email_id, recipient, attempts=0):
+    return {"id": email_id, "sender": "noreply@example.com", "recipients": [recipient],
+            "subject": f"Email {email_id}", "body": "Hello", "attempts": attempts}
+
+@pytest.fixture
+def smtp_server():
+    server = SMTPStandIn(refused={'nobody@example.com'})
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_batch_is_sent_over_one_connection(smtp_server):
+    """All emails of a batch reuse a single SMTP connection."""
+    connection = SMTPConnection('127.0.0.1', smtp_server.server_address[1], use_tls=False, username=None)
+    outbox = MemoryOutbox([email(i, f'user{i}@example.com') for i in range(1, 6)])
+    worker = OutboxWorker(outbox, connection, batch_size=10)
+    assert worker.run_once() == 5
+    connection.close()
+    assert outbox.sent == [1, 2, 3, 4, 5]
+    assert smtp_server.connections == 1
+    assert [recipients for recipients, _ in smtp_server.messages] == [[f'user{i}@example.com'] for i in range(1, 6)]
+    assert 'Subject: Email 1' in smtp_server.messages[0][1]
+
+def test_refused_recipient_is_given_up_and_batch_continues(smtp_server):
+    """A permanently refused email is not retried and does not stop the batch."""
+    connection = SMTPConnection('127.0.0.1', smtp_server.server_address[1], use_tls=False, username=None)
+    outbox = MemoryOutbox([email(1, 'nobody@example.com'), email(2, 'user2@example.com')])
+    worker = OutboxWorker(outbox, connection)
+    assert worker.run_once() == 2
+    connection.close()
+    assert outbox.failed == [(1, None)]
+    assert outbox.sent == [2]
+    assert worker.stats()["failed"] == 1
+
+def test_unreachable_server_is_retried_with_backoff():
+    """Connection failures reschedule the email with backoff and cut the batch short."""
+    with socketserver.TCPServer(('127.0.0.1', 0), socketserver.BaseRequestHandler) as closed:
+        port = closed.server_address[1]
+    connection = SMTPConnection('127.0.0.1', port, use_tls=False, username=None, timeout=1)
+    outbox = MemoryOutbox([email(1, 'user1@example.com', attempts=2), email(2, 'user2@example.com')])
+    worker = OutboxWorker(outbox, connection, backoff=lambda attempts: attempts * 10)
+    assert worker.run_once() == 1
+    assert outbox.failed == [(1, 30)]
+    assert outbox.sent == []
+    assert 22.5 <= backoff_delay(2, base=15, cap=100) <= 30
+    assert backoff_delay(10, base=15, cap=100) <= 100
+
+def test_emails_are_not_sent_twice_when_a_lease_expires():
+    """A slow batch stops before its lease ends, and a sender claiming the expired leases gets only unsent emails."""
+    outbox = MemoryOutbox([email(i, f'user{i}@example.com') for i in range(1, 6)])
+    slow = SlowConnection(outbox, delay=0.25, timeout=0.2)
+    assert OutboxWorker(outbox, slow, batch_size=10, lease=1.2).run_once() == 3
+    assert outbox.sent == [1, 2, 3] and slow.marked_before == [[], [1], [1, 2]]
+
+    other = OutboxWorker(outbox, SlowConnection(outbox, delay=0, timeout=0.2), batch_size=10, lease=1.2)
+    assert other.run_once() == 0
+    time.sleep(max(0, max(outbox.leased_until.values()) - time.monotonic()))
+    assert other.run_once() == 2
+    assert outbox.sent == [1, 2, 3, 4, 5]
+
+    def failing_mark_sent(email_ids):
+        raise ConnectionError("database unavailable")
+
+    outbox = MemoryOutbox([email(1, 'user1@example.com'), email(2, 'user2@example.com')])
+    outbox.mark_sent = failing_mark_sent
+    worker = OutboxWorker(outbox, SlowConnection(outbox, delay=0, timeout=1))
+    with pytest.raises(ConnectionError):
+        worker.run_once()
+    assert worker.connection.marked_before == [[]]
@@ -0,0 +1,208 @@
+import os
+import sys
+import cv2
+import numpy as np
+
+# Make the parking detection modules importable
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parking_detection'))
+
+from occupancy import positions_to_boxes, score_spots
+
+WIDTH, HEIGHT = 107, 48
+THRESHOLD = 900
+
+def reference_counts(img_pro, positions):
+    """Per-spot crop and countNonZero loop the detectors used before batching."""
+    return [cv2.countNonZero(img_pro[y:y + HEIGHT, x:x + WIDTH]) for x, y in positions]
+
+def test_score_spots_matches_crop_loop():
+    """
+    The summed-area table scoring must agree with the crop loop for every spot,
+    including spots that run off the right or bottom edge of the frame.
+    """
+    rng = np.random.default_rng(0)
+    img_pro = np.where(rng.random((480, 640)) < 0.15, 255, 0).astype(np.uint8)
+    positions = [(int(x), int(y)) for x, y in zip(rng.integers(0, 640, 400), rng.integers(0, 480, 400))]
+    positions += [(0, 0), (639, 479), (600, 450)]
+
+    occupied, counts = score_spots(img_pro, positions_to_boxes(positions, WIDTH, HEIGHT), THRESHOLD)
+    expected = reference_counts(img_pro, positions)
+
+    assert counts.tolist() == expected
+    assert occupied.tolist() == [count >= THRESHOLD for count in expected]
+
+def test_positions_to_boxes_passes_box_arrays_through():
+    """Box arrays are used as-is so per-spot sizes survive conversion."""
+    boxes = np.array([[10, 20, 30, 40]], dtype=np.int32)
+    assert positions_to_boxes(boxes, WIDTH, HEIGHT) is boxes
+    assert positions_to_boxes([], WIDTH, HEIGHT).shape == (0, 4)
+
+def test_roi_processing_matches_full_frame():
+    """ROI tiling must give the same mask as the full frame under every spot."""
+    from camera_monitor import process_frame
+    from roi import build_roi_tiles
+
+    frame = cv2.imread(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parking_detection', 'carParkImg.png'))
+    rng = np.random.default_rng(1)
+    frame_h, frame_w = frame.shape[:2]
+    positions = [(int(x), int(y)) for x, y in zip(rng.integers(0, frame_w, 40), rng.integers(0, frame_h, 40))]
+    boxes = positions_to_boxes(positions, WIDTH, HEIGHT)
+
+    tiles = build_roi_tiles(boxes, frame.shape)
+    full = process_frame(frame, positions)
+    roi = process_frame(frame, positions, tiles)
+
+    assert score_spots(roi, boxes, THRESHOLD)[1].tolist() == score_spots(full, boxes, THRESHOLD)[1].tolist()
+    for x, y in positions:
+        assert np.array_equal(roi[y:y + HEIGHT, x:x + WIDTH], full[y:y + HEIGHT, x:x + WIDTH])
+
+def test_tracker_debounces_and_publishes_only_changes():
+    """Flicker shorter than the confirmation window never reaches the publisher."""
+    from hysteresis import SpotStateTracker
+
+    tracker = SpotStateTracker(confirm_frames=3, confirm_seconds=0, snapshot_interval=100)
+    spaces, snapshot = tracker.update([False, False], now=0)
+    assert snapshot and [space["status"] for space in spaces] == ["free", "free"]
+
+    # Spot 0 flickers, spot 1 turns occupied and stays that way
+    assert tracker.update([True, True], now=1) == ([], False)
+    assert tracker.update([False, True], now=2) == ([], False)
+    assert tracker.update([True, True], now=3) == ([{"id": 1, "status": "occupied"}], False)
+    assert tracker.update([True, True], now=4) == ([], False)
+
+    spaces, snapshot = tracker.update([True, True], now=200)
+    assert snapshot and len(spaces) == 2
+
+def test_uploader_coalesces_and_retries(monkeypatch):
+    """Pending updates collapse to one per spot and survive a failed request."""
+    import threading
+    import requests
+    import uploader
+    from uploader import StatusUploader
+
+    monkeypatch.setattr(uploader, "UPLOAD_RETRY_DELAY", 0.01)
+    calls = []
+    release = threading.Event()
+    delivered = threading.Event()
+
+    class FakeResponse:
+        status_code = 200
+
+    def fake_post(url, json, timeout):
+        release.wait(1)
+        calls.append(json)
+        if len(calls) == 1:
+            raise requests.exceptions.ConnectionError("server down")
+        delivered.set()
+        return FakeResponse()
+
+    status_uploader = StatusUploader("http://test/update_spaces")
+    monkeypatch.setattr(status_uploader.session, "post", fake_post)
+    status_uploader.start()
+    status_uploader.submit([{"id": 0, "status": "occupied"}, {"id": 1, "status": "occupied"}])
+    status_uploader.submit([{"id": 1, "status": "free"}])
+    release.set()
+    assert delivered.wait(1)
+    status_uploader.stop()
+
+    assert sorted((space["id"], space["status"]) for space in calls[-1]["spaces"]) == [(0, "occupied"), (1, "free")]
+    stats = status_uploader.stats()
+    assert stats["sent"] == 2 and stats["retries"] == 1 and stats["pending"] == 0
+
+def test_supervisor_forwards_snapshot_flag():
+    """Merged camera updates are published with the snapshot flag the workers reported."""
+    from supervisor import CameraSupervisor
+
+    published = []
+    supervisor = CameraSupervisor([{"id": "a"}, {"id": "b"}], lambda spaces, snapshot: published.append((spaces, snapshot)))
+    supervisor.status_queue.put(("a", [{"id": 0, "status": "free"}], False))
+    supervisor.drain(0.5)
+    supervisor.flush()
+    supervisor.status_queue.put(("a", [{"id": 0, "status": "occupied"}], False))
+    supervisor.status_queue.put(("b", [{"id": 0, "status": "free"}, {"id": 1, "status": "free"}], True))
+    supervisor.drain(0.5)
+    supervisor.flush()
+
+    assert [snapshot for _, snapshot in published] == [False, True]
+    assert len(published[1][0]) == 3 and {space["camera_id"] for space in published[1][0]} == {"a", "b"}
+
+def test_motion_gate_selects_only_changed_spots():
+    """Static spots are skipped until they change or go stale."""
+    from motion import MotionGate
+
+    boxes = positions_to_boxes([(0, 0), (200, 100)], WIDTH, HEIGHT)
+    gate = MotionGate(boxes, scale=4, threshold=8.0, max_staleness=10)
+    frame = np.full((240, 320, 3), 100, dtype=np.uint8)
+
+    assert gate.select(frame, now=0).tolist() == [True, True]
+    assert gate.select(frame, now=1).tolist() == [False, False]
+
+    frame[100:148, 200:307] = 220
+    assert gate.select(frame, now=2).tolist() == [False, True]
+    assert gate.select(frame, now=3).tolist() == [False, False]
+    assert gate.select(frame, force=np.array([True, False]), now=4).tolist() == [True, False]
+    assert gate.select(frame, now=12).tolist() == [False, True]
+
+def test_preview_renders_only_while_watched():
+    """Frames are rendered for snapshot clients and skipped when nobody watches."""
+    import time
+    import threading
+    import urllib.request
+    from preview import PreviewServer
+
+    preview = PreviewServer(port=0, host='127.0.0.1', fps=1000).start()
+    renders = []
+
+    def render(frame):
+        renders.append(frame)
+        return frame
+
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    try:
+        preview.offer(frame, render)
+        assert renders == []
+
+        result = {}
+        url = f"http://127.0.0.1:{preview.server.server_address[1]}/snapshot.jpg"
+        client = threading.Thread(target=lambda: result.update(body=urllib.request.urlopen(url, timeout=5).read()))
+        client.start()
+        while not preview.watching():
+            time.sleep(0.01)
+        preview.offer(frame, render)
+        client.join(5)
+    finally:
+        preview.stop()
+
+    assert len(renders) == 1
+    assert result["body"][:2] == b'\xff\xd8'
+
+def test_benchmark_reports_every_stage():
+    """A short synthetic run reports per-stage timings and frame rates."""
+    from benchmark import parse_args, run_benchmark
+
+    report = run_benchmark(parse_args(['--spots', '20', '--width', '640', '--height', '360', '--frames', '5']))
+    assert report["frames"] == 5
+    assert {"grayscale", "threshold", "median", "dilate", "scoring", "publish"} <= set(report["stages"])
+    assert report["fps"] > 0
+
+def test_layout_round_trip_and_legacy_conversion(tmp_path):
+    """Layouts keep per-spot sizes and ids; legacy pickles convert without unpickling objects."""
+    import pickle
+    import pytest
+    from layout import convert_pickle, load_layout, save_layout
+
+    boxes = np.array([[10, 20, 30, 40], [50, 60, 70, 80]], dtype=np.int32)
+    save_layout(tmp_path / 'lot.layout', boxes, ids=[7, 3], camera_id='cam-1', frame_size=(1280, 720))
+    layout = load_layout(tmp_path / 'lot.layout')
+    assert layout.camera_id == 'cam-1' and layout.frame_size == (1280, 720)
+    assert layout.boxes.tolist() == boxes.tolist() and layout.ids.tolist() == [7, 3]
+
+    with open(tmp_path / 'CarParkPos', 'wb') as f:
+        pickle.dump([(75, 95), (105, 96)], f)
+    convert_pickle(tmp_path / 'CarParkPos', tmp_path / 'converted.layout', WIDTH, HEIGHT)
+    assert load_layout(tmp_path / 'converted.layout').boxes.tolist() == [[75, 95, WIDTH, HEIGHT], [105, 96, WIDTH, HEIGHT]]
+
+    with open(tmp_path / 'evil', 'wb') as f:
+        pickle.dump([os.getcwd], f)
+    with pytest.raises(pickle.UnpicklingError):
+        load_layout(tmp_path / 'evil', WIDTH, HEIGHT)
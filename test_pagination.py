@@ -0,0 +1,40 @@
+import json
+import pytest
+from utils.pagination import split_page, page_columns, json_array_chunks
+from utils.schemas import parse_list_args
+
+FIELDS = ('id', 'location', 'is_reserved', 'lot_id')
+FILTERS = {'lot_id': (str, "lot_id = %s"), 'free': (bool, "free = %s"), 'spot_id': (int, "spot_id = %s")}
+
+def test_parse_list_args_projection_filters_and_cursor():
+    """Fields are deduplicated in order, filters are converted to their types and the cursor is parsed."""
+    args = {'fields': 'location, id,location', 'free': 'True', 'spot_id': '7', 'after': '40', 'limit': '25'}
+    assert parse_list_args(args, FIELDS, FILTERS) == (['location', 'id'], {'free': True, 'spot_id': 7}, 40, 25)
+    assert parse_list_args({}, FIELDS, FILTERS, ('id',)) == (['id'], {}, None, 100)
+
+@pytest.mark.parametrize("args", [
+    {'fields': 'id,password'},
+    {'limit': '0'},
+    {'limit': '5000'},
+    {'after': 'abc'},
+    {'free': 'maybe'},
+])
+def test_parse_list_args_rejects_invalid_arguments(args):
+    """Unknown fields, out-of-range limits, bad cursors and bad filter values are rejected."""
+    with pytest.raises(ValueError):
+        parse_list_args(args, FIELDS, FILTERS)
+
+def test_split_page_projects_fields_and_returns_cursor():
+    """The extra row only signals a next page, and the cursor column is dropped when not requested."""
+    columns = page_columns(['location'])
+    assert columns == ['id', 'location']
+    items, next_cursor = split_page([(3, 'a'), (5, 'b'), (9, 'c')], columns, ['location'], 2)
+    assert items == [{'location': 'a'}, {'location': 'b'}] and next_cursor == 5
+    assert split_page([(3, 'a')], columns, ['location'], 2) == ([{'location': 'a'}], None)
+
+@pytest.mark.parametrize("count", [0, 1, 3, 4, 7])
+def test_json_array_chunks_is_valid_json(count):
+    """Chunks concatenate to a JSON array regardless of how rows fall on batch boundaries."""
+    rows = ({'id': i} for i in range(count))
+    chunks = list(json_array_chunks(rows, json.dumps, batch=3))
+    assert json.loads(''.join(chunks)) == [{'id': i} for i in range(count)]
@@ -0,0 +1,53 @@
+import threading
+import pytest
+from werkzeug.security import generate_password_hash
+from utils.passwords import PasswordHasher, PasswordPoolBusy, needs_rehash
+
+METHOD = 'pbkdf2:sha256:1000'
+
+def test_hash_and_verify_in_worker_process():
+    """Hashes computed by the worker pool verify, and current hashes are not rehashed."""
+    hasher = PasswordHasher(workers=1, queue_limit=2, timeout=30, method=METHOD)
+    try:
+        stored = hasher.hash('secret1')
+        assert stored.startswith(METHOD + '$')
+        assert hasher.verify(stored, 'secret1') == (True, None)
+        assert hasher.verify(stored, 'wrong1') == (False, None)
+        assert hasher.stats()["completed"] == 3
+        assert hasher.stats()["pending"] == 0
+    finally:
+        hasher.shutdown()
+
+def test_outdated_hash_is_replaced_on_verify():
+    """A valid hash made with other parameters comes back with a replacement."""
+    hasher = PasswordHasher(workers=0, method=METHOD)
+    old = generate_password_hash('secret1', method='pbkdf2:sha256:500')
+    assert needs_rehash(old, METHOD)
+    valid, new_hash = hasher.verify(old, 'secret1')
+    assert valid and new_hash.startswith(METHOD + '$')
+    assert not needs_rehash(new_hash, METHOD)
+    assert hasher.verify(old, 'wrong1') == (False, None)
+
+    # Short method names are stored with werkzeug's default parameters spelled out
+    for method in ('pbkdf2:sha256', 'scrypt'):
+        assert not needs_rehash(generate_password_hash('secret1', method=method), method)
+
+def test_queue_limit_rejects_when_saturated():
+    """Beyond the queue limit hashes are refused instead of waiting."""
+    hasher = PasswordHasher(workers=0, queue_limit=1, method=METHOD)
+    started, release = threading.Event(), threading.Event()
+
+    def slow(password, method):
+        started.set()
+        release.wait(5)
+        return password
+
+    thread = threading.Thread(target=hasher._run, args=(slow, 'x', METHOD))
+    thread.start()
+    started.wait(5)
+    with pytest.raises(PasswordPoolBusy):
+        hasher.hash('secret1')
+    release.set()
+    thread.join()
+    assert hasher.stats()["rejected"] == 1
+    assert hasher.hash('secret1').startswith(METHOD)
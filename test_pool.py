@@ -0,0 +1,92 @@
+import time
+import threading
+import pytest
+from psycopg2 import extensions
+from utils.pool import ConnectionPool, PoolTimeout
+
+class FakeConnection:
+    """Stand-in for a psycopg2 connection that records what the pool does with it."""
+
+    def __init__(self):
+        self.closed = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+        self.fail_ping = False
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, query):
+                if connection.fail_ping:
+                    raise RuntimeError("server closed the connection")
+
+        return Cursor()
+
+def test_acquire_waits_for_a_released_connection():
+    """An exhausted pool blocks until a connection is released, then hands that one out."""
+    pool = ConnectionPool(FakeConnection, minconn=0, maxconn=1, timeout=2)
+    held = pool.acquire()
+    threading.Timer(0.05, pool.release, (held,)).start()
+    assert pool.acquire() is held
+    stats = pool.stats()
+    assert stats["size"] == 1 and stats["in_use"] == 1 and stats["wait_ms_max"] >= 40
+
+def test_acquire_times_out_when_exhausted():
+    """Acquire raises PoolTimeout instead of blocking forever."""
+    pool = ConnectionPool(FakeConnection, minconn=0, maxconn=1)
+    pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire(timeout=0.01)
+    assert pool.stats()["timeouts"] == 1
+
+def test_acquire_is_refused_when_too_many_are_waiting():
+    """With max_waiting reached, further acquires fail at once instead of queueing."""
+    pool = ConnectionPool(FakeConnection, minconn=0, maxconn=1, timeout=2, max_waiting=1)
+    held = pool.acquire()
+    waiter = threading.Thread(target=lambda: pool.release(pool.acquire()))
+    waiter.start()
+    while pool.stats()["waiting"] < 1:
+        time.sleep(0.001)
+    start = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert time.monotonic() - start < 1
+    pool.release(held)
+    waiter.join()
+    assert pool.stats()["shed"] == 1 and pool.stats()["timeouts"] == 0
+
+def test_context_manager_rolls_back_and_recycles():
+    """Open transactions are rolled back on release; stale connections are pinged or replaced."""
+    pool = ConnectionPool(FakeConnection, minconn=1, maxconn=2)
+    with pool.connection() as first:
+        first.status = extensions.TRANSACTION_STATUS_INTRANS
+    assert first.rollbacks == 1
+
+    first.fail_ping = True
+    pool.health_check_interval = 0
+    with pool.connection() as second:
+        assert second is not first
+    assert first.closed and pool.stats()["discarded"] == 1
+
+    pool.health_check_interval, pool.max_lifetime = 30, 0
+    time.sleep(0.001)
+    with pool.connection() as third:
+        assert third is not second
+    assert pool.stats()["recycled"] == 1 and pool.stats()["size"] == 1
@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+from utils.database import Database
+from utils.query import Query, QueryStats, Session, to_prepared_sql
+
+class RecordingConnection:
+    """Stand-in for a psycopg2 connection that records every statement it is sent."""
+
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        connection = self
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                return False
+
+            def execute(self, sql, params=None):
+                connection.statements.append(sql if params is None else (sql, tuple(params)))
+
+            def fetchall(self):
+                return [(1,)]
+
+        return Cursor()
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.statements.append('ROLLBACK')
+
+def test_to_prepared_sql_numbers_placeholders():
+    """psycopg2 placeholders become positional parameters and escaped percents are unescaped."""
+    assert to_prepared_sql("SELECT %s, '100%%' WHERE a = %s") == ("SELECT $1, '100%' WHERE a = $2", 2)
+
+def test_session_prepares_once_per_connection_and_records_timings():
+    """A prepared query is PREPAREd on first use only; plain queries run as is; both are timed."""
+    stats = QueryStats()
+    connection = RecordingConnection()
+    session = Session(connection, prepare=True, stats=stats)
+    lookup = Query('lookup', "SELECT * FROM users WHERE email = %s", prepare=True)
+    session.fetchall(lookup, ('a@example.com',))
+    session.fetchall(lookup, ('b@example.com',))
+    session.fetchall("SELECT 1")
+    assert connection.statements == [
+        f"PREPARE {lookup.statement} AS SELECT * FROM users WHERE email = $1",
+        (f"EXECUTE {lookup.statement} (%s)", ('a@example.com',)),
+        (f"EXECUTE {lookup.statement} (%s)", ('b@example.com',)),
+        ("SELECT 1", ()),
+    ]
+    assert {name: entry["calls"] for name, entry in stats.summary().items()} == {"adhoc": 1, "lookup": 2}
+
+def test_session_runs_callbacks_on_commit_and_resets_prepared_on_rollback():
+    """Commit callbacks only run after a commit; a rollback discards them and deallocates statements."""
+    connection = RecordingConnection()
+    session = Session(connection, prepare=True, stats=QueryStats())
+    calls = []
+    session.fetchall(Query('q', "SELECT %s", prepare=True), (1,))
+    session.on_commit(lambda: calls.append('discarded'))
+    session.rollback()
+    assert connection.statements[-2:] == ['ROLLBACK', 'DEALLOCATE ALL'] and calls == []
+
+    session.on_commit(lambda: calls.append('committed'))
+    session.commit()
+    assert calls == []
+    session.run_callbacks()
+    assert calls == ['committed']
+
+def test_failing_commit_callback_does_not_undo_the_transaction(monkeypatch):
+    """A callback raising after the commit is logged; the others still run and nothing is rolled back."""
+    connection = RecordingConnection()
+    monkeypatch.setattr(Database, 'connection', classmethod(contextmanager(lambda cls, timeout=None: (yield connection))))
+    calls = []
+
+    def fail():
+        raise RuntimeError("cache unavailable")
+
+    with Database.transaction() as db:
+        db.on_commit(fail)
+        db.on_commit(lambda: calls.append('committed'))
+    assert calls == ['committed']
+    assert connection.commits == 1 and 'ROLLBACK' not in connection.statements
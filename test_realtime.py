@@ -0,0 +1,22 @@
+from utils.realtime import SpotBroadcaster
+
+def test_broadcaster_coalesces_changes_per_lot(monkeypatch):
+    """Changes to one spot within a tick merge into a single entry of one message per lot."""
+    import utils.realtime
+
+    emitted = []
+    monkeypatch.setattr(utils.realtime.socketio, "emit", lambda event, data, to: emitted.append((event, data, to)))
+    monkeypatch.setattr(utils.realtime.socketio, "start_background_task", lambda target: object())
+
+    broadcaster = SpotBroadcaster()
+    broadcaster.publish("north", 1, is_occupied=True)
+    broadcaster.publish("north", 1, is_occupied=False)
+    broadcaster.publish("north", 2, event="deleted")
+    broadcaster.publish("south", 7, is_occupied=True)
+    broadcaster.flush()
+    broadcaster.flush()
+
+    assert emitted == [
+        ("spot_updates", {"lot_id": "north", "spots": [{"id": 1, "is_occupied": False}, {"id": 2, "event": "deleted"}]}, "lot:north"),
+        ("spot_updates", {"lot_id": "south", "spots": [{"id": 7, "is_occupied": True}]}, "lot:south"),
+    ]
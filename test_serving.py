@@ -0,0 +1,33 @@
+from psycopg2 import extensions
+from utils.green import make_psycopg_cooperative, gevent_patched
+from loadtest import percentile, Results, engineio_packets
+
+def test_psycopg_left_blocking_without_gevent():
+    """Outside gevent, psycopg2 keeps its default blocking behaviour."""
+    assert not gevent_patched()
+    assert make_psycopg_cooperative() is False
+    assert extensions.get_wait_callback() is None
+
+def test_socketio_runs_threaded_unless_gevent_patched_the_process():
+    """With gevent installed but not patched, SocketIO keeps to threads instead of gevent's blocking server."""
+    from test_app import AppConfig
+    from app import create_app
+    from extensions import socketio
+
+    create_app(AppConfig)
+    assert socketio.server.async_mode == 'threading'
+
+def test_load_test_summary():
+    """Load test results report nearest-rank latency percentiles in milliseconds."""
+    results = Results()
+    results.latencies = [n / 1000 for n in range(1, 101)]
+    summary = results.summary(duration=10)
+    assert summary["requests"] == 100 and summary["requests_per_second"] == 10.0
+    assert (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]) == (50.0, 95.0, 99.0)
+    assert percentile([], 0.5) == 0.0
+
+def test_engineio_payload_is_split_into_packets():
+    """Pings batched with messages are found, so every one is answered."""
+    body = b'42["status",{"id":1}]\x1e2\x1e42["status",{"id":2}]'
+    assert engineio_packets(body) == [b'42["status",{"id":1}]', b'2', b'42["status",{"id":2}]']
+    assert engineio_packets(b'2') == [b'2'] and engineio_packets(b'') == []
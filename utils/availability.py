@@ -0,0 +1,113 @@
+import os
+import time
+import bisect
+import threading
+import logging
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+HOT_WINDOW_HOURS = float(os.getenv('HOT_WINDOW_HOURS', 24))  # Queries within now .. now + this are answered in memory
+AVAILABILITY_TTL = float(os.getenv('AVAILABILITY_TTL', 60))  # Seconds before a lot's index is reloaded
+
+class LotIntervals:
+    """
+    Reservations of one lot within a time window, indexed per spot.
+
+    The exclusion constraint guarantees that a spot's reservations never
+    overlap, so sorting them by start also sorts them by end. To check a
+    spot, find the last reservation that starts before the query ends with
+    a binary search; the spot is taken exactly when that reservation ends
+    after the query starts.
+    """
+
+    def __init__(self, window_start, window_end, spots, reservations):
+        self.window_start = window_start
+        self.window_end = window_end
+        self.spots = list(spots)  # (id, location) ordered by id
+        self.starts = {spot_id: [] for spot_id, _ in self.spots}
+        self.ends = {spot_id: [] for spot_id, _ in self.spots}
+        for spot_id, starts_at, ends_at in sorted(reservations, key=lambda r: r[1]):
+            if spot_id in self.starts:
+                self.starts[spot_id].append(starts_at)
+                self.ends[spot_id].append(ends_at)
+
+    def covers(self, start, end):
+        return self.window_start <= start and end <= self.window_end
+
+    def add(self, spot_id, starts_at, ends_at):
+        """Record a new reservation (it must not overlap the spot's others)."""
+        if spot_id not in self.starts:
+            return
+        i = bisect.bisect(self.starts[spot_id], starts_at)
+        self.starts[spot_id].insert(i, starts_at)
+        self.ends[spot_id].insert(i, ends_at)
+
+    def is_free(self, spot_id, start, end):
+        i = bisect.bisect_left(self.starts[spot_id], end) - 1
+        return i < 0 or self.ends[spot_id][i] <= start
+
+    def free_spots(self, start, end):
+        return [
+            {"id": spot_id, "location": location}
+            for spot_id, location in self.spots if self.is_free(spot_id, start, end)
+        ]
+
+class AvailabilityIndex:
+    """
+    In-memory interval indexes for the hot window of every lot.
+
+    Queries that fall between now and ``hot_window`` later are answered from
+    a per-lot ``LotIntervals``. It is loaded with ``load(lot_id, start, end)``,
+    which returns ``(spots, reservations)``, and is reloaded every ``ttl``
+    seconds. This process adds its own new reservations to the index right
+    away. Reservations made by other workers show up on the next reload.
+    Until then those spots may be offered, but booking them is still
+    refused by the database constraint.
+    """
+
+    def __init__(self, hot_window=timedelta(hours=HOT_WINDOW_HOURS), ttl=AVAILABILITY_TTL):
+        self.hot_window = hot_window
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.lots = {}  # lot_id -> (loaded_at, LotIntervals)
+
+    def free_spots(self, lot_id, start, end, load):
+        """Free spots of a lot for the period, or None when it is outside the hot window."""
+        now = datetime.now(timezone.utc)
+        if start < now - timedelta(minutes=1) or end > now + self.hot_window:
+            return None
+        with self.lock:
+            entry = self.lots.get(lot_id)
+        if entry is None or time.monotonic() - entry[0] > self.ttl or not entry[1].covers(max(start, now), end):
+            window_start, window_end = now - timedelta(minutes=1), now + self.hot_window + timedelta(hours=1)
+            spots, reservations = load(lot_id, window_start, window_end)
+            entry = (time.monotonic(), LotIntervals(window_start, window_end, spots, reservations))
+            with self.lock:
+                self.lots[lot_id] = entry
+        with self.lock:
+            return entry[1].free_spots(start, end)
+
+    def add(self, lot_id, spot_id, starts_at, ends_at):
+        with self.lock:
+            entry = self.lots.get(lot_id)
+            if entry is not None:
+                entry[1].add(spot_id, starts_at, ends_at)
+
+    def invalidate(self, lot_id=None):
+        """Drop the index of one lot, or of all lots."""
+        with self.lock:
+            if lot_id is None:
+                self.lots.clear()
+            else:
+                self.lots.pop(lot_id, None)
+
+# Availability index shared by the routes of this process
+availability_index = AvailabilityIndex()
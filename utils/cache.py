@@ -0,0 +1,167 @@
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+SPOT_CACHE_TTL = float(os.getenv('SPOT_CACHE_TTL', 30))  # Seconds a cached listing may be served
+SPOT_CACHE_SIZE = int(os.getenv('SPOT_CACHE_SIZE', 256))  # Cached listings kept per process
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 300))  # Seconds a cached user record may be served
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))  # Cache entries (two per user) kept per process
+USER_NEGATIVE_TTL = float(os.getenv('USER_NEGATIVE_TTL', 30))  # Seconds an unknown email or ID is remembered
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries expire after ``ttl`` seconds.
+
+    Also keeps the named counters used by ``VersionedCache``. Any object with
+    the same ``get``/``set``/``incr``/``counter`` methods can stand in for it,
+    e.g. an adapter over a cache shared by all workers.
+    """
+
+    def __init__(self, maxsize=SPOT_CACHE_SIZE, ttl=SPOT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.counters = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def incr(self, name):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+            return self.counters[name]
+
+    def counter(self, name):
+        with self.lock:
+            return self.counters.get(name, 0)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
+
+class VersionedCache:
+    """
+    Read-through cache invalidated through version counters.
+
+    Each cached value depends on some named versions (e.g. ``spots`` and
+    ``status``), which are part of its key. ``invalidate`` bumps versions,
+    so entries built before a write are never looked up again. They age out
+    of the LRU, and no key scanning is needed.
+    """
+
+    def __init__(self, store=None):
+        self.store = store or TTLCache()
+
+    def invalidate(self, *names):
+        for name in names:
+            self.store.incr(name)
+
+    def get_or_load(self, key, versions, load):
+        """Return the value cached for ``key`` at the current ``versions``, calling ``load()`` on a miss."""
+        full_key = ":".join(f"{name}={self.store.counter(name)}" for name in versions) + f":{key}"
+        value = self.store.get(full_key)
+        if value is None:
+            value = load()
+            self.store.set(full_key, value)
+        return value
+
+def normalize_email(email):
+    return email.strip().lower()
+
+class UserCache:
+    """
+    Read-through cache of user records by ID and by normalized email.
+
+    A record is stored under both keys. Lookups that find no user are
+    cached too, for the shorter ``negative_ttl``, so repeated logins with
+    unknown emails do not each reach the database. Writes in this process
+    invalidate the keys they affect. Writes made by other processes show up
+    once the entries expire.
+    """
+
+    # Cached in place of a user that does not exist
+    UNKNOWN = False
+
+    def __init__(self, store=None, negative_ttl=USER_NEGATIVE_TTL):
+        self.store = store or TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.negative_hits = 0
+
+    def _get(self, key, load):
+        value = self.store.get(key)
+        if value is self.UNKNOWN:
+            with self.lock:
+                self.negative_hits += 1
+            return None
+        if value is not None:
+            return value
+        record = load()
+        if record is None:
+            self.store.set(key, self.UNKNOWN, self.negative_ttl)
+        else:
+            self.store.set(f"id:{record['id']}", record)
+            self.store.set(f"email:{normalize_email(record['email'])}", record)
+        return record
+
+    def get_by_id(self, user_id, load):
+        """Return the user with this ID, calling ``load()`` on a miss; None when there is none."""
+        return self._get(f"id:{user_id}", load)
+
+    def get_by_email(self, email, load):
+        """Return the user with this email, calling ``load()`` on a miss; None when there is none."""
+        return self._get(f"email:{normalize_email(email)}", load)
+
+    def invalidate(self, user_id=None, email=None):
+        if user_id is not None:
+            self.store.delete(f"id:{user_id}")
+        if email is not None:
+            self.store.delete(f"email:{normalize_email(email)}")
+
+    def stats(self):
+        with self.lock:
+            return {**self.store.stats(), "negative_hits": self.negative_hits}
+
+# Cache of parking spot listings shared by the routes of this process
+spot_cache = VersionedCache()
+
+# Cache of user records shared by the routes of this process
+user_cache = UserCache()
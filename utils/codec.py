@@ -0,0 +1,154 @@
+import math
+import functools
+import logging
+from flask.json.provider import DefaultJSONProvider
+from marshmallow import fields, ValidationError
+
+try:
+    import orjson
+except ImportError:  # Flask's own json module is used instead
+    orjson = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@functools.lru_cache(maxsize=64)
+def schema(schema_class, **options):
+    """
+    Shared schema instance for a class and constructor options.
+
+    Building a marshmallow schema binds and copies every declared field, so
+    routes reuse one instance per distinct configuration. Loading is
+    stateless; the instances must not be modified. List options such as
+    ``only`` and ``partial`` are passed as tuples.
+    """
+    return schema_class(**options)
+
+def _finite_number(value):
+    return type(value) in (int, float) and math.isfinite(value)
+
+# Plain type tests for fields whose loaded value is the input itself, converted
+_FAST_FIELDS = {
+    fields.Integer: (lambda value: type(value) is int, int),
+    fields.Float: (_finite_number, float),
+    fields.Boolean: (lambda value: type(value) is bool, bool),
+    fields.String: (lambda value: type(value) is str, str),
+}
+
+def _fast_field(field):
+    """(check, convert) for a field the fast path understands, or None."""
+    if field.data_key is not None or field.dump_only or field.allow_none:
+        return None
+    if type(field) is fields.List:
+        inner = _fast_field(field.inner)
+        if inner is None or field.inner.validators:
+            return None
+        check, convert = inner
+        return (lambda value: type(value) is list and all(check(item) for item in value),
+                lambda value: [convert(item) for item in value])
+    if getattr(field, 'strict', False) or getattr(field, 'allow_nan', False):
+        return None
+    return _FAST_FIELDS.get(type(field))
+
+@functools.lru_cache(maxsize=64)
+def compile_schema(instance):
+    """
+    Compile a flat schema instance into a plain function for the common case.
+
+    The function returns the loaded dict when an item has only known keys,
+    every required field, exact JSON types and passes the field validators.
+    It returns None for anything else, and ``instance.load`` must then be
+    called: it gives the same result or the usual error messages. Schemas
+    with hooks or fields the fast path does not know compile to None.
+    """
+    if any(instance._hooks.values()) or instance.unknown != 'raise':
+        return None
+    partial = instance.partial
+    specs = []
+    for name, field in instance.load_fields.items():
+        fast = _fast_field(field)
+        if fast is None:
+            return None
+        required = field.required and not (partial is True or (partial and name in partial))
+        specs.append((name, required, fast[0], fast[1], tuple(field.validators)))
+    known = frozenset(name for name, *_ in specs)
+
+    def load(item):
+        if type(item) is not dict or not known.issuperset(item):
+            return None
+        loaded = {}
+        for name, required, check, convert, validators in specs:
+            if name not in item:
+                if required:
+                    return None
+                continue
+            value = item[name]
+            if not check(value):
+                return None
+            value = convert(value)
+            try:
+                for validator in validators:
+                    validator(value)
+            except ValidationError:
+                return None
+            loaded[name] = value
+        return loaded
+
+    return load
+
+def load_many(instance, items):
+    """
+    Load a list of items with one schema instance.
+
+    Items go through the compiled fast path when the schema allows it;
+    others fall back to ``instance.load``.
+
+    Returns:
+        tuple: (valid, invalid) where valid is a list of (index, loaded item) and invalid a
+        list of (index, error messages).
+    """
+    fast = compile_schema(instance)
+    valid, invalid = [], []
+    for index, item in enumerate(items):
+        loaded = fast(item) if fast is not None else None
+        if loaded is None:
+            try:
+                loaded = instance.load(item)
+            except ValidationError as e:
+                invalid.append((index, e.messages))
+                continue
+        valid.append((index, loaded))
+    return valid, invalid
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider encoding and decoding with orjson.
+
+    Output matches the default provider: keys are sorted, and dates and
+    other types orjson does not handle natively go through the default
+    provider's conversion. Calls with options orjson lacks use the default
+    provider.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(obj)
+        return self._app.response_class(self.dumps(obj) + "\n", mimetype=self.mimetype)
+
+# Provider create_app() installs: orjson when it is installed
+JSONProvider = OrjsonProvider if orjson is not None else DefaultJSONProvider
@@ -1,58 +1,150 @@
 import psycopg2
-from psycopg2 import pool
+from psycopg2.pool import PoolError
 from dotenv import load_dotenv
 import os
 import logging
+import threading
+import contextvars
+from contextlib import contextmanager
 from typing import Optional
+from utils.pool import ConnectionPool
+from utils.query import Session, query_stats
 
 load_dotenv()
 
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Connection pool settings
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5.0))  # Seconds to wait for a free connection
+DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', 3600))  # Seconds before a connection is replaced
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', 30))  # Idle seconds before a ping
+DB_POOL_MAX_WAITING = int(os.getenv('DB_POOL_MAX_WAITING', 0)) or None  # Requests queued for a connection before more are refused (0: no limit)
+
+# Session of the transaction open in the current thread or greenlet, if any
+_session = contextvars.ContextVar('database_session', default=None)
+
 class Database:
+    """
+    Process-wide access to the PostgreSQL connection pool.
+
+    The pool is created on first use rather than at import or startup, so
+    tools and workers that never query pay nothing. It is tied to the
+    process that created it: a forked worker builds its own pool instead of
+    sharing the parent's sockets.
+    """
     _pool = None
+    _pid = None
+    _dsn = None
+    _settings = dict(minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                     max_lifetime=DB_POOL_MAX_LIFETIME, health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+                     max_waiting=DB_POOL_MAX_WAITING)
+    _lock = threading.Lock()
+
+    @classmethod
+    def configure(cls, dsn, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                  max_lifetime=DB_POOL_MAX_LIFETIME, health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+                  max_waiting=DB_POOL_MAX_WAITING):
+        """Set the DSN and pool settings without connecting; replaces any existing pool."""
+        cls.close_all_connections()
+        cls._dsn = dsn
+        cls._settings = dict(minconn=minconn, maxconn=maxconn, timeout=timeout, max_lifetime=max_lifetime,
+                             health_check_interval=health_check_interval, max_waiting=max_waiting)
 
     @classmethod
-    def initialize(cls, dsn, minconn=1, maxconn=10):
-        try:
-            cls._pool = psycopg2.pool.SimpleConnectionPool(minconn, maxconn, dsn)
-        except Exception as e:
-            logging.error(f"Error initializing database pool: {e}")
-            raise
+    def initialize(cls, dsn, **settings):
+        """Configure the pool and open it right away."""
+        cls.configure(dsn, **settings)
+        cls._get_pool()
 
     @classmethod
-    def get_connection(cls):
-        if not cls._pool:
-            raise Exception("Database pool not initialized.")
-        return cls._pool.getconn()
+    def _get_pool(cls):
+        pool = cls._pool
+        if pool is not None and cls._pid == os.getpid():
+            return pool
+        with cls._lock:
+            if cls._pool is None or cls._pid != os.getpid():
+                # A pool inherited through fork is left alone: closing it would end the parent's sessions
+                dsn = cls._dsn or os.getenv('DATABASE_URL')
+                if not dsn:
+                    raise PoolError("Error: 'DATABASE_URL' must be set in the .env file.")
+                try:
+                    cls._pool = ConnectionPool(lambda: psycopg2.connect(dsn), **cls._settings)
+                except Exception as e:
+                    logger.error(f"Error initializing database pool: {e}")
+                    raise
+                cls._pid = os.getpid()
+            return cls._pool
+
+    @classmethod
+    def get_connection(cls, timeout=None):
+        """Take a connection, waiting up to ``timeout`` seconds (DB_POOL_TIMEOUT by default)."""
+        return cls._get_pool().acquire(timeout)
 
     @classmethod
     def return_connection(cls, connection):
-        if cls._pool and connection:
-            cls._pool.putconn(connection)
+        if cls._pool and cls._pid == os.getpid() and connection:
+            cls._pool.release(connection)
 
     @classmethod
-    def close_all_connections(cls):
-        if cls._pool:
-            cls._pool.closeall()
+    def connection(cls, timeout=None):
+        """
+        Context manager borrowing a pooled connection::
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+            with Database.connection() as connection, connection.cursor() as cursor:
+                ...
 
-# Load environment variables from the .env file
-load_dotenv()
+        Uncommitted work is rolled back when the block exits.
+        """
+        return cls._get_pool().connection(timeout)
 
-dsn = os.getenv("DATABASE_URL")
+    @classmethod
+    @contextmanager
+    def transaction(cls, timeout=None):
+        """
+        Run a block in one transaction and yield its ``Session``::
 
-if not dsn:
-    logger.error("Error: 'DATABASE_URL' must be set in the .env file.")
-    raise ValueError("Error: 'DATABASE_URL' must be set in the .env file.")
+            with Database.transaction() as db:
+                row = db.fetchone(QUERY, params)
 
-# Debugging: Log the DSN to verify it's being loaded correctly
-logger.debug(f"Database DSN: {dsn}")
+        Nested calls, e.g. from several model methods, join the enclosing
+        transaction. The outermost block commits when it exits normally and
+        rolls back when it raises. ``on_commit`` callbacks run after the
+        commit, once the connection is back in the pool.
+        """
+        session = _session.get()
+        if session is not None:
+            yield session
+            return
+        with cls.connection(timeout) as connection:
+            session = Session(connection)
+            token = _session.set(session)
+            try:
+                yield session
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                _session.reset(token)
+        session.run_callbacks()
 
-# Attempt to initialize the connection pool
-try:
-    Database.initialize(dsn)
-except Exception as e:
-    logger.error(f"Failed to initialize the database: {e}")
-    raise
\ No newline at end of file
+    @classmethod
+    def query_stats(cls):
+        """Call counts and timings per named query."""
+        return query_stats.summary()
+
+    @classmethod
+    def stats(cls):
+        """Pool usage and wait-time counters, or None before the first query of this process."""
+        return cls._pool.stats() if cls._pool and cls._pid == os.getpid() else None
+
+    @classmethod
+    def close_all_connections(cls):
+        with cls._lock:
+            pool, cls._pool = cls._pool, None
+            if pool and cls._pid == os.getpid():
+                pool.close()
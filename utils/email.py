@@ -1,15 +1,13 @@
-from flask_mail import Message
 from flask import current_app
-from extensions import mail
+from models.email_outbox import EmailOutbox
 
 def send_email(subject, recipients, body):
     """
-    Send an email using Flask-Mail.
+    Queue an email in the outbox; the background sender delivers it.
     """
-    msg = Message(subject, recipients=recipients, body=body)
     try:
-        mail.send(msg)
+        EmailOutbox.enqueue(subject, recipients, body)
         return True
     except Exception as e:
-        current_app.logger.error(f"Error sending email: {e}")
+        current_app.logger.error(f"Error queueing email: {e}")
         return False
\ No newline at end of file
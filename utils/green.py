@@ -0,0 +1,43 @@
+import logging
+import psycopg2
+from psycopg2 import extensions
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def gevent_patched():
+    """True when gevent has monkey-patched the standard library in this process."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('socket')
+
+def gevent_wait_callback(connection, timeout=None):
+    """Wait for psycopg2 socket activity through the gevent hub instead of blocking the process."""
+    from gevent.socket import wait_read, wait_write
+    while True:
+        state = connection.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(connection.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(connection.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f"Error: bad result from poll: {state}")
+
+def make_psycopg_cooperative():
+    """
+    Let other greenlets run while psycopg2 waits on the database.
+
+    Only has an effect under gevent, where a blocking query would otherwise
+    stall every client of the process. Returns True when the callback was
+    installed.
+    """
+    if not gevent_patched() or extensions.get_wait_callback() is not None:
+        return False
+    extensions.set_wait_callback(gevent_wait_callback)
+    logger.info("psycopg2 is cooperative with gevent.")
+    return True
@@ -0,0 +1,244 @@
+import os
+import time
+import random
+import smtplib
+import threading
+import logging
+from email.message import EmailMessage
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
+MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'True').lower() in ['true', '1', 't', 'yes']
+MAIL_USERNAME = os.getenv('MAIL_USERNAME')
+MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
+MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', MAIL_USERNAME)
+MAIL_TIMEOUT = float(os.getenv('MAIL_TIMEOUT', 10))  # Seconds for each SMTP operation
+MAIL_IDLE_TIMEOUT = float(os.getenv('MAIL_IDLE_TIMEOUT', 60))  # Idle seconds before the SMTP connection is closed
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 50))  # Emails claimed per round
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', 5))  # Seconds between polls when the outbox is empty
+OUTBOX_LEASE = float(os.getenv('OUTBOX_LEASE', 120))  # Seconds before an unfinished claimed email is retried
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8))  # Attempts before an email is given up
+OUTBOX_BACKOFF = float(os.getenv('OUTBOX_BACKOFF', 30))  # Seconds before the first retry, doubled after each failure
+OUTBOX_MAX_BACKOFF = float(os.getenv('OUTBOX_MAX_BACKOFF', 3600))
+
+def backoff_delay(attempts, base=OUTBOX_BACKOFF, cap=OUTBOX_MAX_BACKOFF):
+    """Seconds to wait after the ``attempts``-th failure: exponential, capped, with jitter."""
+    return min(cap, base * 2 ** (attempts - 1)) * random.uniform(0.75, 1.0)
+
+# Errors about one message; the connection stays usable for the next one
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+def is_permanent(error):
+    """True for SMTP errors that retrying will not fix, such as a rejected recipient."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, MESSAGE_ERRORS) and error.smtp_code >= 500
+
+class SMTPConnection:
+    """
+    One SMTP connection reused for consecutive messages.
+
+    Opened on first send, and reopened when the server dropped it or it sat
+    idle for longer than ``idle_timeout``, so a batch costs one handshake
+    instead of one per message.
+    """
+
+    def __init__(self, host=MAIL_SERVER, port=MAIL_PORT, use_tls=MAIL_USE_TLS, username=MAIL_USERNAME,
+                 password=MAIL_PASSWORD, timeout=MAIL_TIMEOUT, idle_timeout=MAIL_IDLE_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.smtp = None
+        self.last_used = 0.0
+        self.connects = 0
+
+    def _connect(self):
+        if self.smtp is not None and time.monotonic() - self.last_used > self.idle_timeout:
+            self.close()
+        if self.smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.use_tls:
+                    smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password)
+            except Exception:
+                smtp.close()
+                raise
+            self.smtp = smtp
+            self.connects += 1
+        return self.smtp
+
+    def send(self, message):
+        reused = self.smtp is not None
+        try:
+            self._connect().send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            self.close()
+            if not reused:
+                raise
+            # The server closed a connection we kept open; try once on a new one
+            self._connect().send_message(message)
+        except MESSAGE_ERRORS:
+            try:
+                self.smtp.rset()
+            except (smtplib.SMTPException, OSError):
+                self.close()
+            raise
+        except Exception:
+            self.close()
+            raise
+        self.last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self.smtp is not None and time.monotonic() - self.last_used > self.idle_timeout:
+            self.close()
+
+    def close(self):
+        smtp, self.smtp = self.smtp, None
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                smtp.close()
+
+def build_message(email, default_sender=MAIL_DEFAULT_SENDER):
+    message = EmailMessage()
+    message['Subject'] = email['subject']
+    message['From'] = email['sender'] or default_sender
+    message['To'] = ', '.join(email['recipients'])
+    message.set_content(email['body'])
+    return message
+
+class OutboxWorker:
+    """
+    Background thread that drains the email outbox.
+
+    ``outbox`` provides ``claim(limit, lease)``, ``mark_sent(ids)`` and
+    ``mark_failed(id, error, retry_in)``, like the ``EmailOutbox`` model.
+    Each round claims up to ``batch_size`` due emails and sends them over
+    one ``SMTPConnection``. Failed emails are retried with exponential
+    backoff until ``max_attempts``; permanent SMTP errors are not retried.
+    ``wake`` starts a round right away instead of at the next poll.
+    """
+
+    def __init__(self, outbox=None, connection=None, batch_size=OUTBOX_BATCH_SIZE, poll_interval=OUTBOX_POLL_INTERVAL,
+                 lease=OUTBOX_LEASE, max_attempts=OUTBOX_MAX_ATTEMPTS, backoff=backoff_delay):
+        self.outbox = outbox
+        self.connection = connection or SMTPConnection()
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def start(self, outbox=None):
+        """Start the sender thread, once per process; cheap to call again."""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if outbox is not None:
+                self.outbox = outbox
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.stopping.clear()
+            self.thread = threading.Thread(target=self.run, name='email-outbox', daemon=True)
+            self.thread.start()
+
+    def wake(self):
+        self.wakeup.set()
+
+    def stop(self, timeout=None):
+        self.stopping.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+        self.connection.close()
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                handled = self.run_once()
+            except Exception as e:
+                logger.error(f"Error draining email outbox: {e}")
+                handled = 0
+            if handled < self.batch_size:
+                self.connection.close_if_idle()
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+
+    def run_once(self):
+        """
+        Send one batch of due emails. Returns how many were sent or
+        rescheduled, which is less than claimed when the batch was cut short.
+
+        Each email is marked sent as soon as it is sent. The batch stops
+        before its lease runs out, since another sender can then claim the
+        remaining emails; those are sent once their lease ends.
+        """
+        emails = self.outbox.claim(self.batch_size, self.lease)
+        # A send takes a few SMTP operations, each up to the connection timeout
+        deadline = time.monotonic() + self.lease - 3 * self.connection.timeout
+        handled = 0
+        for email in emails:
+            if self.stopping.is_set() or time.monotonic() >= deadline:
+                break
+            handled += 1
+            try:
+                self.connection.send(build_message(email))
+            except Exception as e:
+                self._failed(email, e)
+                if not isinstance(e, MESSAGE_ERRORS):
+                    # The server is unreachable or refused us; the rest of the batch is retried once its lease ends
+                    break
+                continue
+            self.outbox.mark_sent([email['id']])
+            with self.lock:
+                self.sent += 1
+        return handled
+
+    def _failed(self, email, error):
+        attempts = email['attempts'] + 1
+        if is_permanent(error) or attempts >= self.max_attempts:
+            logger.error(f"Error sending email {email['id']}, giving up after {attempts} attempts: {error}")
+            self.outbox.mark_failed(email['id'], str(error))
+            with self.lock:
+                self.failed += 1
+        else:
+            logger.warning(f"Error sending email {email['id']} (attempt {attempts}): {error}")
+            self.outbox.mark_failed(email['id'], str(error), self.backoff(attempts))
+            with self.lock:
+                self.retried += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "running": self.thread is not None and self.thread.is_alive(),
+                "sent": self.sent,
+                "retried": self.retried,
+                "failed": self.failed,
+                "smtp_connects": self.connection.connects,
+            }
+
+# Email sender shared by the routes of this process; started by the app
+outbox_worker = OutboxWorker()
@@ -0,0 +1,85 @@
+from flask import request, jsonify, url_for
+from psycopg2 import sql
+
+# Rows per chunk of streamed JSON
+EXPORT_BATCH_SIZE = 2000
+
+def select_page(table, columns, filters, values, after=None, limit=None):
+    """
+    Compose a SELECT ordered by ``id`` for keyset pagination.
+
+    ``filters`` maps filter names to ``(type, condition)`` as for
+    ``parse_list_args``, where the condition is SQL with one placeholder;
+    the filters named in ``values`` are applied with those values as
+    parameters. Rows start after the id ``after`` when it is given.
+
+    Returns:
+        tuple: (query, params) ready for ``cursor.execute``.
+    """
+    clauses, params = [], []
+    for name, value in values.items():
+        clauses.append(sql.SQL(filters[name][1]))
+        params.append(value)
+    if after is not None:
+        clauses.append(sql.SQL("id > %s"))
+        params.append(after)
+
+    query = sql.SQL("SELECT {} FROM {}").format(
+        sql.SQL(", ").join(map(sql.Identifier, columns)), sql.Identifier(table)
+    )
+    if clauses:
+        query += sql.SQL(" WHERE ") + sql.SQL(" AND ").join(clauses)
+    query += sql.SQL(" ORDER BY id")
+    if limit is not None:
+        query += sql.SQL(" LIMIT %s")
+        params.append(limit)
+    return query, params
+
+def page_columns(fields):
+    """Selected columns for a page: the requested fields, plus ``id`` for the cursor."""
+    return list(fields) if 'id' in fields else ['id', *fields]
+
+def split_page(rows, columns, fields, limit):
+    """
+    Turn ``limit + 1`` fetched rows into one page of dicts.
+
+    Returns:
+        tuple: (items, next_cursor), where next_cursor is the last id of the
+        page when more rows follow, otherwise None.
+    """
+    more = len(rows) > limit
+    rows = rows[:limit]
+    id_index = columns.index('id')
+    next_cursor = rows[-1][id_index] if more else None
+    items = [{name: value for name, value in zip(columns, row) if name in fields} for row in rows]
+    return items, next_cursor
+
+def json_array_chunks(rows, dumps, batch=EXPORT_BATCH_SIZE):
+    """Encode an iterable of rows as a JSON array, yielding one chunk per ``batch`` rows."""
+    yield '['
+    separator = ''
+    encoded = []
+    for row in rows:
+        encoded.append(dumps(row))
+        if len(encoded) >= batch:
+            yield separator + ','.join(encoded)
+            separator = ','
+            encoded = []
+    if encoded:
+        yield separator + ','.join(encoded)
+    yield ']'
+
+def paginated_response(items, next_cursor):
+    """JSON list response for one page, with the cursor headers of ``with_cursor``."""
+    return with_cursor(jsonify(items), next_cursor)
+
+def with_cursor(response, next_cursor):
+    """
+    When more rows follow, send the cursor in ``X-Next-Cursor`` and the URL
+    of the next page in a ``Link`` header.
+    """
+    if next_cursor is not None:
+        args = {**request.args.to_dict(), 'after': next_cursor}
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+        response.headers['Link'] = f'<{url_for(request.endpoint, **request.view_args, **args)}>; rel="next"'
+    return response
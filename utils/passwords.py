@@ -0,0 +1,187 @@
+import os
+import time
+import functools
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+from dotenv import load_dotenv
+from utils.green import gevent_patched
+
+try:
+    import bcrypt
+except ImportError:  # Only needed to verify hashes left by the old bcrypt helpers
+    bcrypt = None
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+PASSWORD_METHOD = os.getenv('PASSWORD_METHOD', 'scrypt:32768:8:1')  # werkzeug method of new hashes; older ones are rehashed on login
+PASSWORD_WORKERS = int(os.getenv('PASSWORD_WORKERS', max(1, (os.cpu_count() or 2) // 2)))  # Hashing processes; 0 hashes in the calling thread
+PASSWORD_QUEUE_LIMIT = int(os.getenv('PASSWORD_QUEUE_LIMIT', 4 * max(1, PASSWORD_WORKERS)))  # Hashes running or queued before new ones are refused
+PASSWORD_TIMEOUT = float(os.getenv('PASSWORD_TIMEOUT', 5))  # Seconds a request waits for its hash
+
+class PasswordPoolBusy(Exception):
+    """Raised when a hash cannot be computed in time; the request should be retried later."""
+
+def hash_password(password, method=PASSWORD_METHOD):
+    return generate_password_hash(password, method=method)
+
+def check_password(stored_password, provided_password):
+    """Check a password against a werkzeug hash, or a bcrypt hash from the old helpers."""
+    if stored_password.startswith('$2'):
+        if bcrypt is None:
+            logger.error("Error: bcrypt is not installed, cannot check a legacy bcrypt hash")
+            return False
+        return bcrypt.checkpw(provided_password.encode('utf-8'), stored_password.encode('utf-8'))
+    return check_password_hash(stored_password, provided_password)
+
+@functools.lru_cache(maxsize=8)
+def method_prefix(method):
+    """
+    The method part of hashes made with ``method``, with every parameter
+    spelled out as werkzeug stores it: 'scrypt' becomes 'scrypt:32768:8:1'.
+    """
+    return hash_password('', method).split('$', 1)[0]
+
+def needs_rehash(stored_password, method=PASSWORD_METHOD):
+    """True when a hash was not made with ``method`` and its current parameters."""
+    return stored_password.split('$', 1)[0] != method_prefix(method)
+
+class PasswordHasher:
+    """
+    Computes password hashes in a bounded pool of worker processes.
+
+    Hashing is deliberately slow and CPU-bound, so running it in request
+    threads holds the GIL and stalls every other request of the worker.
+    At most ``queue_limit`` hashes may be running or queued; beyond that,
+    and when a hash takes longer than ``timeout``, ``PasswordPoolBusy`` is
+    raised so a burst of logins is refused quickly instead of piling up.
+    The pool starts on first use.
+    """
+
+    def __init__(self, workers=PASSWORD_WORKERS, queue_limit=PASSWORD_QUEUE_LIMIT,
+                 timeout=PASSWORD_TIMEOUT, method=PASSWORD_METHOD):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.method = method
+        self.slots = threading.BoundedSemaphore(queue_limit)
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pid = None
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+
+    def hash(self, password):
+        return self._run(hash_password, password, self.method)
+
+    def verify(self, stored_password, provided_password):
+        """
+        Check a password.
+
+        Returns:
+            tuple: (valid, new_hash) where new_hash is a hash with the current
+            method when the stored one should be replaced, otherwise None.
+        """
+        valid = self._run(check_password, stored_password, provided_password)
+        if valid and needs_rehash(stored_password, self.method):
+            return True, self.hash(provided_password)
+        return valid, None
+
+    def _pool(self):
+        with self.lock:
+            if self.executor is None or self.pid != os.getpid():
+                # An executor inherited through fork has no workers in this process.
+                if gevent_patched():
+                    # Process pools do not mix with monkey-patched threads; gevent's
+                    # pool runs real threads, and hashlib releases the GIL while hashing
+                    from gevent.threadpool import ThreadPoolExecutor
+                    self.executor = ThreadPoolExecutor(max_workers=self.workers)
+                else:
+                    # Forkserver children are forked from a clean process, not from
+                    # this threaded one, and do not import the application module.
+                    context = multiprocessing.get_context('forkserver')
+                    context.set_forkserver_preload(['werkzeug.security'])
+                    self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                self.pid = os.getpid()
+            return self.executor
+
+    def _run(self, function, *args):
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.rejected += 1
+            raise PasswordPoolBusy("Error: too many password hashes in progress")
+        with self.lock:
+            self.pending += 1
+        start = time.perf_counter()
+        if self.workers <= 0:
+            try:
+                result = function(*args)
+            finally:
+                self._release()
+        else:
+            try:
+                future = self._pool().submit(function, *args)
+            except BrokenProcessPool:
+                self._release()
+                self.shutdown()
+                raise PasswordPoolBusy("Error: password hashing pool is restarting") from None
+            # The slot stays taken until the worker is done, even after a timeout
+            future.add_done_callback(lambda _: self._release())
+            try:
+                result = future.result(timeout=self.timeout)
+            except FutureTimeout:
+                future.cancel()
+                with self.lock:
+                    self.timeouts += 1
+                raise PasswordPoolBusy("Error: password hashing timed out") from None
+            except BrokenProcessPool:
+                self.shutdown()
+                raise PasswordPoolBusy("Error: password hashing pool is restarting") from None
+        self._record(time.perf_counter() - start)
+        return result
+
+    def _release(self):
+        with self.lock:
+            self.pending -= 1
+        self.slots.release()
+
+    def _record(self, seconds):
+        with self.lock:
+            self.completed += 1
+            self.seconds_total += seconds
+            self.seconds_max = max(self.seconds_max, seconds)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "avg_ms": round(self.seconds_total * 1000 / self.completed, 3) if self.completed else 0.0,
+                "max_ms": round(self.seconds_max * 1000, 3),
+            }
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None and self.pid == os.getpid():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+# Password hasher shared by the routes of this process
+password_hasher = PasswordHasher()
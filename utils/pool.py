@@ -0,0 +1,224 @@
+import time
+import threading
+import logging
+from collections import deque
+from contextlib import contextmanager
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class PoolTimeout(PoolError):
+    """Raised when no connection becomes available within the acquire timeout."""
+
+class ConnectionPool:
+    """
+    Thread-safe connection pool with a blocking acquire.
+
+    When all ``maxconn`` connections are in use, ``acquire`` waits up to
+    ``timeout`` seconds for one to be released instead of failing. Idle
+    connections are handed out most recently used first. Connections idle
+    for longer than ``health_check_interval`` seconds are checked with
+    ``SELECT 1`` before use. Connections older than ``max_lifetime`` seconds
+    are closed and replaced. A released connection whose transaction was
+    left open is rolled back. If the rollback fails, the connection is
+    discarded. With ``max_waiting`` set, an acquire that would queue behind
+    that many waiters fails at once instead, so overload is shed quickly.
+
+    ``connect`` is called without arguments to open a new connection.
+    """
+
+    def __init__(self, connect, minconn=1, maxconn=10, timeout=5.0, max_lifetime=3600.0, health_check_interval=30.0,
+                 max_waiting=None):
+        if not 0 <= minconn <= maxconn or maxconn < 1:
+            raise ValueError("Error: the pool needs 0 <= minconn <= maxconn and maxconn >= 1.")
+        self._connect = connect
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self.max_waiting = max_waiting
+
+        self._condition = threading.Condition()
+        self._idle = deque()  # (connection, created_at, last_used_at)
+        self._in_use = {}     # connection -> created_at
+        self._size = 0        # Open connections, idle or in use
+        self._waiting = 0
+        self._closed = False
+
+        self.acquired = 0
+        self.timeouts = 0
+        self.shed = 0
+        self.recycled = 0
+        self.discarded = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+        for _ in range(minconn):
+            self._size += 1
+            connection = self._open()
+            self._idle.append((connection, time.monotonic(), time.monotonic()))
+
+    def _open(self):
+        """Open a connection for a slot already counted in ``_size``."""
+        try:
+            return self._connect()
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+
+    def _drop(self, connection, counter=None):
+        """Close a connection, free its slot and bump the named stats counter."""
+        try:
+            connection.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection: {e}")
+        with self._condition:
+            self._size -= 1
+            if counter:
+                setattr(self, counter, getattr(self, counter) + 1)
+            self._condition.notify()
+
+    def _healthy(self, connection, last_used, now):
+        if connection.closed:
+            return False
+        if now - last_used < self.health_check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding unhealthy database connection: {e}")
+            return False
+
+    def _reset(self, connection):
+        """Roll back a leftover transaction. Returns False if the connection is unusable."""
+        if connection.closed:
+            return False
+        try:
+            if connection.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding database connection that could not be reset: {e}")
+            return False
+
+    def acquire(self, timeout=None):
+        """
+        Take a connection from the pool, waiting up to ``timeout`` seconds
+        (the pool default when None).
+
+        Raises:
+            PoolTimeout: if no connection became available in time, or
+                ``max_waiting`` acquires were already waiting.
+            PoolError: if the pool is closed.
+        """
+        start = time.monotonic()
+        deadline = start + (self.timeout if timeout is None else timeout)
+        while True:
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise PoolError("Connection pool is closed.")
+                    if self._idle:
+                        connection, created, last_used = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        connection = None
+                        break
+                    if self.max_waiting is not None and self._waiting >= self.max_waiting:
+                        self.shed += 1
+                        raise PoolTimeout(f"No database connection available: {self._waiting} requests already waiting.")
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(f"No database connection available within {deadline - start:.1f} seconds.")
+                    self._waiting += 1
+                    try:
+                        self._condition.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+
+            now = time.monotonic()
+            if connection is None:
+                connection, created = self._open(), now
+            elif now - created > self.max_lifetime:
+                self._drop(connection, 'recycled')
+                continue
+            elif not self._healthy(connection, last_used, now):
+                self._drop(connection, 'discarded')
+                continue
+
+            waited = time.monotonic() - start
+            with self._condition:
+                self._in_use[connection] = created
+                self.acquired += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            return connection
+
+    def release(self, connection, discard=False):
+        """Return a connection to the pool, or close it when ``discard`` is set."""
+        with self._condition:
+            created = self._in_use.pop(connection, None)
+        if created is None:
+            raise PoolError("Connection was not acquired from this pool.")
+
+        if self._closed:
+            self._drop(connection)
+            return
+        if discard or not self._reset(connection):
+            self._drop(connection, 'discarded')
+            return
+        with self._condition:
+            self._idle.append((connection, created, time.monotonic()))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Borrow a connection for the duration of a ``with`` block.
+
+        Whatever was not committed when the block exits is rolled back.
+        """
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self):
+        """Close idle connections now and in-use ones when they are released."""
+        with self._condition:
+            self._closed = True
+            idle = [entry[0] for entry in self._idle]
+            self._idle.clear()
+            self._condition.notify_all()
+        for connection in idle:
+            self._drop(connection)
+
+    def stats(self):
+        with self._condition:
+            return {
+                "size": self._size,
+                "max_size": self.maxconn,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "waiting": self._waiting,
+                "acquired": self.acquired,
+                "timeouts": self.timeouts,
+                "shed": self.shed,
+                "recycled": self.recycled,
+                "discarded": self.discarded,
+                "wait_ms_total": round(self.wait_total * 1000, 3),
+                "wait_ms_max": round(self.wait_max * 1000, 3),
+                "wait_ms_avg": round(self.wait_total * 1000 / self.acquired, 3) if self.acquired else 0.0,
+            }
@@ -0,0 +1,194 @@
+import os
+import re
+import time
+import hashlib
+import weakref
+import threading
+import logging
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', 'True').lower() in ['true', '1', 't', 'yes']  # Disable behind transaction-pooling proxies
+MAX_PREPARED_PER_CONNECTION = 64
+EXPORT_ITERSIZE = 2000
+
+PLACEHOLDER = re.compile(r'%%|%s')
+
+def to_prepared_sql(sql):
+    """Rewrite psycopg2 ``%s`` placeholders as ``$1, $2, ...`` for PREPARE."""
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group() == '%%':
+            return '%'
+        count += 1
+        return f'${count}'
+
+    return PLACEHOLDER.sub(replace, sql), count
+
+class Query:
+    """
+    A named SQL statement with psycopg2 placeholders.
+
+    ``name`` labels its timings. With ``prepare``, each connection PREPAREs
+    it on first use and later calls only send ``EXECUTE`` with the
+    parameters, so the statement is parsed and planned once per connection.
+    """
+
+    def __init__(self, name, sql, prepare=False):
+        self.name = name
+        self.sql = sql
+        self.prepare = prepare
+        digest = hashlib.sha1(sql.encode()).hexdigest()[:12]
+        self.statement = f"{name}_{digest}"
+        self.prepared_sql, self.param_count = to_prepared_sql(sql)
+
+    _dynamic = {}
+    _dynamic_lock = threading.Lock()
+
+    @classmethod
+    def dynamic(cls, name, sql, prepare=False):
+        """Return the shared Query for generated SQL text, so each distinct text is prepared once."""
+        key = (name, sql, prepare)
+        with cls._dynamic_lock:
+            query = cls._dynamic.get(key)
+            if query is None:
+                if len(cls._dynamic) >= 1024:
+                    cls._dynamic.clear()
+                query = cls._dynamic[key] = cls(name, sql, prepare)
+            return query
+
+class QueryStats:
+    """Thread-safe per-query call counts and timings."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = {}
+
+    def record(self, name, seconds):
+        with self.lock:
+            entry = self.queries.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def summary(self):
+        with self.lock:
+            return {
+                name: {
+                    "calls": calls,
+                    "total_ms": round(total * 1000, 3),
+                    "avg_ms": round(total * 1000 / calls, 3),
+                    "max_ms": round(longest * 1000, 3),
+                }
+                for name, (calls, total, longest) in sorted(self.queries.items())
+            }
+
+query_stats = QueryStats()
+
+# Prepared statement names per connection; entries vanish with the connection
+_prepared = weakref.WeakKeyDictionary()
+
+class Session:
+    """
+    Runs queries on one connection inside one transaction.
+
+    Created by ``Database.transaction()``; model methods called within an
+    open transaction share its session, so their work commits or rolls back
+    together. Callbacks registered with ``on_commit`` run only after the
+    outermost transaction has committed.
+    """
+
+    def __init__(self, connection, prepare=DB_PREPARED_STATEMENTS, stats=query_stats):
+        self.connection = connection
+        self.prepare = prepare
+        self.stats = stats
+        self.callbacks = []
+
+    def as_string(self, composed):
+        return composed.as_string(self.connection)
+
+    def execute(self, query, params=()):
+        """Run a Query (or plain SQL, timed as 'adhoc') and return the cursor."""
+        if not isinstance(query, Query):
+            query = Query('adhoc', query if isinstance(query, str) else self.as_string(query))
+        cursor = self.connection.cursor()
+        start = time.perf_counter()
+        try:
+            if self.prepare and query.prepare:
+                self._execute_prepared(cursor, query, params)
+            else:
+                cursor.execute(query.sql, params)
+        finally:
+            self.stats.record(query.name, time.perf_counter() - start)
+        return cursor
+
+    def _execute_prepared(self, cursor, query, params):
+        prepared = _prepared.setdefault(self.connection, set())
+        if query.statement not in prepared:
+            if len(prepared) >= MAX_PREPARED_PER_CONNECTION:
+                cursor.execute(query.sql, params)
+                return
+            cursor.execute(f"PREPARE {query.statement} AS {query.prepared_sql}")
+            prepared.add(query.statement)
+        if query.param_count:
+            cursor.execute(f"EXECUTE {query.statement} ({', '.join(['%s'] * query.param_count)})", params)
+        else:
+            cursor.execute(f"EXECUTE {query.statement}")
+
+    def fetchone(self, query, params=()):
+        with self.execute(query, params) as cursor:
+            return cursor.fetchone()
+
+    def fetchall(self, query, params=()):
+        with self.execute(query, params) as cursor:
+            return cursor.fetchall()
+
+    def stream(self, query, params=(), cursor_name='export'):
+        """Yield rows through a server-side cursor, fetching EXPORT_ITERSIZE at a time."""
+        sql = query.sql if isinstance(query, Query) else query
+        name = query.name if isinstance(query, Query) else 'adhoc'
+        with self.connection.cursor(name=cursor_name) as cursor:
+            cursor.itersize = EXPORT_ITERSIZE
+            start = time.perf_counter()
+            cursor.execute(sql, params)
+            self.stats.record(name, time.perf_counter() - start)
+            yield from cursor
+
+    def on_commit(self, callback):
+        self.callbacks.append(callback)
+
+    def commit(self):
+        self.connection.commit()
+
+    def run_callbacks(self):
+        """
+        Run the ``on_commit`` callbacks once the commit has succeeded. A failing
+        callback is logged and does not stop the others: the work is saved.
+        """
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error in on_commit callback {callback!r}: {str(e)}")
+
+    def rollback(self):
+        """
+        Roll back, and drop this connection's prepared statements: those
+        prepared in the failed transaction may or may not have survived it.
+        """
+        self.callbacks = []
+        self.connection.rollback()
+        if _prepared.pop(self.connection, None):
+            with self.connection.cursor() as cursor:
+                cursor.execute("DEALLOCATE ALL")
+            self.connection.commit()
@@ -0,0 +1,51 @@
+import threading
+import logging
+from extensions import socketio
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Seconds between two broadcasts to the same lot
+BROADCAST_INTERVAL = 0.25
+
+def lot_room(lot_id):
+    return f"lot:{lot_id}"
+
+class SpotBroadcaster:
+    """
+    Coalesce parking spot changes and push them to SocketIO lot rooms.
+
+    ``publish`` only records the change: changes to the same spot within one
+    tick are merged, and every ``interval`` seconds a background task emits
+    one ``spot_updates`` message per lot with everything that changed.
+    """
+
+    def __init__(self, interval=BROADCAST_INTERVAL):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.task = None
+
+    def publish(self, lot_id, spot_id, **changes):
+        """Queue a change to one spot, e.g. ``publish("default", 12, is_occupied=True)``."""
+        with self.lock:
+            self.pending.setdefault(lot_id, {}).setdefault(spot_id, {"id": spot_id}).update(changes)
+            if self.task is None:
+                self.task = socketio.start_background_task(self.run)
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for lot_id, spots in pending.items():
+            socketio.emit('spot_updates', {"lot_id": lot_id, "spots": list(spots.values())}, to=lot_room(lot_id))
+
+    def run(self):
+        while True:
+            socketio.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error broadcasting spot updates: {e}")
+
+broadcaster = SpotBroadcaster()
@@ -1,10 +1,20 @@
-from marshmallow import Schema, fields, validate
+from datetime import datetime, timedelta, timezone
+from marshmallow import Schema, fields, validate, validates_schema, post_load, ValidationError
 import logging
+from utils.codec import load_many
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Reservation periods
+RESERVATION_DEFAULT_MINUTES = 60
+RESERVATION_MAX_DAYS = 30
+
+def as_utc(value):
+    """Attach UTC to a naive datetime; aware datetimes are returned unchanged."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
 class UserSchema(Schema):
     """
     Schema for validating user data during signup or other user-related operations.
@@ -12,6 +22,8 @@ class UserSchema(Schema):
     Fields:
         - username (str): The user's username. Must be at least 3 characters long.
         - password (str): The user's password. Must be at least 6 characters long.
+        - email (str): The user's email address, where the verification email is sent.
+        - first_name, last_name, date_of_birth, address, gender (str): Optional profile details.
     """
     username = fields.String(
         required=True,
@@ -21,6 +33,15 @@ class UserSchema(Schema):
         required=True,
         validate=validate.Length(min=6, error="Password must be at least 6 characters long.")
     )
+    email = fields.Email(
+        required=True,
+        error_messages={"required": "Email is required.", "invalid": "Email must be a valid email address."}
+    )
+    first_name = fields.String(load_default=None)
+    last_name = fields.String(load_default=None)
+    date_of_birth = fields.String(load_default=None)
+    address = fields.String(load_default=None)
+    gender = fields.String(load_default=None)
 
 class ParkingSpotSchema(Schema):
     """
@@ -52,7 +73,12 @@ class ReservationSchema(Schema):
     Fields:
         - spot_id (int): The ID of the parking spot. Must be a positive integer.
         - user_id (str): The ID of the user making the reservation. Must not be empty.
-        - time (str): The reservation time in ISO 8601 format (e.g., '2023-01-23T15:30:00').
+        - starts_at (str): Start of the reservation in ISO 8601 format (e.g., '2023-01-23T15:30:00').
+        - ends_at (str): End of the reservation in ISO 8601 format, after starts_at.
+        - time (str): Deprecated alternative to starts_at/ends_at; books RESERVATION_DEFAULT_MINUTES from that time.
+
+    Times without an offset are taken as UTC. Loading returns timezone-aware
+    ``starts_at`` and ``ends_at`` datetimes.
     """
     spot_id = fields.Integer(
         required=True,
@@ -62,10 +88,211 @@ class ReservationSchema(Schema):
         required=True,
         validate=validate.Length(min=1, error="User ID is required.")
     )
+    starts_at = fields.DateTime(error_messages={"invalid": "Start must be in ISO 8601 format (e.g., '2023-01-23T15:30:00')."})
+    ends_at = fields.DateTime(error_messages={"invalid": "End must be in ISO 8601 format (e.g., '2023-01-23T17:00:00')."})
     time = fields.String(
-        required=True,
         validate=validate.Regexp(
             r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}',
             error="Time must be in ISO 8601 format (e.g., '2023-01-23T15:30:00')."
         )
-    )
\ No newline at end of file
+    )
+
+    @validates_schema
+    def validate_period(self, data, **kwargs):
+        if 'time' in data:
+            if 'starts_at' in data or 'ends_at' in data:
+                raise ValidationError("Send either time or starts_at and ends_at, not both.", "time")
+            try:
+                datetime.fromisoformat(data['time'])
+            except ValueError:
+                raise ValidationError("Time must be a valid date and time (e.g., '2023-01-23T15:30:00').", "time")
+            return
+        if 'starts_at' not in data or 'ends_at' not in data:
+            raise ValidationError("Both starts_at and ends_at are required.", "starts_at")
+        starts_at, ends_at = as_utc(data['starts_at']), as_utc(data['ends_at'])
+        if ends_at <= starts_at:
+            raise ValidationError("The reservation must end after it starts.", "ends_at")
+        if ends_at - starts_at > timedelta(days=RESERVATION_MAX_DAYS):
+            raise ValidationError(f"A reservation can last at most {RESERVATION_MAX_DAYS} days.", "ends_at")
+
+    @post_load
+    def to_period(self, data, **kwargs):
+        if 'time' in data:
+            data['starts_at'] = datetime.fromisoformat(data.pop('time'))
+            data['ends_at'] = data['starts_at'] + timedelta(minutes=RESERVATION_DEFAULT_MINUTES)
+        data['starts_at'], data['ends_at'] = as_utc(data['starts_at']), as_utc(data['ends_at'])
+        return data
+
+# Detector statuses and the occupancy flag they map to
+SPACE_STATUSES = {"free": False, "occupied": True}
+MAX_SPACE_UPDATES = 20000
+MAX_SPOT_ID = 2 ** 31 - 1  # camera_spot_id is an INTEGER column
+
+def parse_space_updates(payload):
+    """
+    Validate a detector status payload and flatten it into column lists.
+
+    The payload is ``{"camera_id": str (optional), "spaces": [{"camera_id": str (optional),
+    "id": int, "status": "free" | "occupied"}, ...]}``. Batches can hold thousands of
+    spaces, so they are checked with plain type tests instead of a schema. When a spot
+    appears twice the last status wins.
+
+    Returns:
+        tuple: (camera_ids, spot_ids, occupied) lists, one entry per distinct spot.
+
+    Raises:
+        ValueError: describing the first invalid entry.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('spaces'), list):
+        raise ValueError("Payload must be an object with a 'spaces' list.")
+    spaces = payload['spaces']
+    if len(spaces) > MAX_SPACE_UPDATES:
+        raise ValueError(f"At most {MAX_SPACE_UPDATES} spaces can be sent per request.")
+    default_camera = payload.get('camera_id', 'default')
+
+    updates = {}
+    for i, space in enumerate(spaces):
+        if not isinstance(space, dict):
+            raise ValueError(f"Space {i} must be an object.")
+        camera_id = space.get('camera_id', default_camera)
+        spot_id = space.get('id')
+        status = space.get('status')
+        occupied = SPACE_STATUSES.get(status) if isinstance(status, str) else None
+        if not isinstance(camera_id, str) or not 0 < len(camera_id) <= 64:
+            raise ValueError(f"Space {i} has an invalid camera_id.")
+        if not isinstance(spot_id, int) or isinstance(spot_id, bool) or not 0 <= spot_id <= MAX_SPOT_ID:
+            raise ValueError(f"Space {i} must have an integer id between 0 and {MAX_SPOT_ID}.")
+        if occupied is None:
+            raise ValueError(f"Space {i} status must be 'free' or 'occupied'.")
+        updates[(camera_id, spot_id)] = occupied
+
+    camera_ids = [key[0] for key in updates]
+    spot_ids = [key[1] for key in updates]
+    return camera_ids, spot_ids, list(updates.values())
+
+# Occupancy history queries
+HISTORY_GRANULARITIES = ("hour", "day")
+HISTORY_DEFAULT_DAYS = 7
+HISTORY_MAX_DAYS = 366
+
+def parse_history_range(args, now=None):
+    """
+    Validate the ``from``, ``to`` and ``granularity`` query arguments of a history request.
+
+    Timestamps are ISO 8601; naive ones are taken as UTC. ``to`` defaults to now and
+    ``from`` to HISTORY_DEFAULT_DAYS before ``to``.
+
+    Returns:
+        tuple: (start, end, granularity) with timezone-aware datetimes.
+
+    Raises:
+        ValueError: describing the invalid argument.
+    """
+    def parse(name, default):
+        value = args.get(name)
+        if not value:
+            return default
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"'{name}' must be an ISO 8601 timestamp.")
+        return as_utc(parsed)
+
+    end = parse('to', now or datetime.now(timezone.utc))
+    start = parse('from', end - timedelta(days=HISTORY_DEFAULT_DAYS))
+    if start >= end:
+        raise ValueError("'from' must be before 'to'.")
+    if end - start > timedelta(days=HISTORY_MAX_DAYS):
+        raise ValueError(f"A history range can span at most {HISTORY_MAX_DAYS} days.")
+    granularity = args.get('granularity', 'hour')
+    if granularity not in HISTORY_GRANULARITIES:
+        raise ValueError("'granularity' must be 'hour' or 'day'.")
+    return start, end, granularity
+
+# List endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+BOOLEAN_VALUES = {"true": True, "1": True, "false": False, "0": False}
+
+def parse_list_args(args, fields, filters, default_fields=None, max_limit=MAX_PAGE_SIZE):
+    """
+    Validate the query arguments of a list endpoint.
+
+    ``fields=a,b`` picks the returned columns among ``fields`` (``default_fields``, or all,
+    when absent), ``after`` is the keyset cursor returned with the previous page and
+    ``limit`` the page size. ``filters`` maps filter names to ``(type, condition)``; a filter
+    applies when its name is given and its value converts to that type (bool, int, datetime or str).
+
+    Returns:
+        tuple: (fields, filters, after, limit) with filters as a {name: value} dict.
+
+    Raises:
+        ValueError: describing the invalid argument.
+    """
+    selected = list(default_fields or fields)
+    if args.get('fields'):
+        selected = list(dict.fromkeys(name.strip() for name in args['fields'].split(',')))
+        unknown = [name for name in selected if name not in fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(fields)}.")
+
+    def integer(name, value, minimum):
+        try:
+            number = int(value)
+        except ValueError:
+            raise ValueError(f"'{name}' must be an integer.")
+        if number < minimum:
+            raise ValueError(f"'{name}' must be at least {minimum}.")
+        return number
+
+    after = integer('after', args['after'], 0) if args.get('after') else None
+    limit = integer('limit', args['limit'], 1) if args.get('limit') else DEFAULT_PAGE_SIZE
+    if limit > max_limit:
+        raise ValueError(f"'limit' must be at most {max_limit}.")
+
+    values = {}
+    for name, (kind, _) in filters.items():
+        value = args.get(name)
+        if value is None:
+            continue
+        if kind is bool:
+            if value.lower() not in BOOLEAN_VALUES:
+                raise ValueError(f"'{name}' must be true or false.")
+            values[name] = BOOLEAN_VALUES[value.lower()]
+        elif kind is int:
+            values[name] = integer(name, value, 0)
+        elif kind is datetime:
+            try:
+                values[name] = as_utc(datetime.fromisoformat(value))
+            except ValueError:
+                raise ValueError(f"'{name}' must be an ISO 8601 timestamp.")
+        else:
+            values[name] = value
+    return selected, values, after, limit
+
+# Batch endpoints
+MAX_BATCH_SPOTS = 5000
+MAX_BATCH_RESERVATIONS = 1000
+
+def load_batch(payload, key, schema, max_items):
+    """
+    Validate the items of a batch payload ``{key: [item, ...]}`` with one schema instance,
+    through its compiled fast path when it has one.
+
+    Returns:
+        tuple: (valid, invalid) where valid is a list of (index, loaded item) and invalid a
+        list of per-item results ``{"index", "status": "invalid", "errors"}``.
+
+    Raises:
+        ValueError: when the payload itself is malformed or too large.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get(key), list):
+        raise ValueError(f"Payload must be an object with a '{key}' list.")
+    items = payload[key]
+    if not items:
+        raise ValueError(f"'{key}' must not be empty.")
+    if len(items) > max_items:
+        raise ValueError(f"At most {max_items} {key} can be sent per request.")
+
+    valid, invalid = load_many(schema, items)
+    return valid, [{"index": index, "status": "invalid", "errors": errors} for index, errors in invalid]